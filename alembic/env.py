@@ -25,6 +25,10 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 from app.database import Base  # Importa a base declarativa do SQLAlchemy
 from app import models
+from app.config import DATABASE_URL
+
+# A URL do banco vem da mesma configuração da aplicação (variável DATABASE_URL)
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,27 @@
+"""add_historico_fila_saida_index
+
+Revision ID: 1f6b2d94ce07
+Revises: e3a8c05f91d2
+Create Date: 2026-10-18 20:11:43.502917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f6b2d94ce07'
+down_revision: Union[str, None] = 'e3a8c05f91d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Últimos atendimentos de uma fila, usados para aquecer a estimativa de espera
+    op.create_index('ix_historico_filas_fila_saida', 'historico_filas', ['fila_id', 'horario_saida'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_historico_filas_fila_saida', table_name='historico_filas')
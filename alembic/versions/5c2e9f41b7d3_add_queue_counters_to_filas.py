@@ -0,0 +1,44 @@
+"""add_queue_counters_to_filas
+
+Revision ID: 5c2e9f41b7d3
+Revises: ad5766bb386b
+Create Date: 2026-10-18 16:42:37.104218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e9f41b7d3'
+down_revision: Union[str, None] = 'ad5766bb386b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUNAS = ['aguardando_alta', 'aguardando_normal', 'total_atendidos', 'ultimo_ticket', 'versao']
+
+
+def upgrade() -> None:
+    for coluna in COLUNAS:
+        op.add_column('filas', sa.Column(coluna, sa.Integer(), nullable=False, server_default='0'))
+
+    # Preenche os contadores a partir das entradas existentes
+    op.execute("""
+        UPDATE filas SET
+            aguardando_alta = (SELECT count(*) FROM usuarios_na_fila u
+                               WHERE u.fila_id = filas.id AND u.status = 'aguardando' AND u.prioridade = 'high'),
+            aguardando_normal = (SELECT count(*) FROM usuarios_na_fila u
+                                 WHERE u.fila_id = filas.id AND u.status = 'aguardando'
+                                   AND (u.prioridade IS NULL OR u.prioridade <> 'high')),
+            total_atendidos = (SELECT count(*) FROM usuarios_na_fila u
+                               WHERE u.fila_id = filas.id AND u.status = 'atendido'),
+            ultimo_ticket = COALESCE((SELECT max(u.ordem) FROM usuarios_na_fila u WHERE u.fila_id = filas.id), 0)
+    """)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('filas') as batch_op:
+        for coluna in reversed(COLUNAS):
+            batch_op.drop_column(coluna)
@@ -0,0 +1,28 @@
+"""add_qr_geracao_to_filas
+
+Revision ID: 6d0c3b8e4f17
+Revises: 1f6b2d94ce07
+Create Date: 2026-10-18 22:05:12.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d0c3b8e4f17'
+down_revision: Union[str, None] = '1f6b2d94ce07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Geração do QR Code da fila: tokens de gerações anteriores deixam de valer
+    op.add_column('filas', sa.Column('qr_geracao', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('filas') as batch_op:
+        batch_op.drop_column('qr_geracao')
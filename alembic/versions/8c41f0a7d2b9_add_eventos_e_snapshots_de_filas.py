@@ -0,0 +1,84 @@
+"""add_eventos_e_snapshots_de_filas
+
+Revision ID: 8c41f0a7d2b9
+Revises: 6d0c3b8e4f17
+Create Date: 2026-10-18 23:40:37.912208
+
+"""
+import json
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41f0a7d2b9'
+down_revision: Union[str, None] = '6d0c3b8e4f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Sequência do último evento de cada fila (reservada junto com os contadores)
+    op.add_column('filas', sa.Column('ultimo_evento', sa.Integer(), nullable=False, server_default='0'))
+    if bind.dialect.name == 'sqlite':
+        # Ids de filas apagadas não podem voltar: o log de eventos sobrevive à fila
+        with op.batch_alter_table('filas', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+    # O tipo priority já existe no PostgreSQL (usuarios_na_fila)
+    prioridade = sa.Enum('normal', 'high', name='priority').with_variant(
+        postgresql.ENUM('normal', 'high', name='priority', create_type=False), 'postgresql'
+    )
+    op.create_table(
+        'eventos_fila',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fila_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=10), nullable=False),
+        sa.Column('entrada_id', sa.Integer(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('prioridade', prioridade, nullable=True),
+        sa.Column('criado_em', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_eventos_fila_fila_seq', 'eventos_fila', ['fila_id', 'seq'], unique=True)
+    op.create_table(
+        'snapshots_fila',
+        sa.Column('fila_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('entradas', sa.Text(), nullable=False),
+        sa.Column('criado_em', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('fila_id')
+    )
+
+    # Ponto de partida do log: quem aguarda hoje em cada fila vira o snapshot da sequência 0
+    aguardando = {fila_id: [] for (fila_id,) in bind.execute(sa.text("SELECT id FROM filas"))}
+    linhas = bind.execute(sa.text(
+        "SELECT fila_id, id, usuario_id, prioridade FROM usuarios_na_fila WHERE status = 'aguardando' ORDER BY fila_id, id"
+    ))
+    for fila_id, entrada_id, usuario_id, prioridade_entrada in linhas:
+        if fila_id in aguardando:
+            aguardando[fila_id].append([entrada_id, usuario_id, int(prioridade_entrada == 'high')])
+    if aguardando:
+        agora = datetime.utcnow()
+        snapshots = sa.table(
+            'snapshots_fila', sa.column('fila_id'), sa.column('seq'), sa.column('entradas'), sa.column('criado_em')
+        )
+        op.bulk_insert(snapshots, [
+            {'fila_id': fila_id, 'seq': 0, 'entradas': json.dumps(entradas, separators=(',', ':')), 'criado_em': agora}
+            for fila_id, entradas in aguardando.items()
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table('snapshots_fila')
+    op.drop_index('uq_eventos_fila_fila_seq', table_name='eventos_fila')
+    op.drop_table('eventos_fila')
+    with op.batch_alter_table('filas', table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        batch_op.drop_column('ultimo_evento')
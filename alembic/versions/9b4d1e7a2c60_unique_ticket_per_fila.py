@@ -0,0 +1,55 @@
+"""unique_ticket_per_fila
+
+Revision ID: 9b4d1e7a2c60
+Revises: 5c2e9f41b7d3
+Create Date: 2026-10-18 18:20:51.637402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d1e7a2c60'
+down_revision: Union[str, None] = '5c2e9f41b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conexao = op.get_bind()
+
+    # A ordem antiga vinha de COUNT(*) + 1 e pode ter se repetido: as repetidas
+    # ganham o próximo número livre da fila, na ordem de chegada (id)
+    linhas = conexao.execute(sa.text(
+        "SELECT id, fila_id, ordem FROM usuarios_na_fila ORDER BY fila_id, ordem, id"
+    )).fetchall()
+    maior = {}
+    for fila_id, ordem in conexao.execute(sa.text(
+        "SELECT fila_id, max(ordem) FROM usuarios_na_fila GROUP BY fila_id"
+    )):
+        maior[fila_id] = ordem or 0
+    anterior = None
+    for entrada_id, fila_id, ordem in linhas:
+        if anterior is not None and anterior == (fila_id, ordem):
+            maior[fila_id] += 1
+            conexao.execute(
+                sa.text("UPDATE usuarios_na_fila SET ordem = :ordem WHERE id = :id"),
+                {"ordem": maior[fila_id], "id": entrada_id}
+            )
+            continue
+        anterior = (fila_id, ordem)
+
+    # O contador continua de onde os tickets pararam
+    op.execute("""
+        UPDATE filas SET ultimo_ticket = (SELECT max(u.ordem) FROM usuarios_na_fila u WHERE u.fila_id = filas.id)
+        WHERE ultimo_ticket < (SELECT max(u.ordem) FROM usuarios_na_fila u WHERE u.fila_id = filas.id)
+    """)
+
+    op.create_index('uq_usuarios_na_fila_fila_ordem', 'usuarios_na_fila', ['fila_id', 'ordem'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_usuarios_na_fila_fila_ordem', table_name='usuarios_na_fila')
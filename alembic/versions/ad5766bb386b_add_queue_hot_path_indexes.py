@@ -0,0 +1,45 @@
+"""add_queue_hot_path_indexes
+
+Revision ID: ad5766bb386b
+Revises: 7aeaa8396d70
+Create Date: 2026-10-18 14:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ad5766bb386b'
+down_revision: Union[str, None] = '7aeaa8396d70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Operações da fila (entrar, chamar, estatísticas): fila + status + prioridade, ordenado por ordem
+    op.create_index('ix_usuarios_na_fila_fila_status_prioridade', 'usuarios_na_fila', ['fila_id', 'status', 'prioridade', 'ordem'], unique=False)
+    # Posições atuais do cliente
+    op.create_index('ix_usuarios_na_fila_usuario_status', 'usuarios_na_fila', ['usuario_id', 'status'], unique=False)
+    # Histórico do cliente: índice parcial só com as entradas finalizadas
+    op.create_index(
+        'ix_usuarios_na_fila_historico', 'usuarios_na_fila', ['usuario_id', 'horario_entrada'], unique=False,
+        sqlite_where=sa.text("status <> 'aguardando'"),
+        postgresql_where=sa.text("status <> 'aguardando'")
+    )
+
+    # Chaves estrangeiras usadas nas listagens e dashboards
+    op.create_index(op.f('ix_filas_estabelecimento_id'), 'filas', ['estabelecimento_id'], unique=False)
+    op.create_index(op.f('ix_estabelecimentos_usuario_id'), 'estabelecimentos', ['usuario_id'], unique=False)
+    op.create_index(op.f('ix_usuarios_establishment_id'), 'usuarios', ['establishment_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_usuarios_establishment_id'), table_name='usuarios')
+    op.drop_index(op.f('ix_estabelecimentos_usuario_id'), table_name='estabelecimentos')
+    op.drop_index(op.f('ix_filas_estabelecimento_id'), table_name='filas')
+    op.drop_index('ix_usuarios_na_fila_historico', table_name='usuarios_na_fila')
+    op.drop_index('ix_usuarios_na_fila_usuario_status', table_name='usuarios_na_fila')
+    op.drop_index('ix_usuarios_na_fila_fila_status_prioridade', table_name='usuarios_na_fila')
@@ -0,0 +1,59 @@
+"""add_historico_filas
+
+Revision ID: e3a8c05f91d2
+Revises: 9b4d1e7a2c60
+Create Date: 2026-10-18 19:05:27.880143
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a8c05f91d2'
+down_revision: Union[str, None] = '9b4d1e7a2c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tabela fria com as entradas finalizadas; `mes` (AAAAMM) é a chave de partição
+    op.create_table(
+        'historico_filas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entrada_id', sa.Integer(), nullable=False),
+        sa.Column('usuario_id', sa.Integer(), nullable=False),
+        sa.Column('fila_id', sa.Integer(), nullable=False),
+        sa.Column('ordem', sa.Integer(), nullable=False),
+        # Reaproveita o tipo enum `priority` que usuarios_na_fila já criou no PostgreSQL
+        sa.Column('prioridade', sa.Enum('normal', 'high', name='priority').with_variant(
+            postgresql.ENUM('normal', 'high', name='priority', create_type=False), 'postgresql'
+        ), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('horario_entrada', sa.DateTime(), nullable=True),
+        sa.Column('horario_saida', sa.DateTime(), nullable=True),
+        sa.Column('mes', sa.Integer(), nullable=False),
+        sa.Column('fila_nome', sa.String(), nullable=True),
+        sa.Column('estabelecimento_nome', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_historico_filas_usuario_entrada', 'historico_filas', ['usuario_id', 'horario_entrada'], unique=False)
+    op.create_index('ix_historico_filas_mes_fila', 'historico_filas', ['mes', 'fila_id'], unique=False)
+
+    # usuarios_na_fila passa a guardar só quem aguarda: o índice do histórico lá não tem mais uso.
+    # As entradas finalizadas já existentes são movidas por arquivar_historico.py
+    op.drop_index('ix_usuarios_na_fila_historico', table_name='usuarios_na_fila')
+
+
+def downgrade() -> None:
+    op.create_index(
+        'ix_usuarios_na_fila_historico', 'usuarios_na_fila', ['usuario_id', 'horario_entrada'], unique=False,
+        sqlite_where=sa.text("status <> 'aguardando'"),
+        postgresql_where=sa.text("status <> 'aguardando'")
+    )
+    op.drop_index('ix_historico_filas_mes_fila', table_name='historico_filas')
+    op.drop_index('ix_historico_filas_usuario_entrada', table_name='historico_filas')
+    op.drop_table('historico_filas')
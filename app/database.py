@@ -1,9 +1,67 @@
-from sqlalchemy import create_engine # type: ignore
+import time
+from sqlalchemy import create_engine, event # type: ignore
+from sqlalchemy.engine import make_url # type: ignore
+from sqlalchemy.pool import QueuePool # type: ignore
 from sqlalchemy.orm import sessionmaker, declarative_base # type: ignore
+from app.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE
+)
+from app.metrics import registry, db_pool_checkouts, db_pool_wait, sql_statements
+from app import sql_profile
 
-DATABASE_URL = "sqlite:///filadigital.db"  # pode trocar depois para PostgreSQL
+class PoolMedido(QueuePool):
+    """QueuePool que registra quantas conexões foram retiradas e quanto tempo se esperou por elas"""
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - inicio)
+            db_pool_checkouts.inc()
+
+def _opcoes_engine(url) -> dict:
+    """Monta as opções do engine de acordo com o banco configurado"""
+    opcoes = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.get_backend_name() == "sqlite":
+        opcoes["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # Banco em memória usa um pool próprio, sem tamanho configurável
+            return opcoes
+    opcoes.update(poolclass=PoolMedido, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return opcoes
+
+_url = make_url(DATABASE_URL)
+engine = create_engine(_url, **_opcoes_engine(_url))
+
+if _url.get_backend_name() == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _configurar_sqlite(dbapi_connection, connection_record):
+        # WAL permite leituras durante uma escrita; busy_timeout espera o lock em vez de falhar
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+# Conta e cronometra cada comando no perfil da requisição em andamento
+sql_profile.install(engine, on_statement=sql_statements.inc)
+
+if isinstance(engine.pool, QueuePool):
+    registry.gauge(
+        "filadigital_db_pool_connections", "Conexões do pool por estado", ("estado",),
+        lambda: [(("em_uso",), engine.pool.checkedout()), (("ociosas",), engine.pool.checkedin())]  # type: ignore
+    )
+
+# Única fábrica de sessões da aplicação
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
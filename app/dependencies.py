@@ -1,35 +1,47 @@
 # Dependências e utilitários da aplicação
 # Funções auxiliares para autenticação, validação e controle de acesso
 
-from sqlalchemy.orm import sessionmaker, Session  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
 from fastapi import Depends, HTTPException  # type: ignore
-from jose import jwt, JWTError  # type: ignore
-from app.database import engine
-from app.config import SECRET_KEY, ALGORITHM, oauth2_scheme
+from fastapi.security import OAuth2PasswordBearer  # type: ignore
+from app.database import SessionLocal
+from app.config import SECRET_KEY, ALGORITHM, PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE
 from app.models import Usuario, Fila, UsuariosNaFila, Estabelecimento, Role
+from app.principal_cache import PrincipalCache
 
-# Cria uma "fábrica" de sessões do banco de dados
-Session = sessionmaker(bind=engine)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="usuarios/login-form")
+
+# Usuários autenticados recentemente; invalide ao mudar role, ativo ou establishment_id
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE)
 
 def obter_sessao():
     """Fornece uma sessão de banco de dados para as rotas"""
-    session = Session()   # Abre a conexão
+    session = SessionLocal()   # Abre a conexão
     try:
         yield session     # Entrega a sessão para a rota
     finally:
         session.close()   # Fecha a conexão quando acabar
 
 def verificar_token(token: str = Depends(oauth2_scheme), session: Session = Depends(obter_sessao)):  # type: ignore
+    return usuario_do_token(token, session)
+
+# Função para obter o usuário a partir do token (também usada fora das rotas HTTP, ex.: WebSocket)
+def usuario_do_token(token: str, session: Session):  # type: ignore
+    from jose import jwt, JWTError  # type: ignore  # carregado no aquecimento (app.startup), não na importação
     try:
         dic_info = jwt.decode(token, SECRET_KEY, ALGORITHM) #type: ignore
         usuario_id = int(dic_info.get("sub")) #type: ignore
     except JWTError:
         raise HTTPException(status_code=401, detail="Acesso Negado, Verifique a validade do token!")
-    # verificar o token
+    # Token já visto: usa a cópia em memória em vez de ir ao banco
+    usuario = principal_cache.get(usuario_id, token, session)
+    if usuario is not None:
+        return usuario
     # extrair o id do usuario do token
     usuario = session.query(Usuario).filter(Usuario.id==usuario_id).first() #type: ignore
     if not usuario:
         raise HTTPException(status_code=401, detail="Usuário não encontrado!")
+    principal_cache.put(usuario, token, dic_info.get("exp"))
     return usuario
 
 # Função para verificar o dono do estabelecimento
@@ -44,19 +56,11 @@ def verificar_dono_fila(fila: Fila, usuario: Usuario):
 
 # Função para impedir owner ou employee entrar na fila própria
 def impedir_owner_employee_entrar(fila: Fila, usuario: Usuario):
-    if usuario.role == Role.owner and fila.estabelecimento.usuario_id == usuario.id: #type: ignore
+    if usuario.role == Role.dono and fila.estabelecimento.usuario_id == usuario.id: #type: ignore
         raise HTTPException(status_code=403, detail="Dono do estabelecimento não pode entrar na própria fila")
-    elif usuario.role == Role.employee and usuario.establishment_id == fila.estabelecimento_id: #type: ignore
+    elif usuario.role == Role.funcionario and usuario.establishment_id == fila.estabelecimento_id: #type: ignore
         raise HTTPException(status_code=403, detail="Funcionário não pode entrar na fila do próprio estabelecimento")
     
-# Função para calcular ordem da fila
-def calcular_ordem(fila: Fila, session: Session): # type: ignore
-    quantidade = session.query(UsuariosNaFila).filter(
-        UsuariosNaFila.fila_id == fila.id,
-        UsuariosNaFila.status == "aguardando"
-    ).count()
-    return quantidade + 1
-
 # Função para chemar o proximo da fila e atualizar o status
 def chamar_proximo(fila: Fila, session: Session, usuario: Usuario) -> UsuariosNaFila: # type: ignore
     # Só o dono pode chamar o proximo
@@ -91,11 +95,11 @@ def require_role(required_role: Role):
 # Função para verificar se o usuário é owner ou employee do estabelecimento
 def require_establishment_access(estabelecimento_id: int):
     def access_checker(usuario: Usuario = Depends(verificar_token), session: Session = Depends(obter_sessao)):  # type: ignore
-        if usuario.role == Role.owner: #type: ignore
+        if usuario.role == Role.dono: #type: ignore
             estabelecimento = session.query(Estabelecimento).filter(Estabelecimento.id == estabelecimento_id).first()
             if not estabelecimento or estabelecimento.usuario_id != usuario.id:
                 raise HTTPException(status_code=403, detail="Acesso negado ao estabelecimento")
-        elif usuario.role == Role.employee: #type: ignore
+        elif usuario.role == Role.funcionario: #type: ignore
             if usuario.establishment_id != estabelecimento_id: #type: ignore
                 raise HTTPException(status_code=403, detail="Acesso negado ao estabelecimento")
         else:
@@ -110,11 +114,11 @@ def require_queue_access(fila_id: int):
         if not fila:
             raise HTTPException(status_code=404, detail="Fila não encontrada")
         estabelecimento_id = fila.estabelecimento_id
-        if usuario.role == Role.owner: #type: ignore
+        if usuario.role == Role.dono: #type: ignore
             estabelecimento = session.query(Estabelecimento).filter(Estabelecimento.id == estabelecimento_id).first()
             if not estabelecimento or estabelecimento.usuario_id != usuario.id:
                 raise HTTPException(status_code=403, detail="Acesso negado à fila")
-        elif usuario.role == Role.employee:  #type: ignore
+        elif usuario.role == Role.funcionario:  #type: ignore
             if usuario.establishment_id != estabelecimento_id:
                 raise HTTPException(status_code=403, detail="Acesso negado à fila")
         else:
@@ -1,22 +1,42 @@
 # Aplicação principal FastAPI para o sistema FilaDigital
 # Configura a aplicação, middlewares e rotas
 
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI  # type: ignore
+from fastapi.concurrency import run_in_threadpool  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore
-from fastapi.staticfiles import StaticFiles  # type: ignore
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse, PlainTextResponse
 from app.config import (
     APP_TITLE,
     CORS_ORIGINS,
     CORS_CREDENTIALS,
     CORS_METHODS,
     CORS_HEADERS,
+    DB_CREATE_ALL,
+    SERVE_FRONTEND,
+    SHUTDOWN_SNAPSHOTS,
+    STARTUP_WARMUP,
     STATIC_DIRECTORY,
     STATIC_MOUNT_PATH
 )
+from app.metrics import MetricsMiddleware, registry
+from app.pagination import CABECALHO_CURSOR
+from app import startup
+
+# Inicialização fora da importação: o servidor só aceita requisições depois do aquecimento
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_CREATE_ALL:
+        await run_in_threadpool(startup.create_schema)
+    if STARTUP_WARMUP:
+        await run_in_threadpool(startup.warm_up)
+    yield
+    await run_in_threadpool(startup.shut_down, SHUTDOWN_SNAPSHOTS)
 
 # Cria a aplicação FastAPI
-app = FastAPI(title=APP_TITLE)
+# Respostas JSON saem pelo orjson (os dados já vêm prontos do response_model de cada rota)
+app = FastAPI(title=APP_TITLE, default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -25,10 +45,17 @@ app.add_middleware(
     allow_credentials=CORS_CREDENTIALS,
     allow_methods=CORS_METHODS,
     allow_headers=CORS_HEADERS,
+    expose_headers=[CABECALHO_CURSOR],  # cursor da próxima página nas listagens paginadas
 )
 
-# Servir arquivos estáticos do front-end
-app.mount(STATIC_MOUNT_PATH, StaticFiles(directory=STATIC_DIRECTORY), name="frontend")
+# Latência por rota, requisições em andamento e SQL por requisição
+app.add_middleware(MetricsMiddleware)
+
+# Servir arquivos estáticos do front-end (workers só de API sobem sem a pasta)
+if SERVE_FRONTEND and os.path.isdir(STATIC_DIRECTORY):
+    from fastapi.staticfiles import StaticFiles  # type: ignore
+
+    app.mount(STATIC_MOUNT_PATH, StaticFiles(directory=STATIC_DIRECTORY), name="frontend")
 
 # Rota para redirecionar para o front-end
 @app.get("/")
@@ -40,15 +67,18 @@ async def root():
 async def api_test():
     return {"message": "API FilaDigital está funcionando!", "status": "ok"}
 
-from app.routers import usuarios, estabelecimentos, filas
-from app.database import Base, engine
+# Métricas no formato de texto do Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
-Base.metadata.create_all(bind=engine)
+from app.routers import usuarios, estabelecimentos, filas, tempo_real
 
 # Incluindo as rotas
 app.include_router(usuarios.router, prefix="/usuarios", tags=["Usuários"])
 app.include_router(estabelecimentos.router, prefix="/estabelecimentos", tags=["Estabelecimentos"])
 app.include_router(filas.router, prefix="/filas", tags=["Filas"])
+app.include_router(tempo_real.router, prefix="/tempo-real", tags=["Tempo real"])
 
 # Para executar o servidor:
 # uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
@@ -58,4 +88,4 @@ app.include_router(filas.router, prefix="/filas", tags=["Filas"])
 
 # Para executar os testes:
 # $env:PYTHONPATH="."
-# pytest tests/ --disable-warnings -v
\ No newline at end of file
+# pytest tests/ --disable-warnings -v
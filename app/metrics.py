@@ -0,0 +1,253 @@
+# Métricas da aplicação no formato de texto do Prometheus
+# Cada thread escreve no seu próprio shard, sem locks; os shards só são somados quando /metrics é lido
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from app.config import SQL_DEBUG_HEADERS
+from app.sql_profile import SQLProfile, current_profile, debug_headers
+
+# Buckets padrão de latência, em segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets para contagens pequenas (ex.: comandos SQL por requisição)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(nomes: Sequence[str], valores: Labels, extra: str = "") -> str:
+    pares = [f'{nome}="{_escape(str(valor))}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _format_value(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico; inc() só toca o shard da thread atual"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, valor: float = 1):
+        shard = self.registry._shard()
+        chave = (self, labels)
+        shard[chave] = shard.get(chave, 0) + valor
+
+    def values(self) -> Dict[Labels, float]:
+        total: Dict[Labels, float] = {}
+        for (metrica, labels), valor in self.registry._merged():
+            if metrica is self:
+                total[labels] = total.get(labels, 0) + valor
+        return total
+
+    def render(self) -> List[str]:
+        linhas = self._header()
+        for labels, valor in sorted(self.values().items()):
+            linhas.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(valor)}")
+        return linhas
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos; cada shard guarda [contagens..., soma, total]"""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, valor: float, *labels: str):
+        shard = self.registry._shard()
+        chave = (self, labels)
+        dados = shard.get(chave)
+        if dados is None:
+            dados = shard[chave] = [0] * (len(self.buckets) + 3)
+        dados[bisect.bisect_left(self.buckets, valor)] += 1
+        dados[-2] += valor
+        dados[-1] += 1
+
+    def values(self) -> Dict[Labels, List[float]]:
+        total: Dict[Labels, List[float]] = {}
+        for (metrica, labels), dados in self.registry._merged():
+            if metrica is self:
+                acumulado = total.setdefault(labels, [0] * len(dados))
+                for i, valor in enumerate(list(dados)):
+                    acumulado[i] += valor
+        return total
+
+    def render(self) -> List[str]:
+        linhas = self._header()
+        for labels, dados in sorted(self.values().items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets + (float("inf"),), dados):
+                acumulado += quantidade
+                le = 'le="' + _format_value(limite) + '"'
+                linhas.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(acumulado)}")
+            linhas.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(dados[-2])}")
+            linhas.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(dados[-1])}")
+        return linhas
+
+
+class Gauge(_Metric):
+    """Valor instantâneo calculado na coleta: collect() devolve [(labels, valor)]"""
+
+    kind = "gauge"
+
+    def __init__(self, registry, name, help, labelnames, collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        super().__init__(registry, name, help, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        linhas = self._header()
+        for labels, valor in sorted(self.collect()):
+            linhas.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(valor)}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._shards: List[Dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()  # só para registrar shards e métricas novas
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # dict.copy() é atômico sob o GIL; a thread dona pode continuar escrevendo
+            yield from shard.copy().items()
+
+    def _register(self, metrica):
+        with self._lock:
+            self._metrics.append(metrica)
+        return metrica
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[Labels, float]]]) -> Gauge:
+        return self._register(Gauge(self, name, help, labelnames, collect))
+
+    def render(self) -> str:
+        linhas: List[str] = []
+        for metrica in list(self._metrics):
+            linhas.extend(metrica.render())
+        return "\n".join(linhas) + "\n"
+
+
+# Registro único do processo e métricas usadas fora das rotas
+registry = MetricsRegistry()
+
+http_requests_started = registry.counter("filadigital_http_requests_started_total", "Requisições HTTP iniciadas")
+http_requests_finished = registry.counter("filadigital_http_requests_finished_total", "Requisições HTTP finalizadas")
+http_request_duration = registry.histogram(
+    "filadigital_http_request_duration_seconds", "Latência das requisições HTTP por rota", ("method", "route", "status")
+)
+sql_statements_per_request = registry.histogram(
+    "filadigital_sql_statements_per_request", "Comandos SQL executados por requisição HTTP", ("route",), COUNT_BUCKETS
+)
+sql_seconds_per_request = registry.histogram(
+    "filadigital_sql_seconds_per_request", "Tempo total em comandos SQL por requisição HTTP", ("route",)
+)
+sql_n_plus_one = registry.counter(
+    "filadigital_sql_n_plus_one_total", "Requisições com o mesmo comando SQL repetido (provável N+1)", ("route",)
+)
+sql_statements = registry.counter("filadigital_sql_statements_total", "Comandos SQL executados")
+db_pool_checkouts = registry.counter("filadigital_db_pool_checkouts_total", "Conexões retiradas do pool")
+db_pool_wait = registry.histogram("filadigital_db_pool_wait_seconds", "Espera por uma conexão livre no pool")
+password_duration = registry.histogram(
+    "filadigital_password_seconds", "Tempo de bcrypt por operação (espera na fila e execução)", ("operacao", "fase")
+)
+password_rejected = registry.counter("filadigital_password_rejected_total", "Operações de senha recusadas por excesso de fila")
+rate_limited = registry.counter(
+    "filadigital_rate_limited_total", "Requisições recusadas com 429 pelo limite de taxa", ("limite", "escopo")
+)
+
+registry.gauge(
+    "filadigital_http_requests_in_flight", "Requisições HTTP em andamento", (),
+    lambda: [((), sum(http_requests_started.values().values()) - sum(http_requests_finished.values().values()))]
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: latência por rota, requisições em andamento e SQL por requisição.
+
+    Com SQL_DEBUG_HEADERS ligado, a resposta também traz X-SQL-Count,
+    X-SQL-Time-Ms e, se houver comandos repetidos, X-SQL-N-Plus-One.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        perfil = SQLProfile()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = mensagem["status"]
+                if SQL_DEBUG_HEADERS:
+                    mensagem["headers"] = list(mensagem.get("headers", [])) + debug_headers(perfil)
+            await send(mensagem)
+
+        token = current_profile.set(perfil)
+        http_requests_started.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            # Usa o caminho da rota (ex.: /filas/{fila_id}/chamar-proximo) para não explodir a cardinalidade
+            rota = getattr(scope.get("route"), "path", None) or "outras"
+            http_request_duration.observe(duracao, scope["method"], rota, str(status[0]))
+            sql_statements_per_request.observe(perfil.count, rota)
+            sql_seconds_per_request.observe(perfil.duration, rota)
+            if perfil.repeated():
+                sql_n_plus_one.inc(rota)
+            http_requests_finished.inc()
+            current_profile.reset(token)
@@ -1,7 +1,7 @@
 # Modelos de dados para o sistema FilaDigital
 # Define as tabelas do banco de dados usando SQLAlchemy
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Enum  # type: ignore
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, Enum, Index  # type: ignore
 from sqlalchemy.orm import relationship  # type: ignore
 from datetime import datetime
 from app.database import Base
@@ -32,7 +32,7 @@ class Usuario(Base):
     ativo = Column(Boolean, default=True)
     admin = Column(Boolean, default=False)
     role = Column(Enum(Role), default=Role.usuario)
-    establishment_id = Column(Integer, ForeignKey("estabelecimentos.id"), nullable=True)  # Para funcionários
+    establishment_id = Column(Integer, ForeignKey("estabelecimentos.id"), nullable=True, index=True)  # Para funcionários
 
     # Relacionamento: 1 usuário pode ter vários estabelecimentos (como dono)
     estabelecimentos = relationship(
@@ -74,7 +74,7 @@ class Estabelecimento(Base):
     cidade = Column(String, nullable=False)
     estado = Column(String, nullable=False)
     telefone = Column(String, nullable=False)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
 
     # Relacionamento: cada estabelecimento pertence a um usuário (dono)
     usuario = relationship(
@@ -101,11 +101,22 @@ class Estabelecimento(Base):
 # -------------------------
 class Fila(Base):
     __tablename__ = "filas"
+    # Ids de filas apagadas não voltam no SQLite: histórico e log de eventos continuam apontando para a fila certa
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, nullable=False)
     descricao = Column(String, nullable=True)
-    estabelecimento_id = Column(Integer, ForeignKey("estabelecimentos.id"), nullable=False)
+    estabelecimento_id = Column(Integer, ForeignKey("estabelecimentos.id"), nullable=False, index=True)
+
+    # Contadores atualizados na mesma transação de cada entrada, chamada e saída
+    aguardando_alta = Column(Integer, nullable=False, default=0, server_default="0")
+    aguardando_normal = Column(Integer, nullable=False, default=0, server_default="0")
+    total_atendidos = Column(Integer, nullable=False, default=0, server_default="0")
+    ultimo_ticket = Column(Integer, nullable=False, default=0, server_default="0")
+    versao = Column(Integer, nullable=False, default=0, server_default="0")  # muda a cada escrita na fila
+    qr_geracao = Column(Integer, nullable=False, default=0, server_default="0")  # sobe ao rotacionar o QR Code
+    ultimo_evento = Column(Integer, nullable=False, default=0, server_default="0")  # sequência do último evento em eventos_fila
 
     # Relacionamento: cada fila pertence a um estabelecimento
     estabelecimento = relationship("Estabelecimento", back_populates="filas")
@@ -118,17 +129,30 @@ class Fila(Base):
         self.descricao = descricao
         self.estabelecimento_id = estabelecimento_id
 
+    @property
+    def pessoas_na_fila(self) -> int:
+        """Clientes aguardando, pelos contadores da própria fila (sem consulta)"""
+        return (self.aguardando_alta or 0) + (self.aguardando_normal or 0)  # type: ignore
+
 
 # -------------------------
 # UsuariosNaFila (tabela intermediária)
 # -------------------------
 class UsuariosNaFila(Base):
     __tablename__ = "usuarios_na_fila"
+    __table_args__ = (
+        # Operações da fila: filtram por fila, status e prioridade e ordenam pela ordem
+        Index("ix_usuarios_na_fila_fila_status_prioridade", "fila_id", "status", "prioridade", "ordem"),
+        # A ordem é o ticket emitido pelo contador da fila: nunca se repete dentro da fila
+        Index("uq_usuarios_na_fila_fila_ordem", "fila_id", "ordem", unique=True),
+        # Telas do cliente: posições atuais do usuário
+        Index("ix_usuarios_na_fila_usuario_status", "usuario_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     fila_id = Column(Integer, ForeignKey("filas.id"), nullable=False)
-    ordem = Column(Integer, nullable=False)  # posição na fila
+    ordem = Column(Integer, nullable=False)  # ticket emitido por Fila.ultimo_ticket (imutável)
     status = Column(String, default="aguardando")  # aguardando, atendido
     prioridade = Column(Enum(Priority), default=Priority.normal)  # normal, high
     horario_entrada = Column(DateTime, default=datetime.utcnow)
@@ -142,4 +166,94 @@ class UsuariosNaFila(Base):
         self.fila_id = fila_id
         self.ordem = ordem
         self.status = status
-        self.prioridade = prioridade
\ No newline at end of file
+        self.prioridade = prioridade
+
+    @property
+    def codigo_ticket(self) -> str:
+        """Ticket para exibição no painel: N042 (normal), P007 (prioridade)"""
+        return formatar_ticket(self.ordem, self.prioridade)  # type: ignore
+
+
+# -------------------------
+# Histórico (entradas finalizadas)
+# -------------------------
+class HistoricoFila(Base):
+    """Entrada que saiu de usuarios_na_fila (atendida ou cancelada).
+
+    `mes` (AAAAMM de quando a entrada foi finalizada) é a chave de partição:
+    consultas por período e limpeza de meses antigos usam só ela. Os nomes da
+    fila e do estabelecimento são copiados para o histórico não depender de
+    joins nem das filas continuarem existindo.
+    """
+    __tablename__ = "historico_filas"
+    __table_args__ = (
+        # Histórico do cliente, já na ordem de exibição
+        Index("ix_historico_filas_usuario_entrada", "usuario_id", "horario_entrada"),
+        # Relatórios e limpeza por mês
+        Index("ix_historico_filas_mes_fila", "mes", "fila_id"),
+        # Últimos atendimentos da fila (aquecimento da estimativa de espera)
+        Index("ix_historico_filas_fila_saida", "fila_id", "horario_saida"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    entrada_id = Column(Integer, nullable=False)  # id que a entrada tinha em usuarios_na_fila
+    usuario_id = Column(Integer, nullable=False)
+    fila_id = Column(Integer, nullable=False)
+    ordem = Column(Integer, nullable=False)
+    prioridade = Column(Enum(Priority), default=Priority.normal)
+    status = Column(String, nullable=False)  # atendido, cancelado
+    horario_entrada = Column(DateTime, nullable=True)
+    horario_saida = Column(DateTime, nullable=True)  # para atendidos, o horário da chamada
+    mes = Column(Integer, nullable=False)
+    fila_nome = Column(String, nullable=True)
+    estabelecimento_nome = Column(String, nullable=True)
+
+    @property
+    def codigo_ticket(self) -> str:
+        return formatar_ticket(self.ordem, self.prioridade)  # type: ignore
+
+
+# -------------------------
+# Log de eventos das filas
+# -------------------------
+class EventoFila(Base):
+    """Transição de uma fila (entrada, chamada, saída, remoção), só acrescentada, nunca alterada.
+
+    `seq` é contínua dentro de cada fila e vem de Fila.ultimo_evento, reservado
+    no mesmo UPDATE que mexe nos contadores. Sem FK para filas: o log continua
+    existindo depois que a fila é apagada.
+    """
+    __tablename__ = "eventos_fila"
+    __table_args__ = (
+        # Reprodução a partir de um snapshot: eventos da fila depois de uma sequência
+        Index("uq_eventos_fila_fila_seq", "fila_id", "seq", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    fila_id = Column(Integer, nullable=False)
+    seq = Column(Integer, nullable=False)
+    tipo = Column(String(10), nullable=False)  # entrada, chamada, saida, remocao, recarga
+    entrada_id = Column(Integer, nullable=True)
+    usuario_id = Column(Integer, nullable=True)
+    prioridade = Column(Enum(Priority), nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SnapshotFila(Base):
+    """Quem estava aguardando na fila depois do evento `seq`; o estado atual é este mais os eventos seguintes"""
+    __tablename__ = "snapshots_fila"
+
+    fila_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False)
+    entradas = Column(Text, nullable=False)  # JSON compacto: [[entrada_id, usuario_id, 1 se prioridade alta], ...]
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def mes_particao(momento: datetime) -> int:
+    """Chave de partição do histórico: AAAAMM"""
+    return momento.year * 100 + momento.month
+
+
+def formatar_ticket(ordem: int, prioridade: Optional[Priority] = None) -> str:
+    prefixo = "P" if prioridade == Priority.high else "N"
+    return f"{prefixo}{ordem:03d}"
\ No newline at end of file
@@ -0,0 +1,63 @@
+# Paginação por cursor (keyset)
+# A próxima página continua depois da última chave vista, em vez de pular linhas com OFFSET
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response  # type: ignore
+from sqlalchemy import DateTime, and_, or_  # type: ignore
+
+# Tamanho de página quando o cliente não informa `limite`, e o máximo aceito
+PAGINA_PADRAO = 50
+PAGINA_MAX = 200
+
+# Cabeçalho com o cursor da próxima página (ausente na última)
+CABECALHO_CURSOR = "X-Proximo-Cursor"
+
+
+def encode_cursor(valores: Sequence[Any]) -> str:
+    dados = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, colunas: Sequence) -> List[Any]:
+    """Valores da chave guardados no cursor, já no tipo de cada coluna; cursor malformado vira 400"""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(valor) if isinstance(coluna.type, DateTime) else valor
+            for coluna, valor in zip(colunas, valores)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginate(consulta, chave: Sequence, cursor: Optional[str], limite: int, descendente: bool = False) -> Tuple[list, Optional[str]]:
+    """Uma página de `consulta` ordenada por `chave` (colunas que juntas são únicas).
+
+    Devolve (itens, cursor da próxima página ou None). A condição é expandida
+    em (a > x) OR (a = x AND b > y), que usa índice tanto no SQLite quanto no
+    PostgreSQL.
+    """
+    if cursor:
+        valores = decode_cursor(cursor, chave)
+        condicoes = []
+        for i, (coluna, valor) in enumerate(zip(chave, valores)):
+            iguais = [c == v for c, v in zip(chave[:i], valores[:i])]
+            condicoes.append(and_(*iguais, coluna < valor if descendente else coluna > valor))
+        consulta = consulta.filter(or_(*condicoes))
+
+    ordem = [coluna.desc() if descendente else coluna for coluna in chave]
+    itens = consulta.order_by(*ordem).limit(limite + 1).all()
+    if len(itens) <= limite:
+        return itens, None
+    itens = itens[:limite]
+    return itens, encode_cursor([getattr(itens[-1], coluna.key) for coluna in chave])
+
+
+def set_cursor_header(response: Response, proximo: Optional[str]):
+    if proximo:
+        response.headers[CABECALHO_CURSOR] = proximo
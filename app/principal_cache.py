@@ -0,0 +1,91 @@
+# Cache de usuários autenticados
+# Evita um SELECT em usuarios a cada requisição: guarda por (usuario_id, token) uma cópia das colunas do usuário
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from sqlalchemy import inspect  # type: ignore
+from sqlalchemy.orm import Session, make_transient_to_detached  # type: ignore
+from sqlalchemy.orm.attributes import set_committed_value  # type: ignore
+from app.models import Usuario
+
+# Colunas copiadas do usuário (inclui role, ativo e establishment_id)
+_MAPPER = inspect(Usuario)
+_COLUNAS = [coluna.key for coluna in _MAPPER.column_attrs]
+
+
+class PrincipalCache:
+    """Cache LRU com TTL dos usuários autenticados.
+
+    A entrada vale até o menor entre o TTL configurado e a expiração do token.
+    Quem altera role, ativo ou establishment_id de um usuário deve chamar
+    invalidate(usuario_id); o TTL limita o atraso entre processos diferentes.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, Dict]]" = OrderedDict()
+        self._by_user: Dict[int, Set[Tuple[int, str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, usuario_id: int, token: str, session: Session) -> Optional[Usuario]:
+        """Devolve o usuário ligado à sessão informada, sem consultar o banco"""
+        chave = (usuario_id, token)
+        with self._lock:
+            entrada = self._entries.get(chave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                if entrada is not None:
+                    self._drop(chave)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(chave)
+            self.hits += 1
+            colunas = entrada[1]
+
+        # Reconstrói a instância como se tivesse vindo do banco e anexa à sessão sem SELECT
+        usuario = _MAPPER.class_manager.new_instance()
+        for chave_coluna, valor in colunas.items():
+            set_committed_value(usuario, chave_coluna, valor)
+        make_transient_to_detached(usuario)
+        return session.merge(usuario, load=False)
+
+    def put(self, usuario: Usuario, token: str, token_exp: Optional[float] = None):
+        validade = self.ttl
+        if token_exp is not None:
+            validade = min(validade, token_exp - time.time())
+        if validade <= 0:
+            return
+        colunas = {chave: getattr(usuario, chave) for chave in _COLUNAS}
+        chave = (usuario.id, token)  # type: ignore
+        with self._lock:
+            self._entries[chave] = (time.monotonic() + validade, colunas)
+            self._entries.move_to_end(chave)
+            self._by_user.setdefault(usuario.id, set()).add(chave)  # type: ignore
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, usuario_id: int):
+        """Descarta todas as entradas do usuário (ex.: mudou de role ou de estabelecimento)"""
+        with self._lock:
+            for chave in self._by_user.pop(usuario_id, set()):
+                self._entries.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, chave: Tuple[int, str]):
+        self._entries.pop(chave, None)
+        chaves = self._by_user.get(chave[0])
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del self._by_user[chave[0]]
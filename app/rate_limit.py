@@ -0,0 +1,158 @@
+# Limite de taxa (token bucket) por usuário, IP e fila
+# A recusa acontece antes de qualquer consulta: 429 com Retry-After
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+from fastapi import HTTPException, Request  # type: ignore
+from app.config import (
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_JOIN_FILA,
+    RATE_LIMIT_JOIN_IP,
+    RATE_LIMIT_JOIN_USER,
+    RATE_LIMIT_TRUST_FORWARDED,
+)
+from app.metrics import rate_limited
+
+# (capacidade do balde, tokens repostos por segundo)
+Limite = Tuple[float, float]
+
+
+def parse_limite(texto: str) -> Optional[Limite]:
+    """ "10/60" = rajada de até 10 e 10 por minuto em regime; vazio ou "0" desativa"""
+    texto = (texto or "").strip()
+    if texto in ("", "0"):
+        return None
+    quantidade, segundos = texto.split("/", 1) if "/" in texto else (texto, "1")
+    return float(quantidade), float(quantidade) / float(segundos)
+
+
+class MemoryBackend:
+    """Baldes na memória do processo; cada worker tem os seus (LRU limitado)"""
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self._baldes: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # chave -> (tokens, instante)
+        self._lock = threading.Lock()
+
+    def take(self, chave: str, capacidade: float, taxa: float) -> float:
+        """Consome um token; devolve 0 se conseguiu ou quantos segundos faltam para o próximo"""
+        agora = time.monotonic()
+        with self._lock:
+            tokens, antes = self._baldes.pop(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - antes) * taxa)
+            espera = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                espera = (1 - tokens) / taxa
+            self._baldes[chave] = (tokens, agora)
+            while len(self._baldes) > self.max_size:
+                self._baldes.popitem(last=False)
+        return espera
+
+    def clear(self):
+        with self._lock:
+            self._baldes.clear()
+
+
+# Mesmo cálculo do MemoryBackend, atômico no Redis
+_TOKEN_BUCKET_LUA = """
+local capacidade = tonumber(ARGV[1])
+local taxa = tonumber(ARGV[2])
+local agora = tonumber(ARGV[3])
+local estado = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(estado[1]) or capacidade
+local antes = tonumber(estado[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - antes) * taxa)
+local espera = 0
+if tokens >= 1 then tokens = tokens - 1 else espera = (1 - tokens) / taxa end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', agora)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidade / taxa) + 1)
+return tostring(espera)
+"""
+
+
+class RedisBackend:
+    """Baldes compartilhados entre workers e máquinas (requer `pip install redis`).
+
+    Se o Redis ficar indisponível a requisição passa: o limite protege a fila,
+    não deve derrubá-la.
+    """
+
+    def __init__(self, url: str):
+        import redis  # type: ignore  # dependência opcional, só com RATE_LIMIT_BACKEND=redis://...
+
+        self._erros = (redis.RedisError,)
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+
+    def take(self, chave: str, capacidade: float, taxa: float) -> float:
+        try:
+            return float(self._script(keys=[f"filadigital:limite:{chave}"], args=[capacidade, taxa, time.time()]))
+        except self._erros:
+            return 0.0
+
+
+def criar_backend(url: str):
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"RATE_LIMIT_BACKEND desconhecido: {url}")
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """IP do cliente; atrás de um proxy confiável, o primeiro do X-Forwarded-For"""
+    if RATE_LIMIT_TRUST_FORWARDED:
+        encaminhado = request.headers.get("x-forwarded-for")
+        if encaminhado:
+            return encaminhado.split(",", 1)[0].strip()
+    return request.client.host if request.client else None
+
+
+class RateLimiter:
+    """Um conjunto de baldes por escopo (ex.: usuario, ip, fila) para um tipo de operação"""
+
+    def __init__(self, nome: str, backend, limites: Dict[str, Optional[Limite]], enabled: bool = True):
+        self.nome = nome
+        self.backend = backend
+        self.limites = limites
+        self.enabled = enabled
+
+    def check(self, **chaves: Optional[Hashable]):
+        """Consome um token de cada balde, na ordem dos argumentos; o primeiro vazio vira 429.
+
+        Os escopos mais específicos vêm primeiro: um cliente insistente esgota o
+        próprio balde antes de gastar o da fila.
+        """
+        if not self.enabled:
+            return
+        for escopo, valor in chaves.items():
+            limite = self.limites.get(escopo)
+            if valor is None or limite is None:
+                continue
+            espera = self.backend.take(f"{self.nome}:{escopo}:{valor}", *limite)
+            if espera > 0:
+                rate_limited.inc(self.nome, escopo)
+                raise HTTPException(
+                    status_code=429,
+                    detail="Muitas tentativas. Aguarde alguns segundos e tente novamente.",
+                    headers={"Retry-After": str(max(1, math.ceil(espera)))}
+                )
+
+
+# Entradas em fila (normal e via QR Code) compartilham os mesmos baldes
+join_limiter = RateLimiter(
+    "entrada",
+    criar_backend(RATE_LIMIT_BACKEND),
+    {
+        "usuario": parse_limite(RATE_LIMIT_JOIN_USER),
+        "ip": parse_limite(RATE_LIMIT_JOIN_IP),
+        "fila": parse_limite(RATE_LIMIT_JOIN_FILA),
+    },
+    enabled=RATE_LIMIT_ENABLED,
+)
@@ -1,42 +1,34 @@
 # Router para operações de estabelecimentos
 # Gerencia criação, listagem e exclusão de estabelecimentos
 
-from fastapi import APIRouter, Depends, HTTPException  # type: ignore
+from fastapi import APIRouter, Depends, HTTPException, Query, Response  # type: ignore
+from typing import Optional
 from sqlalchemy.orm import Session  # type: ignore
-from app.dependencies import obter_sessao, verificar_token, verificar_dono_estabelecimento, require_role
+from app.dependencies import obter_sessao, verificar_token, verificar_dono_estabelecimento, require_role, principal_cache
 from app.models import Role, Estabelecimento, Usuario, Fila, UsuariosNaFila
-from app.schemas import EstabelecimentoSchema
-from app.services import DashboardService
+from app.pagination import PAGINA_MAX, PAGINA_PADRAO, paginate, set_cursor_header
+from app.schemas import EstabelecimentoSchema, EstabelecimentosSaida, DashboardDonoSaida, FuncionariosSaida
+from app.services import DashboardService, QueueService
 
 router = APIRouter(dependencies=[Depends(verificar_token)])
 
-@router.get("/")
-async def listar_estabelecimentos(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+@router.get("/", response_model=EstabelecimentosSaida)
+def listar_estabelecimentos(response: Response, cursor: Optional[str] = None, limite: int = Query(PAGINA_PADRAO, ge=1, le=PAGINA_MAX),
+                            session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     """
-    Lista todos os estabelecimentos do usuário logado
+    Lista os estabelecimentos do usuário logado, paginados por id
     """
-    estabelecimentos = session.query(Estabelecimento).filter(Estabelecimento.usuario_id == current_user.id).all() # type: ignore
+    consulta = session.query(Estabelecimento).filter(Estabelecimento.usuario_id == current_user.id) # type: ignore
+    estabelecimentos, proximo = paginate(consulta, [Estabelecimento.id], cursor, limite)
+    set_cursor_header(response, proximo)
 
-    # Retornar dados formatados para o front-end
-    resultado = []
-    for est in estabelecimentos:
-        resultado.append({
-            "id": est.id,
-            "nome": est.nome,
-            "rua": est.rua,
-            "bairro": est.bairro,
-            "cidade": est.cidade,
-            "estado": est.estado,
-            "telefone": est.telefone,
-            "usuario_id": est.usuario_id
-        })
-
-    return {"estabelecimentos": resultado}
+    # EstabelecimentoSaida lê os campos direto dos objetos
+    return {"estabelecimentos": estabelecimentos, "proximo_cursor": proximo}
 
 
 # Cria o estabelecimento
 @router.post("/criar-estabelecimento")
-async def criar_estabelecimento(estabelecimento_schema: EstabelecimentoSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+def criar_estabelecimento(estabelecimento_schema: EstabelecimentoSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     novo_estabelecimento = Estabelecimento(
         nome=estabelecimento_schema.nome, 
         rua=estabelecimento_schema.rua,
@@ -55,7 +47,7 @@ async def criar_estabelecimento(estabelecimento_schema: EstabelecimentoSchema, s
 
 # Apaga o estabelecimento
 @router.post("/deletar-estabelecimento/{estabelecimento_id}")
-async def cancelar_estabelecimento(estabelecimento_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+def cancelar_estabelecimento(estabelecimento_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
 
     estabelecimento = session.query(Estabelecimento).filter(Estabelecimento.id == estabelecimento_id).first()
     if not estabelecimento:
@@ -64,34 +56,38 @@ async def cancelar_estabelecimento(estabelecimento_id: int, session: Session = D
     verificar_dono_estabelecimento(estabelecimento, current_user)
 
     # Apaga todas as filas associadas ao estabelecimento
+    filas_ids = [fila.id for fila in estabelecimento.filas]
     for fila in estabelecimento.filas:
+        QueueService.record_queue_removal(session, fila.id)  # type: ignore
         session.delete(fila)
 
     # Depois apaga o estabelecimento
     session.delete(estabelecimento)
     session.commit()
+    for fila_id in filas_ids:
+        QueueService.discard_queue(fila_id)
 
     return {
         "mensagem": f"Estabelecimento {estabelecimento_id} apagado com sucesso!"
     }
 
 # Dashboard para owner: estatísticas dos estabelecimentos
-@router.get("/dashboard")
-async def dashboard_owner(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+@router.get("/dashboard", response_model=DashboardDonoSaida)
+def dashboard_owner(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     return DashboardService.get_owner_dashboard(current_user, session)
 
 # Listar funcionários de um estabelecimento (para owner)
-@router.get("/{estabelecimento_id}/funcionarios")
-async def listar_funcionarios(estabelecimento_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+@router.get("/{estabelecimento_id}/funcionarios", response_model=FuncionariosSaida)
+def listar_funcionarios(estabelecimento_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     estabelecimento = session.query(Estabelecimento).filter(Estabelecimento.id == estabelecimento_id).first()
     if not estabelecimento or estabelecimento.usuario_id != current_user.id: #type: ignore
         raise HTTPException(status_code=403, detail="Acesso negado")
-    funcionarios = session.query(Usuario).filter(Usuario.establishment_id == estabelecimento_id, Usuario.role == Role.employee).all() #type: ignore
-    return {"funcionarios": [{"id": f.id, "nome": f.nome, "email": f.email} for f in funcionarios]}
+    funcionarios = session.query(Usuario).filter(Usuario.establishment_id == estabelecimento_id, Usuario.role == Role.funcionario).all() #type: ignore
+    return {"funcionarios": funcionarios}
 
 # Adicionar funcionário a estabelecimento (para owner)
 @router.post("/{estabelecimento_id}/adicionar-funcionario")
-async def adicionar_funcionario(estabelecimento_id: int, funcionario_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+def adicionar_funcionario(estabelecimento_id: int, funcionario_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     estabelecimento = session.query(Estabelecimento).filter(Estabelecimento.id == estabelecimento_id).first()
     if not estabelecimento or estabelecimento.usuario_id != current_user.id: #type: ignore
         raise HTTPException(status_code=403, detail="Acesso negado")
@@ -101,4 +97,6 @@ async def adicionar_funcionario(estabelecimento_id: int, funcionario_id: int, se
     funcionario.role = Role.funcionario
     funcionario.establishment_id = estabelecimento_id
     session.commit()
+    # Role e estabelecimento mudaram: o próximo request do funcionário relê do banco
+    principal_cache.invalidate(funcionario_id)
     return {"message": "Funcionário adicionado com sucesso"}
\ No newline at end of file
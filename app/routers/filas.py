@@ -1,75 +1,76 @@
 # Router para operações de filas
 # Gerencia criação, entrada/saída de filas, QR codes e dashboards
 
-from fastapi import APIRouter, Depends, HTTPException  # type: ignore
-from sqlalchemy.orm import Session  # type: ignore
-from app.dependencies import obter_sessao, verificar_token, verificar_dono_fila, impedir_owner_employee_entrar, calcular_ordem, chamar_proximo, require_role, require_establishment_access, require_queue_access
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response  # type: ignore
+from typing import List, Optional, Union
+from sqlalchemy.orm import Session, contains_eager  # type: ignore
+from app.dependencies import obter_sessao, verificar_token, verificar_dono_fila, impedir_owner_employee_entrar, chamar_proximo, require_role, require_establishment_access, require_queue_access
 from app.services import QueueService, QRCodeService, NotificationService, DashboardService
+from app.services.history import HistoryRepository
+from app.services.qr_tokens import formatar_validade, qr_signer
 from app.models import Priority, Role, Fila, UsuariosNaFila, Usuario, Estabelecimento
-from app.schemas import CriarFilaSchema, UsuariosNaFilaSchema
+from app.rate_limit import client_ip, join_limiter
+from app.pagination import PAGINA_MAX, PAGINA_PADRAO, paginate, set_cursor_header
+from app.schemas import (
+    CriarFilaSchema, UsuariosNaFilaSchema, EntradaLoteSchema, ChamarProximosSchema, EntradaQRSchema,
+    FilasSaida, FilasDisponiveisSaida, ChamadaSaida, ChamadosSaida, PosicaoSaida, HistoricoSaida,
+    EntradaSaida, EntradaQRSaida, LoteSaida, QRCodeSaida, DashboardFuncionarioSaida, ErroSaida, DashboardClienteSaida
+)
 
 router = APIRouter(dependencies=[Depends(verificar_token)])
 
-@router.get("/")
-async def listar_filas_usuario(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+
+async def _corpo_json(request: Request) -> dict:
+    # O FastAPI já leu e guardou o corpo para validar o schema da rota: não há nova leitura
+    try:
+        corpo = await request.json()
+    except ValueError:
+        return {}
+    return corpo if isinstance(corpo, dict) else {}
+
+# Limites de tentativas de entrada: usuário, IP e fila, antes de qualquer consulta
+# (o usuário vem do cache de autenticação, então uma recusa não executa SQL)
+async def limitar_entrada(request: Request, current_user: Usuario = Depends(verificar_token)):
+    fila_id = (await _corpo_json(request)).get("fila_id")
+    join_limiter.check(usuario=current_user.id, ip=client_ip(request), fila=fila_id)
+
+async def limitar_entrada_qr(request: Request, current_user: Usuario = Depends(verificar_token)):
+    qr_code = (await _corpo_json(request)).get("qr_code") or request.query_params.get("qr_code")
+    try:
+        # Só conta no balde da fila um token com assinatura válida
+        fila_id = qr_signer.verify(qr_code)[0] if qr_code else None
+    except ValueError:
+        fila_id = None
+    join_limiter.check(usuario=current_user.id, ip=client_ip(request), fila=fila_id)
+
+@router.get("/", response_model=FilasSaida)
+def listar_filas_usuario(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     """
     Lista todas as filas dos estabelecimentos do usuário logado
     """
-    filas = session.query(Fila).join(Estabelecimento).filter(Estabelecimento.usuario_id == current_user.id).all() # type: ignore
+    filas = session.query(Fila).join(Estabelecimento).options(contains_eager(Fila.estabelecimento))\
+        .filter(Estabelecimento.usuario_id == current_user.id).all() # type: ignore
 
-    # Contar pessoas em cada fila
-    resultado = []
-    for fila in filas:
-        pessoas_na_fila = session.query(UsuariosNaFila).filter(
-            UsuariosNaFila.fila_id == fila.id, # type: ignore
-            UsuariosNaFila.status == "aguardando" # type: ignore
-        ).count()
-
-        resultado.append({
-            "id": fila.id,
-            "nome": fila.nome,
-            "descricao": fila.descricao,
-            "estabelecimento_id": fila.estabelecimento_id,
-            "estabelecimento": {
-                "id": fila.estabelecimento.id,
-                "nome": fila.estabelecimento.nome
-            },
-            "pessoas_na_fila": pessoas_na_fila
-        })
+    # FilaSaida lê os campos dos objetos; pessoas_na_fila vem dos contadores da própria fila
+    return {"filas": filas}
 
-    return {"filas": resultado}
-
-@router.get("/disponiveis")
-async def listar_filas_disponiveis(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.usuario))):
+@router.get("/disponiveis", response_model=FilasDisponiveisSaida)
+def listar_filas_disponiveis(response: Response, cursor: Optional[str] = None, limite: int = Query(PAGINA_PADRAO, ge=1, le=PAGINA_MAX),
+                             session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.usuario))):
     """
-    Lista filas disponíveis de outros estabelecimentos (não do usuário logado)
+    Lista filas disponíveis de outros estabelecimentos (não do usuário logado), paginadas por id
     """
-    filas = session.query(Fila).join(Estabelecimento).filter(Estabelecimento.usuario_id != current_user.id).all() # type: ignore
-
-    resultado = []
-    for fila in filas:
-        pessoas_na_fila = session.query(UsuariosNaFila).filter(
-            UsuariosNaFila.fila_id == fila.id, # type: ignore
-            UsuariosNaFila.status == "aguardando" # type: ignore
-        ).count()
-
-        resultado.append({
-            "id": fila.id,
-            "nome": fila.nome,
-            "descricao": fila.descricao,
-            "estabelecimento_id": fila.estabelecimento_id,
-            "estabelecimento": {
-                "id": fila.estabelecimento.id,
-                "nome": fila.estabelecimento.nome
-            },
-            "pessoas_na_fila": pessoas_na_fila
-        })
+    # O estabelecimento vem no mesmo SELECT, sem uma consulta por fila
+    consulta = session.query(Fila).join(Estabelecimento).options(contains_eager(Fila.estabelecimento))\
+        .filter(Estabelecimento.usuario_id != current_user.id) # type: ignore
+    filas, proximo = paginate(consulta, [Fila.id], cursor, limite)
+    set_cursor_header(response, proximo)
 
-    return {"filas": resultado}
+    return {"filas": filas, "proximo_cursor": proximo}
 
 # Rota para criar uma fila
 @router.post("/criar-fila")
-async def criar_fila(criar_fila_schema: CriarFilaSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+def criar_fila(criar_fila_schema: CriarFilaSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     nova_fila = Fila(
         nome = criar_fila_schema.nome, 
         descricao = criar_fila_schema.descricao,
@@ -84,12 +85,13 @@ async def criar_fila(criar_fila_schema: CriarFilaSchema, session: Session = Depe
 
 # Rota para apagar fila completa
 @router.post("/apagar-fila/{fila_id}")
-async def apagar_fila(fila_id: int, session: Session = Depends (obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+def apagar_fila(fila_id: int, session: Session = Depends (obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
     fila = session.query(Fila).filter(Fila.id == fila_id).first()
     if not fila:
         raise HTTPException(status_code=404, detail="Fila não encontrada")
     
     verificar_dono_fila(fila, current_user)
+    QueueService.record_queue_removal(session, fila_id)
     
     # deletar os usuarios da fila
     usuarios = session.query(UsuariosNaFila).filter(UsuariosNaFila.fila_id == fila_id).all() #type: ignore
@@ -99,19 +101,29 @@ async def apagar_fila(fila_id: int, session: Session = Depends (obter_sessao), c
     # Em seguida deleta a fila
     session.delete(fila)
     session.commit()
+    QueueService.discard_queue(fila_id)
+    NotificationService.notify_queue_updated(fila, session, "removida")
 
     return {
         "mensagem": f"Fila de {fila_id} apagado com sucesso!"
     }
 
 
-# Rota para chamar o proximo da fila
-@router.post("/{fila_id}/chamar-proximo")
-async def chamar_proximo_usuario(fila_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
-    fila = session.query(Fila).filter(Fila.id == fila_id).first()
-
+def _fila_da_equipe(fila_id: int, session: Session, current_user: Usuario) -> Fila:
+    """Fila (com o estabelecimento, no mesmo SELECT) que o dono ou um funcionário do estabelecimento pode operar"""
+    fila = session.query(Fila).join(Fila.estabelecimento).options(contains_eager(Fila.estabelecimento))\
+        .filter(Fila.id == fila_id).first()
     if not fila:
         raise HTTPException(status_code=404, detail="Fila não encontrada")
+    if fila.estabelecimento.usuario_id != current_user.id and current_user.establishment_id != fila.estabelecimento_id:
+        raise HTTPException(status_code=403, detail="Acesso negado à fila")
+    return fila
+
+
+# Rota para chamar o proximo da fila
+@router.post("/{fila_id}/chamar-proximo", response_model=ChamadaSaida)
+def chamar_proximo_usuario(fila_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+    fila = _fila_da_equipe(fila_id, session, current_user)
 
     # Usar o novo service para chamar próximo com prioridades
     usuario_chamado = QueueService.call_next_customer(fila, session, current_user)
@@ -119,16 +131,51 @@ async def chamar_proximo_usuario(fila_id: int, session: Session = Depends(obter_
     if not usuario_chamado:
         raise HTTPException(status_code=404, detail="Não tem mais usuarios aguardando!")
 
+    NotificationService.notify_customer_called(usuario_chamado, session)
+    NotificationService.notify_queue_updated(fila, session, "chamada")
+
     return {
         "message": f"Usuário {usuario_chamado.usuario_id} foi chamado!",
-        "ordem": usuario_chamado.ordem
+        "ordem": usuario_chamado.ordem,
+        "codigo_ticket": usuario_chamado.codigo_ticket
+    }
+
+
+# Chama vários clientes de uma vez (vários guichês abrindo juntos)
+@router.post("/{fila_id}/chamar-proximos", response_model=ChamadosSaida)
+def chamar_proximos_usuarios(fila_id: int, chamada: ChamarProximosSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+    fila = _fila_da_equipe(fila_id, session, current_user)
+
+    chamados = QueueService.call_next_customers(fila, session, current_user, chamada.quantidade)  # type: ignore
+
+    if not chamados:
+        raise HTTPException(status_code=404, detail="Não tem mais usuarios aguardando!")
+
+    # Cada cliente recebe o próprio aviso; painéis e demais clientes, uma atualização só
+    for chamado, guiche in zip(chamados, chamada.guiches):  # type: ignore
+        NotificationService.notify_customer_called(chamado, session, guiche)
+    NotificationService.notify_queues_updated([fila_id], session, "chamada")
+
+    return {
+        "chamados": [
+            {
+                "usuario_id": chamado.usuario_id,
+                "entrada_id": chamado.id,
+                "ordem": chamado.ordem,
+                "codigo_ticket": chamado.codigo_ticket,
+                "prioridade": chamado.prioridade,
+                "guiche": guiche
+            } for chamado, guiche in zip(chamados, chamada.guiches)  # type: ignore
+        ],
+        "guiches_livres": chamada.guiches[len(chamados):]  # type: ignore
     }
 
 
 # Rota para carregar a posição do usuario
-@router.get("/minha-posicao")
-async def minha_posicao(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
-    posicoes = session.query(UsuariosNaFila).join(Fila).join(Estabelecimento).filter(
+@router.get("/minha-posicao", response_model=List[PosicaoSaida])
+def minha_posicao(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+    posicoes = session.query(UsuariosNaFila).join(Fila).join(Estabelecimento)\
+        .options(contains_eager(UsuariosNaFila.fila).contains_eager(Fila.estabelecimento)).filter(
         UsuariosNaFila.usuario_id == current_user.id, # type: ignore
         UsuariosNaFila.status == "aguardando" # type: ignore
     ).all()
@@ -137,10 +184,13 @@ async def minha_posicao(session: Session = Depends(obter_sessao), current_user:
     for pos in posicoes:
         resultado.append({
             "id": pos.id,
+            "fila_id": pos.fila_id,
             "fila_nome": pos.fila.nome,
             "fila_descricao": pos.fila.descricao,
             "estabelecimento_nome": pos.fila.estabelecimento.nome,
-            "posicao": pos.ordem,
+            "posicao": QueueService.get_position(pos, session),
+            "codigo_ticket": pos.codigo_ticket,
+            **QueueService.estimate_wait(pos, session),
             "status": pos.status
         })
 
@@ -148,14 +198,15 @@ async def minha_posicao(session: Session = Depends(obter_sessao), current_user:
 
 
 # Rota para para pegar o historico de filas
-@router.get("/historico")
-async def historico(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+@router.get("/historico", response_model=List[HistoricoSaida])
+def historico(response: Response, cursor: Optional[str] = None, limite: int = Query(PAGINA_PADRAO, ge=1, le=PAGINA_MAX),
+              session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+
+    # Entradas finalizadas ficam no histórico, com os nomes já copiados: uma consulta, sem joins.
+    # A resposta continua sendo uma lista; o cursor da próxima página vem no cabeçalho X-Proximo-Cursor
+    historico_entradas, proximo = HistoryRepository.page_for_user(session, current_user.id, cursor, limite)  # type: ignore
+    set_cursor_header(response, proximo)
 
-    historico_entradas = session.query(UsuariosNaFila).join(Fila).join(Estabelecimento).filter(
-        UsuariosNaFila.usuario_id == current_user.id, # type: ignore
-        UsuariosNaFila.status != "aguardando" # type: ignore
-    ).all()
-    
     resultado = []
     for entry in historico_entradas:
         # Mapear status para o formato esperado pelo frontend
@@ -165,10 +216,11 @@ async def historico(session: Session = Depends(obter_sessao), current_user: Usua
             status_frontend = "cancelado"  # Para outros status
         
         resultado.append({
-            "data_hora": entry.horario_entrada.isoformat(),
-            "fila_nome": entry.fila.nome,
-            "estabelecimento_nome": entry.fila.estabelecimento.nome,
+            "data_hora": entry.horario_entrada,
+            "fila_nome": entry.fila_nome,
+            "estabelecimento_nome": entry.estabelecimento_nome,
             "posicao_final": entry.ordem,
+            "codigo_ticket": entry.codigo_ticket,
             "status": status_frontend
         })
     
@@ -177,7 +229,7 @@ async def historico(session: Session = Depends(obter_sessao), current_user: Usua
 
 # Rota para sair da fila
 @router.delete("/sair-da-fila/{posicao_id}")
-async def sair_da_fila(posicao_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+def sair_da_fila(posicao_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
     # Buscar a entrada na fila
     entrada = session.query(UsuariosNaFila).filter(
         UsuariosNaFila.id == posicao_id, # type: ignore
@@ -188,15 +240,16 @@ async def sair_da_fila(posicao_id: int, session: Session = Depends(obter_sessao)
         raise HTTPException(status_code=404, detail="Entrada na fila não encontrada")
 
     # Remover a entrada
-    session.delete(entrada)
-    session.commit()
+    fila = entrada.fila
+    QueueService.remove_customer(entrada, session)
+    NotificationService.notify_queue_updated(fila, session, "saida")
 
     return {"message": "Você saiu da fila com sucesso!"}
 
 
 # Para entrar usuarios na fila:
-@router.post("/entrar-na-fila")
-async def entrar_na_fila(usuarios_na_fila_schema: UsuariosNaFilaSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+@router.post("/entrar-na-fila", response_model=EntradaSaida, dependencies=[Depends(limitar_entrada)])
+def entrar_na_fila(usuarios_na_fila_schema: UsuariosNaFilaSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
     fila = session.query(Fila).filter(Fila.id == usuarios_na_fila_schema.fila_id).first() # type: ignore
     if not fila:
         raise HTTPException(status_code=404, detail="Fila não encontrada")
@@ -206,65 +259,111 @@ async def entrar_na_fila(usuarios_na_fila_schema: UsuariosNaFilaSchema, session:
 
     try:
         nova_entrada = QueueService.add_customer_to_queue(fila, current_user, session, prioridade)
+        posicao = QueueService.get_position(nova_entrada, session)
 
         # Notificar sobre mudança na fila
-        NotificationService.notify_queue_updated(fila, session)
+        NotificationService.notify_queue_updated(fila, session, "entrada")
 
         return {
             "message": f"Você entrou na fila {fila.id} com sucesso!",
-            "ordem_na_fila": nova_entrada.ordem,
+            "ordem_na_fila": posicao,
+            "ticket": nova_entrada.ordem,
+            "codigo_ticket": nova_entrada.codigo_ticket,
             "prioridade": prioridade.value,
-            "pessoas_na_frente": nova_entrada.ordem - 1
+            "pessoas_na_frente": posicao - 1  # type: ignore
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-# Gerar QR Code para fila presencial
-@router.get("/{fila_id}/qr-code")
-async def gerar_qr_code_fila(fila_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+# Entrada de vários clientes de uma vez (quiosque da recepção, importação de atendimentos presenciais)
+@router.post("/entrar-em-lote", response_model=LoteSaida, response_model_exclude_unset=True)
+def entrar_em_lote(lote: EntradaLoteSchema, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+    if current_user.role not in (Role.dono, Role.funcionario):  # type: ignore
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+    resultados = QueueService.add_customers_in_batch([item.model_dump() for item in lote.entradas], current_user, session)
+
+    # Uma notificação por fila alterada, não uma por cliente
+    filas_alteradas = list(dict.fromkeys(r["fila_id"] for r in resultados if r["sucesso"]))
+    NotificationService.notify_queues_updated(filas_alteradas, session, "entrada")
+
+    inseridos = sum(1 for r in resultados if r["sucesso"])
+    return {
+        "inseridos": inseridos,
+        "recusados": len(resultados) - inseridos,
+        "resultados": resultados
+    }
+
+
+def _fila_do_dono(fila_id: int, session: Session, current_user: Usuario) -> Fila:
     fila = session.query(Fila).filter(Fila.id == fila_id).first()
     if not fila:
         raise HTTPException(status_code=404, detail="Fila não encontrada")
-
-    # Verificar se o dono tem acesso à fila
     if fila.estabelecimento.usuario_id != current_user.id:
         raise HTTPException(status_code=403, detail="Acesso negado à fila")
+    return fila
 
-    # Gerar QR Code
-    qr_code = QRCodeService.generate_queue_qr(fila)
-
+def _qr_code_resposta(fila: Fila, qr_code: str, expira_em) -> dict:
     return {
-        "fila_id": fila_id,
+        "fila_id": fila.id,
         "fila_nome": fila.nome,
         "qr_code": qr_code,
         "estabelecimento": fila.estabelecimento.nome,
-        "validade": "24h"  # Em produção, implementar expiração
+        "expira_em": expira_em,
+        "validade": formatar_validade(qr_signer.ttl)
     }
 
+# Gerar QR Code para fila presencial
+@router.get("/{fila_id}/qr-code", response_model=QRCodeSaida)
+def gerar_qr_code_fila(fila_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+    fila = _fila_do_dono(fila_id, session, current_user)
+    qr_code, expira_em = QRCodeService.generate_queue_qr(fila)
+    return _qr_code_resposta(fila, qr_code, expira_em)
+
+# Rotacionar o QR Code: os já impressos ou compartilhados deixam de valer
+@router.post("/{fila_id}/qr-code/rotacionar", response_model=QRCodeSaida)
+def rotacionar_qr_code_fila(fila_id: int, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.dono))):
+    fila = _fila_do_dono(fila_id, session, current_user)
+    qr_code, expira_em = QRCodeService.rotate_queue_qr(fila, session)
+    return _qr_code_resposta(fila, qr_code, expira_em)
+
 # Entrar na fila via QR Code (para clientes presenciais)
-@router.post("/entrar-via-qr")
-async def entrar_via_qr(qr_code: str, session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+# O token vem no corpo ({"qr_code": ...}) ou, para leitores que só abrem uma URL, em ?qr_code=
+@router.post("/entrar-via-qr", response_model=EntradaQRSaida, dependencies=[Depends(limitar_entrada_qr)])
+def entrar_via_qr(dados: Optional[EntradaQRSchema] = None, qr_code: Optional[str] = None,
+                  session: Session = Depends(obter_sessao), current_user: Usuario = Depends(verificar_token)):
+    token = dados.qr_code if dados else qr_code
+    if not token:
+        raise HTTPException(status_code=400, detail="QR Code não informado")
+
     # Validar QR Code e adicionar à fila
-    entrada = QRCodeService.validate_qr_and_add_customer(qr_code, current_user, session, Priority.high)
+    try:
+        entrada = QRCodeService.validate_qr_and_add_customer(token, current_user, session, Priority.high)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     if not entrada:
         raise HTTPException(status_code=400, detail="QR Code inválido ou fila não encontrada")
 
+    NotificationService.notify_queue_updated(entrada.fila, session, "entrada")
+
     return {
         "message": "Entrada via QR Code realizada com sucesso!",
-        "ordem_na_fila": entrada.ordem,
+        "ordem_na_fila": QueueService.get_position(entrada, session),
+        "ticket": entrada.ordem,
+        "codigo_ticket": entrada.codigo_ticket,
         "prioridade": entrada.prioridade.value
     }
 
 # Dashboard do funcionário
-@router.get("/dashboard-funcionario")
-async def dashboard_funcionario(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.funcionario))):
+@router.get("/dashboard-funcionario", response_model=Union[DashboardFuncionarioSaida, ErroSaida])
+def dashboard_funcionario(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.funcionario))):
     return DashboardService.get_employee_dashboard(current_user, session)
 
 # Dashboard do cliente
-@router.get("/dashboard-cliente")
-async def dashboard_cliente(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.usuario))):
+@router.get("/dashboard-cliente", response_model=DashboardClienteSaida)
+def dashboard_cliente(session: Session = Depends(obter_sessao), current_user: Usuario = Depends(require_role(Role.usuario))):
     return DashboardService.get_customer_dashboard(current_user, session)
 
 #rodar o test
@@ -0,0 +1,72 @@
+# Router para atualizações em tempo real
+# Canal WebSocket que substitui o polling dos dashboards por deltas enviados pelo servidor
+
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, WebSocket  # type: ignore
+from fastapi.concurrency import run_in_threadpool  # type: ignore
+from sqlalchemy.orm import Session  # type: ignore
+from app.dependencies import obter_sessao, usuario_do_token
+from app.services.realtime import event_hub
+
+router = APIRouter()
+
+# Canal WebSocket: ws://.../tempo-real/ws?token=<access_token>
+#
+# O cliente já fica inscrito nas próprias notificações ("chamado" e "posicao").
+# Para acompanhar filas envia {"acao": "assinar", "fila_id": 1} ou
+# {"acao": "cancelar", "fila_id": 1} e recebe os deltas "entrada", "chamada",
+# "saida" e "removida" daquela fila. Os deltas levam só os contadores; dados de
+# cada entrada vão apenas para o próprio cliente.
+#
+# O hub é do processo: com vários workers, a conexão só recebe o que for escrito
+# pelo worker em que ela está (ver "Tempo real" no README).
+@router.websocket("/ws")
+async def canal_tempo_real(websocket: WebSocket, token: str, session: Session = Depends(obter_sessao)):
+    try:
+        # A consulta ao banco é síncrona: roda no threadpool para não travar o event loop
+        usuario = await run_in_threadpool(usuario_do_token, token, session)
+        usuario_id = usuario.id
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        # A conexão fica aberta por muito tempo: não segura a sessão do banco
+        session.close()
+
+    await websocket.accept()
+    assinatura = event_hub.connect(usuario_id)  # type: ignore
+
+    async def enviar():
+        while True:
+            mensagem = await assinatura.queue.get()
+            await websocket.send_json(mensagem)
+
+    async def receber():
+        while True:
+            try:
+                comando = json.loads(await websocket.receive_text())
+            except ValueError:
+                comando = None
+            if not isinstance(comando, dict):
+                await websocket.send_json({"tipo": "erro", "detalhe": "comando inválido"})
+                continue
+            fila_id = comando.get("fila_id")
+            if not isinstance(fila_id, int):
+                await websocket.send_json({"tipo": "erro", "detalhe": "fila_id inválido"})
+                continue
+            if comando.get("acao") == "assinar":
+                event_hub.subscribe(assinatura, ("fila", fila_id))
+                await websocket.send_json({"tipo": "assinado", "fila_id": fila_id})
+            elif comando.get("acao") == "cancelar":
+                event_hub.unsubscribe(assinatura, ("fila", fila_id))
+
+    tarefas = [asyncio.create_task(enviar()), asyncio.create_task(receber())]
+    try:
+        await asyncio.wait(tarefas, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        # Recolhe o resultado das duas (desconexão, cancelamento) para nenhum erro ficar sem dono
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        event_hub.disconnect(assinatura)
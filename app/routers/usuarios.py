@@ -3,29 +3,46 @@
 
 from fastapi import APIRouter, Depends, HTTPException  # type: ignore
 from sqlalchemy.orm import Session  # type: ignore
-from jose import jwt, JWTError  # type: ignore
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm  # type: ignore
+from fastapi.concurrency import run_in_threadpool  # type: ignore
 from app.models import Usuario, Role
 from app.dependencies import obter_sessao, verificar_token
-from app.config import bcrypt_context, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, PASSWORD_RETRY_AFTER
+from app.services.password_pool import password_pool, PasswordPoolBusy
 from app.schemas import UsuarioSchema, LoginSchema
 
 router = APIRouter()
 
 # função para criar o token
 def criar_token(usuario_id, role, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
+    from jose import jwt  # type: ignore  # carregado no aquecimento (app.startup), não na importação
     data_expiracao = datetime.now(timezone.utc) + duracao_token
     dic_info = {"sub": str(usuario_id), "role": role.value, "exp": data_expiracao}
     enconded_jwt = jwt.encode(dic_info, SECRET_KEY, ALGORITHM) #type: ignore
     return enconded_jwt
 
+def buscar_usuario_por_email(email: str, session: Session):
+    return session.query(Usuario).filter(Usuario.email==email).first() #type: ignore
+
+# Hash/verificação de senha no pool do bcrypt; pool cheio vira 503 na hora
+async def operacao_senha(operacao, *args):
+    try:
+        return await operacao(*args)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Muitas autenticações em andamento, tente novamente em instantes",
+            headers={"Retry-After": str(PASSWORD_RETRY_AFTER)}
+        )
+
 # função para autenticar o usuário
-def autenticar_usuario(email: str, senha: str, session: Session):
-    usuario = session.query(Usuario).filter(Usuario.email==email).first() #type: ignore
+# As consultas rodam no threadpool e o bcrypt no pool próprio: nenhum dos dois trava o event loop
+async def autenticar_usuario(email: str, senha: str, session: Session):
+    usuario = await run_in_threadpool(buscar_usuario_por_email, email, session)
     if not usuario:
         return False
-    elif not bcrypt_context.verify(senha, usuario.senha): #type: ignore
+    elif not await operacao_senha(password_pool.verify, senha, usuario.senha): #type: ignore
         return False
     return usuario
 
@@ -37,11 +54,11 @@ async def home():
 # rota para registrar novo usuário
 @router.post("/registrar")
 async def registrar_usuario(usuario_schema: UsuarioSchema , session: Session = Depends(obter_sessao)):
-    usuario = session.query(Usuario).filter(Usuario.email==usuario_schema.email).first() #type: ignore
+    usuario = await run_in_threadpool(buscar_usuario_por_email, usuario_schema.email, session)
     if usuario:
         raise HTTPException(status_code=400, detail="Usuário já existe!")
     else:
-        senha_criptografada = bcrypt_context.hash(usuario_schema.senha)
+        senha_criptografada = await operacao_senha(password_pool.hash, usuario_schema.senha)
         role = usuario_schema.role if usuario_schema.role else Role.usuario
         ativo = usuario_schema.ativo if usuario_schema.ativo is not None else True
         admin = usuario_schema.admin if usuario_schema.admin is not None else False
@@ -55,13 +72,13 @@ async def registrar_usuario(usuario_schema: UsuarioSchema , session: Session = D
             usuario_schema.establishment_id
         ) #type: ignore
         session.add(novo_usuario)
-        session.commit()
+        await run_in_threadpool(session.commit)
         return {"message": f"Usuário registrado com sucesso!", "email": usuario_schema.email}
     
 # rota para login e criação do token
 @router.post("/login")
 async def login(login_schema: LoginSchema, session: Session =  Depends(obter_sessao)):
-    usuario = autenticar_usuario(login_schema.email, login_schema.senha, session)
+    usuario = await autenticar_usuario(login_schema.email, login_schema.senha, session)
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário não encontrado ou dados invalidos!")
     else:
@@ -76,7 +93,7 @@ async def login(login_schema: LoginSchema, session: Session =  Depends(obter_ses
 # rota para trocar o token via form data no docs
 @router.post("/login-form")
 async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), session: Session =  Depends(obter_sessao)):
-    usuario = autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
+    usuario = await autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário não encontrado ou dados invalidos!")
     else:
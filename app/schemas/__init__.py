@@ -1,8 +1,9 @@
 # Schemas Pydantic para validação e serialização de dados
 # Define os modelos de entrada e saída da API
 
-from pydantic import BaseModel  # type: ignore
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, model_validator  # type: ignore
+from typing import List, Optional
 from app.models import Role, Priority
 
 class UsuarioSchema(BaseModel):
@@ -57,4 +58,235 @@ class UsuariosNaFilaSchema(BaseModel):
     prioridade: Optional[Priority] = Priority.normal
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class EntradaQRSchema(BaseModel):
+    """Token lido do QR Code da fila"""
+    qr_code: str
+
+# Limite de itens por lote de entradas (quiosques e importações)
+LOTE_MAX_ITENS = 500
+
+class EntradaLoteItemSchema(BaseModel):
+    """Um cliente a ser colocado em uma fila dentro de um lote"""
+    usuario_id: int
+    fila_id: int
+    prioridade: Optional[Priority] = Priority.normal
+
+class EntradaLoteSchema(BaseModel):
+    """Schema para entrada de vários clientes de uma vez (uma ou mais filas)"""
+    entradas: List[EntradaLoteItemSchema] = Field(..., min_length=1, max_length=LOTE_MAX_ITENS)
+
+# Limite de clientes chamados por vez
+CHAMADA_MAX_CLIENTES = 50
+
+class ChamarProximosSchema(BaseModel):
+    """Chamada de vários clientes de uma vez, um para cada guichê aberto.
+
+    Sem `guiches`, os guichês são numerados de 1 a `quantidade`; sem
+    `quantidade`, chama um cliente por guichê informado.
+    """
+    quantidade: Optional[int] = Field(None, ge=1, le=CHAMADA_MAX_CLIENTES)
+    guiches: Optional[List[str]] = Field(None, min_length=1, max_length=CHAMADA_MAX_CLIENTES)
+
+    @model_validator(mode="after")
+    def completar(self):
+        if self.guiches is None:
+            self.quantidade = self.quantidade or 1
+            self.guiches = [str(i) for i in range(1, self.quantidade + 1)]
+        elif self.quantidade is None:
+            self.quantidade = len(self.guiches)
+        elif self.quantidade != len(self.guiches):
+            raise ValueError("Informe um guichê para cada cliente chamado")
+        return self
+
+
+# -------------------------
+# Respostas
+# -------------------------
+# Com response_model o FastAPI valida e serializa pelo pydantic-core, sem passar
+# pelo jsonable_encoder. Os schemas com from_attributes leem direto dos objetos do ORM.
+
+class EstabelecimentoSaida(BaseModel):
+    id: int
+    nome: str
+    rua: str
+    bairro: str
+    cidade: str
+    estado: str
+    telefone: str
+    usuario_id: int
+
+    class Config:
+        from_attributes = True
+
+class EstabelecimentosSaida(BaseModel):
+    estabelecimentos: List[EstabelecimentoSaida]
+    proximo_cursor: Optional[str] = None
+
+class EstabelecimentoResumoSaida(BaseModel):
+    id: int
+    nome: str
+
+    class Config:
+        from_attributes = True
+
+class FilaSaida(BaseModel):
+    id: int
+    nome: str
+    descricao: Optional[str] = None
+    estabelecimento_id: int
+    estabelecimento: EstabelecimentoResumoSaida
+    pessoas_na_fila: int
+
+    class Config:
+        from_attributes = True
+
+class FilasSaida(BaseModel):
+    filas: List[FilaSaida]
+
+class FilasDisponiveisSaida(FilasSaida):
+    proximo_cursor: Optional[str] = None
+
+class FuncionarioSaida(BaseModel):
+    id: int
+    nome: str
+    email: str
+
+    class Config:
+        from_attributes = True
+
+class FuncionariosSaida(BaseModel):
+    funcionarios: List[FuncionarioSaida]
+
+class PosicaoSaida(BaseModel):
+    id: int
+    fila_id: int
+    fila_nome: str
+    fila_descricao: Optional[str] = None
+    estabelecimento_nome: str
+    posicao: Optional[int] = None
+    codigo_ticket: str
+    # Previsão de espera; vazia enquanto a fila não tem atendimentos suficientes
+    tempo_espera_estimado: Optional[str] = None
+    tempo_espera_segundos: Optional[int] = None
+    status: str
+
+class HistoricoSaida(BaseModel):
+    data_hora: datetime
+    fila_nome: Optional[str] = None
+    estabelecimento_nome: Optional[str] = None
+    posicao_final: int
+    codigo_ticket: str
+    status: str
+
+class ChamadaSaida(BaseModel):
+    message: str
+    ordem: int
+    codigo_ticket: str
+
+class ChamadoSaida(BaseModel):
+    usuario_id: int
+    entrada_id: int
+    ordem: int
+    codigo_ticket: str
+    prioridade: Priority
+    guiche: str
+
+class ChamadosSaida(BaseModel):
+    chamados: List[ChamadoSaida]
+    guiches_livres: List[str]
+
+class EntradaQRSaida(BaseModel):
+    message: str
+    ordem_na_fila: Optional[int] = None
+    ticket: int
+    codigo_ticket: str
+    prioridade: Priority
+
+class EntradaSaida(EntradaQRSaida):
+    pessoas_na_frente: int
+
+class ResultadoLoteSaida(BaseModel):
+    """Resultado de um item do lote: ticket e posição quando aceito, `erro` quando recusado"""
+    usuario_id: int
+    fila_id: int
+    sucesso: bool
+    erro: Optional[str] = None
+    prioridade: Optional[Priority] = None
+    ticket: Optional[int] = None
+    codigo_ticket: Optional[str] = None
+    entrada_id: Optional[int] = None
+    posicao: Optional[int] = None
+
+class LoteSaida(BaseModel):
+    inseridos: int
+    recusados: int
+    resultados: List[ResultadoLoteSaida]
+
+class QRCodeSaida(BaseModel):
+    fila_id: int
+    fila_nome: str
+    qr_code: str
+    estabelecimento: str
+    expira_em: datetime
+    validade: str
+
+class FilaDonoSaida(BaseModel):
+    fila_id: int
+    fila_nome: str
+    estabelecimento_nome: str
+    clientes_aguardando: int
+    prioridade_alta: int
+    prioridade_normal: int
+    total_atendidos: int
+
+class FilaMaisLongaSaida(BaseModel):
+    fila_nome: str
+    clientes: int
+
+class MetricasGeraisSaida(BaseModel):
+    total_filas: int
+    total_clientes_aguardando: int
+    tempo_medio_atendimento: int
+    fila_mais_longa: Optional[FilaMaisLongaSaida] = None
+
+class DashboardDonoSaida(BaseModel):
+    estabelecimentos: List[FilaDonoSaida]
+    metricas_gerais: MetricasGeraisSaida
+
+class FilaFuncionarioSaida(BaseModel):
+    fila_id: int
+    fila_nome: str
+    clientes_aguardando: int
+    proximo_cliente: Optional[str] = None
+
+class AlertaSaida(BaseModel):
+    tipo: str
+    mensagem: str
+
+class DashboardFuncionarioSaida(BaseModel):
+    filas: List[FilaFuncionarioSaida]
+    alertas: List[AlertaSaida]
+
+class ErroSaida(BaseModel):
+    error: str
+
+class PosicaoAtualSaida(BaseModel):
+    fila_id: int
+    fila_nome: str
+    posicao: Optional[int] = None
+    codigo_ticket: str
+    prioridade: Priority
+    tempo_espera_estimado: Optional[str] = None
+    tempo_espera_segundos: Optional[int] = None
+
+class HistoricoRecenteSaida(BaseModel):
+    fila_nome: Optional[str] = None
+    estabelecimento: Optional[str] = None
+    status: str
+    data: datetime
+
+class DashboardClienteSaida(BaseModel):
+    posicoes_atuais: List[PosicaoAtualSaida]
+    historico_recente: List[HistoricoRecenteSaida]
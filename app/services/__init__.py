@@ -1,119 +1,152 @@
 # Serviços de negócio para o sistema FilaDigital
 # Contém lógica complexa para gerenciamento de filas, QR codes e notificações
 
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from app.models import Fila, UsuariosNaFila, Usuario, Priority, Role
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from sqlalchemy import and_, or_, case, func, insert, select, update
+from app.models import Fila, UsuariosNaFila, Usuario, Priority, Role, Estabelecimento, formatar_ticket
 from app.dependencies import impedir_owner_employee_entrar
-from typing import Optional, List, Dict
-import uuid
+from app.services.queue_engine import QueueEngine, queue_engines
+from app.services.realtime import event_hub
+from app.services.queue_stats import QueueStatsRepository
+from app.services.history import HistoryRepository
+from app.services.event_log import CHAMADA, ENTRADA, REMOCAO, SAIDA, EventLogRepository
+from app.services.wait_estimator import formatar_estimativa
+from app.services.qr_tokens import qr_revocations, qr_signer
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime
+from contextlib import ExitStack, nullcontext
+from fastapi import HTTPException
+import time
 
 class QueueService:
     """Service para gerenciar operações de filas com prioridades"""
 
     @staticmethod
-    def calculate_order_with_priority(fila: Fila, session: Session, priority: Priority = Priority.normal) -> int:
-        """Calcula a ordem considerando prioridades"""
-        if priority == Priority.high:
-            # Prioridade alta: sempre no topo da fila de alta prioridade
-            high_priority_count = session.query(UsuariosNaFila).filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.high  # type: ignore
-                )
-            ).count()
-            return high_priority_count + 1
-        else:
-            # Prioridade normal: após todas as prioridades altas
-            high_priority_count = session.query(UsuariosNaFila).filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.high  # type: ignore
-                )
-            ).count()
-
-            normal_priority_count = session.query(UsuariosNaFila).filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.normal  # type: ignore
-                )
-            ).count()
-
-            return high_priority_count + normal_priority_count + 1
+    def _claim_next(session: Session, fila_id: int) -> Optional[UsuariosNaFila]:
+        """Marca como atendido o próximo aguardando da fila, em um único UPDATE atômico.
+
+        O WHERE escolhe o primeiro ticket de prioridade alta (ou, se não houver,
+        o primeiro normal) e confere de novo o status: dois funcionários ou dois
+        workers chamando ao mesmo tempo nunca levam o mesmo cliente. No
+        PostgreSQL as linhas já travadas por outra chamada são puladas
+        (FOR UPDATE SKIP LOCKED). No SQLite o UPDATE é o primeiro comando da
+        transação, então pega o lock de escrita direto e espera pelo
+        busy_timeout em vez de falhar.
+        """
+        skip_locked = session.get_bind().dialect.name == "postgresql"
+
+        def primeiro(filtro):
+            consulta = select(UsuariosNaFila.id)\
+                .where(UsuariosNaFila.fila_id == fila_id, UsuariosNaFila.status == "aguardando", filtro)\
+                .order_by(UsuariosNaFila.ordem, UsuariosNaFila.id)\
+                .limit(1)  # type: ignore
+            if skip_locked:
+                consulta = consulta.with_for_update(skip_locked=True)
+            return consulta.scalar_subquery()
+
+        alvo = func.coalesce(
+            primeiro(UsuariosNaFila.prioridade == Priority.high),
+            primeiro(or_(UsuariosNaFila.prioridade == Priority.normal, UsuariosNaFila.prioridade.is_(None)))
+        )
+        return session.scalars(
+            update(UsuariosNaFila)
+            .where(UsuariosNaFila.id == alvo, UsuariosNaFila.status == "aguardando")
+            .values(status="atendido")
+            .returning(UsuariosNaFila)
+            .execution_options(populate_existing=True)
+        ).first()
 
     @staticmethod
     def call_next_customer(fila: Fila, session: Session, employee: Usuario) -> Optional[UsuariosNaFila]:
         """Chama o próximo cliente considerando prioridades"""
-        # Primeiro tenta prioridade alta
-        next_customer = session.query(UsuariosNaFila)\
-            .filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.high  # type: ignore
-                )
-            )\
-            .order_by(UsuariosNaFila.ordem).first()  # type: ignore
-
-        # Se não há prioridade alta, pega prioridade normal
-        if not next_customer:
-            next_customer = session.query(UsuariosNaFila)\
-                .filter(
-                    and_(
-                        UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                        UsuariosNaFila.status == "aguardando",  # type: ignore
-                        UsuariosNaFila.prioridade == Priority.normal  # type: ignore
-                    )
-                )\
-                .order_by(UsuariosNaFila.ordem).first()  # type: ignore
-
-        if next_customer:
-            next_customer.status = "atendido"  # type: ignore
+        fila_id = fila.id
+        engine = queue_engines.get(fila_id, session, fila.versao)  # type: ignore
+
+        # O lock só serializa as chamadas deste processo; a exclusão entre workers vem do UPDATE condicional
+        with engine.lock:
+            next_customer = QueueService._claim_next(session, fila_id)  # type: ignore
+            if next_customer is None:
+                session.rollback()
+                return None
+
+            # O mesmo horário vai para o histórico (horario_saida) e para a estimativa de espera
+            agora = datetime.utcnow()
+            evento = QueueStatsRepository.on_serve(session, fila_id, next_customer.prioridade)  # type: ignore
+            EventLogRepository.append(session, fila_id, CHAMADA, [(next_customer.id, next_customer.usuario_id, next_customer.prioridade)], agora)  # type: ignore
+            # Atendido sai da tabela quente na mesma transação; o objeto fica com os dados do RETURNING
+            HistoryRepository.archive(session, [next_customer.id], "atendido", agora)  # type: ignore
+            session.expunge(next_customer)
             session.commit()
+            engine.remove(next_customer.id)  # type: ignore
+            engine.versao += 1
+            engine.advance(evento, 1)
+            engine.record_calls(agora, [next_customer.horario_entrada])  # type: ignore
 
-            # Recalcula ordens após atendimento
-            QueueService.recalculate_orders(fila, session)
+        return next_customer
 
-        return next_customer  # type: ignore
+    @staticmethod
+    def call_next_customers(fila: Fila, session: Session, employee: Usuario, quantidade: int) -> List[UsuariosNaFila]:
+        """Chama até `quantidade` clientes de uma vez, na ordem de prioridade, em uma transação.
+
+        Um único UPDATE condicional marca os escolhidos como atendidos (como em
+        `_claim_next`, quem já foi levado por outra chamada fica de fora) e os
+        contadores da fila são atualizados uma vez só.
+        """
+        fila_id = fila.id
+        engine = queue_engines.get(fila_id, session, fila.versao)  # type: ignore
+        classe = case((UsuariosNaFila.prioridade == Priority.high, 0), else_=1)
+
+        with engine.lock:
+            escolhidos = select(UsuariosNaFila.id)\
+                .where(UsuariosNaFila.fila_id == fila_id, UsuariosNaFila.status == "aguardando")\
+                .order_by(classe, UsuariosNaFila.ordem, UsuariosNaFila.id)\
+                .limit(quantidade)  # type: ignore
+            if session.get_bind().dialect.name == "postgresql":
+                escolhidos = escolhidos.with_for_update(skip_locked=True)
+            chamados = session.scalars(
+                update(UsuariosNaFila)
+                .where(UsuariosNaFila.id.in_(escolhidos), UsuariosNaFila.status == "aguardando")
+                .values(status="atendido")
+                .returning(UsuariosNaFila)
+                .execution_options(populate_existing=True)
+            ).all()
+            if not chamados:
+                session.rollback()
+                return []
+
+            # O RETURNING não garante ordem: volta para a ordem de atendimento
+            chamados = sorted(chamados, key=lambda c: (c.prioridade != Priority.high, c.ordem, c.id))
+            agora = datetime.utcnow()
+            alta = sum(1 for c in chamados if c.prioridade == Priority.high)
+            evento = QueueStatsRepository.on_serve_batch(session, fila_id, alta, len(chamados) - alta)  # type: ignore
+            EventLogRepository.append(session, fila_id, CHAMADA, [(c.id, c.usuario_id, c.prioridade) for c in chamados], agora)  # type: ignore
+            HistoryRepository.archive(session, [c.id for c in chamados], "atendido", agora)  # type: ignore
+            # Desanexa antes do commit: as linhas saíram da tabela e os dados do RETURNING bastam
+            for chamado in chamados:
+                session.expunge(chamado)
+            session.commit()
+            for chamado in chamados:
+                engine.remove(chamado.id)  # type: ignore
+            engine.versao += 1
+            engine.advance(evento, len(chamados))
+            engine.record_calls(agora, [c.horario_entrada for c in chamados])  # type: ignore
+
+        return chamados
 
     @staticmethod
-    def recalculate_orders(fila: Fila, session: Session):
-        """Recalcula as ordens após mudanças na fila"""
-        # Recalcula prioridades altas
-        high_priority_customers = session.query(UsuariosNaFila)\
-            .filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.high  # type: ignore
-                )
-            )\
-            .order_by(UsuariosNaFila.horario_entrada)\
-            .all()
-
-        for i, customer in enumerate(high_priority_customers, 1):
-            customer.ordem = i
-
-        # Recalcula prioridades normais
-        normal_priority_customers = session.query(UsuariosNaFila)\
-            .filter(
-                and_(
-                    UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                    UsuariosNaFila.status == "aguardando",  # type: ignore
-                    UsuariosNaFila.prioridade == Priority.normal  # type: ignore
-                )
-            )\
-            .order_by(UsuariosNaFila.horario_entrada)\
-            .all()
-
-        base_order = len(high_priority_customers)
-        for i, customer in enumerate(normal_priority_customers, 1):
-            customer.ordem = base_order + i
+    def get_position(entrada: UsuariosNaFila, session: Session) -> Optional[int]:
+        """Posição atual do cliente, derivada do ticket (ordem) e das prioridades"""
+        # A versão da fila faz o motor aplicar antes o que outros workers gravaram
+        return queue_engines.get(entrada.fila_id, session, entrada.fila.versao).position(entrada.id)  # type: ignore
 
-        session.commit()
+    @staticmethod
+    def estimate_wait(entrada: UsuariosNaFila, session: Session) -> Dict:
+        """Previsão de espera de uma entrada (O(1) sobre o motor em dia); sem dados suficientes vem vazia"""
+        previsao = queue_engines.get(entrada.fila_id, session, entrada.fila.versao).eta(entrada.id)  # type: ignore
+        if previsao is None:
+            return {"tempo_espera_estimado": None, "tempo_espera_segundos": None}
+        esperado, minimo, maximo = previsao
+        return {"tempo_espera_estimado": formatar_estimativa(minimo, maximo), "tempo_espera_segundos": round(esperado)}
 
     @staticmethod
     def add_customer_to_queue(fila: Fila, usuario: Usuario, session: Session, priority: Priority = Priority.normal) -> UsuariosNaFila:
@@ -121,63 +154,179 @@ class QueueService:
         # Verifica se pode entrar
         impedir_owner_employee_entrar(fila, usuario)
 
-        # Verifica se já está na fila
-        existing_entry = session.query(UsuariosNaFila).filter(
-            and_(
-                UsuariosNaFila.usuario_id == usuario.id,  # type: ignore
-                UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                UsuariosNaFila.status == "aguardando"  # type: ignore
-            )
-        ).first()
+        engine = queue_engines.get(fila.id, session, fila.versao)  # type: ignore
 
-        if existing_entry:
-            raise ValueError("Usuário já está nesta fila")
+        with engine.lock:
+            # Verifica se já está na fila
+            if engine.entry_for_user(usuario.id) is not None:  # type: ignore
+                raise ValueError("Usuário já está nesta fila")
 
-        # Calcula ordem
-        ordem = QueueService.calculate_order_with_priority(fila, session, priority)
+            # A ordem é um ticket imutável emitido pelo contador da fila; a posição é derivada dele
+            ordem, evento = QueueStatsRepository.on_enqueue(session, fila.id, priority)  # type: ignore
 
-        # Cria entrada
-        entrada = UsuariosNaFila(
-            usuario_id=usuario.id,  # type: ignore
-            fila_id=fila.id,  # type: ignore
-            ordem=ordem,
-            status="aguardando",
-            prioridade=priority
-        )
+            # Cria entrada
+            entrada = UsuariosNaFila(
+                usuario_id=usuario.id,  # type: ignore
+                fila_id=fila.id,  # type: ignore
+                ordem=ordem,
+                status="aguardando",
+                prioridade=priority
+            )
 
-        session.add(entrada)
-        session.commit()
+            session.add(entrada)
+            session.flush()
+            EventLogRepository.append(session, fila.id, ENTRADA, [(entrada.id, entrada.usuario_id, priority)])  # type: ignore
+            session.commit()
+            engine.enqueue(entrada.id, entrada.usuario_id, priority)  # type: ignore
+            engine.last_ticket = max(engine.last_ticket, ordem)
+            engine.versao += 1
+            engine.advance(evento, 1)
 
         return entrada
 
     @staticmethod
-    def get_queue_stats(fila: Fila, session: Session) -> Dict:
-        """Retorna estatísticas da fila"""
-        total_aguardando = session.query(UsuariosNaFila).filter(
-            and_(
-                UsuariosNaFila.fila_id == fila.id,  # type: ignore
+    def add_customers_in_batch(itens: List[Dict], operador: Usuario, session: Session) -> List[Dict]:
+        """Coloca vários clientes em uma ou mais filas com um único commit.
+
+        `itens` tem usuario_id, fila_id e prioridade. A validação usa uma
+        consulta por tipo (filas, usuários, entradas já aguardando) e os tickets
+        de cada fila saem de um único UPDATE no contador. Devolve um resultado
+        por item, na mesma ordem, com o ticket ou o motivo da recusa.
+        """
+        fila_ids = {item["fila_id"] for item in itens}
+        usuario_ids = {item["usuario_id"] for item in itens}
+
+        filas = {
+            fila.id: fila for fila in session.query(Fila).options(joinedload(Fila.estabelecimento))
+            .filter(Fila.id.in_(fila_ids)).all()  # type: ignore
+        }
+        usuarios = {u.id: u for u in session.query(Usuario).filter(Usuario.id.in_(usuario_ids)).all()}  # type: ignore
+        ja_na_fila = set(
+            session.query(UsuariosNaFila.usuario_id, UsuariosNaFila.fila_id).filter(
+                UsuariosNaFila.fila_id.in_(fila_ids),  # type: ignore
+                UsuariosNaFila.usuario_id.in_(usuario_ids),  # type: ignore
                 UsuariosNaFila.status == "aguardando"  # type: ignore
-            )
-        ).count()
+            ).all()
+        )
 
-        high_priority_count = session.query(UsuariosNaFila).filter(
-            and_(
-                UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                UsuariosNaFila.status == "aguardando",  # type: ignore
-                UsuariosNaFila.prioridade == Priority.high  # type: ignore
-            )
-        ).count()
+        resultados: List[Dict] = []
+        aceitos: Dict[int, List[Dict]] = {}
+        for item in itens:
+            resultado = {"usuario_id": item["usuario_id"], "fila_id": item["fila_id"], "sucesso": False}
+            resultados.append(resultado)
+            fila = filas.get(item["fila_id"])
+            usuario = usuarios.get(item["usuario_id"])
+            chave = (item["usuario_id"], item["fila_id"])
+            if fila is None:
+                resultado["erro"] = "Fila não encontrada"
+            elif fila.estabelecimento.usuario_id != operador.id and operador.establishment_id != fila.estabelecimento_id:
+                resultado["erro"] = "Acesso negado à fila"
+            elif usuario is None:
+                resultado["erro"] = "Usuário não encontrado"
+            elif chave in ja_na_fila:
+                resultado["erro"] = "Usuário já está nesta fila"
+            else:
+                try:
+                    impedir_owner_employee_entrar(fila, usuario)
+                except HTTPException as e:
+                    resultado["erro"] = e.detail
+                    continue
+                # Repetido dentro do próprio lote também conta como duplicado
+                ja_na_fila.add(chave)
+                resultado["prioridade"] = item.get("prioridade") or Priority.normal
+                aceitos.setdefault(fila.id, []).append(resultado)  # type: ignore
+
+        if not aceitos:
+            return resultados
+
+        # Motores e linhas de filas (UPDATE dos contadores) sempre travados na mesma ordem,
+        # por fila_id, seja qual for a ordem dos itens: lotes concorrentes não entram em deadlock
+        aceitos = {fila_id: aceitos[fila_id] for fila_id in sorted(aceitos)}
+        engines = {fila_id: queue_engines.get(fila_id, session, filas[fila_id].versao) for fila_id in aceitos}  # type: ignore
+        with ExitStack() as travas:
+            for engine in engines.values():
+                travas.enter_context(engine.lock)
+
+            faixas = []
+            linhas = []
+            eventos = {}
+            for fila_id, grupo in aceitos.items():
+                alta = sum(1 for r in grupo if r["prioridade"] == Priority.high)
+                primeiro, eventos[fila_id] = QueueStatsRepository.on_enqueue_batch(session, fila_id, alta, len(grupo) - alta)
+                ticket = primeiro
+                for resultado in grupo:
+                    resultado.update({"sucesso": True, "ticket": ticket, "codigo_ticket": formatar_ticket(ticket, resultado["prioridade"])})
+                    linhas.append({
+                        "usuario_id": resultado["usuario_id"], "fila_id": fila_id, "ordem": ticket,
+                        "status": "aguardando", "prioridade": resultado["prioridade"]
+                    })
+                    ticket += 1
+                faixas.append(and_(UsuariosNaFila.fila_id == fila_id, UsuariosNaFila.ordem.between(primeiro, ticket - 1)))
+
+            # Um executemany só; os ids voltam em uma consulta pela chave única (fila_id, ordem)
+            session.execute(insert(UsuariosNaFila), linhas)
+            ids = {
+                (fila_id, ordem): entrada_id for entrada_id, fila_id, ordem in
+                session.query(UsuariosNaFila.id, UsuariosNaFila.fila_id, UsuariosNaFila.ordem).filter(or_(*faixas)).all()
+            }
+            for fila_id, grupo in aceitos.items():
+                for resultado in grupo:
+                    resultado["entrada_id"] = ids[(fila_id, resultado["ticket"])]
+                EventLogRepository.append(session, fila_id, ENTRADA, [(r["entrada_id"], r["usuario_id"], r["prioridade"]) for r in grupo])
+            session.commit()
 
-        normal_priority_count = session.query(UsuariosNaFila).filter(
-            and_(
-                UsuariosNaFila.fila_id == fila.id,  # type: ignore
-                UsuariosNaFila.status == "aguardando",  # type: ignore
-                UsuariosNaFila.prioridade == Priority.normal  # type: ignore
-            )
-        ).count()
+            for fila_id, grupo in aceitos.items():
+                engine = engines[fila_id]
+                for resultado in grupo:
+                    engine.enqueue(resultado["entrada_id"], resultado["usuario_id"], resultado["prioridade"])
+                engine.last_ticket = max(engine.last_ticket, grupo[-1]["ticket"])
+                engine.versao += 1
+                engine.advance(eventos[fila_id], len(grupo))
+
+        for fila_id, grupo in aceitos.items():
+            for resultado in grupo:
+                resultado["prioridade"] = resultado["prioridade"].value
+                resultado["posicao"] = engines[fila_id].position(resultado["entrada_id"])
+        return resultados
+
+    @staticmethod
+    def remove_customer(entrada: UsuariosNaFila, session: Session):
+        """Remove a entrada do cliente da fila (ela vai para o histórico como cancelada)"""
+        fila_id = entrada.fila_id
+        entrada_id = entrada.id
+        engine = queue_engines.loaded(fila_id)  # type: ignore
+
+        with engine.lock if engine is not None else nullcontext():
+            evento = QueueStatsRepository.on_leave(session, fila_id, entrada.prioridade, entrada.status)  # type: ignore
+            if evento is not None:
+                EventLogRepository.append(session, fila_id, SAIDA, [(entrada_id, entrada.usuario_id, entrada.prioridade)])  # type: ignore
+            status = "cancelado" if entrada.status == "aguardando" else entrada.status
+            HistoryRepository.archive(session, [entrada_id], status)  # type: ignore
+            session.expunge(entrada)
+            session.commit()
+            if engine is not None:
+                engine.remove(entrada_id)  # type: ignore
+                if evento is not None:
+                    engine.versao += 1
+                    engine.advance(evento, 1)
+
+    @staticmethod
+    def record_queue_removal(session: Session, fila_id: int):
+        """Registra no log que a fila vai ser apagada; chamar antes de apagar, na mesma transação"""
+        EventLogRepository.record(session, fila_id, REMOCAO)
+
+    @staticmethod
+    def discard_queue(fila_id: int):
+        """Esquece o estado em memória de uma fila apagada"""
+        queue_engines.discard(fila_id)
+
+    @staticmethod
+    def get_queue_stats(fila: Fila, session: Session) -> Dict:
+        """Retorna estatísticas da fila"""
+        high_priority_count, normal_priority_count = queue_engines.get(fila.id, session, fila.versao).counts()  # type: ignore
 
         return {
-            "total_aguardando": total_aguardando,
+            "total_aguardando": high_priority_count + normal_priority_count,
             "prioridade_alta": high_priority_count,
             "prioridade_normal": normal_priority_count,
             "fila_id": fila.id,
@@ -185,50 +334,127 @@ class QueueService:
         }
 
 class QRCodeService:
-    """Service para gerar e validar QR Codes de filas"""
+    """Service para gerar, rotacionar e validar QR Codes de filas"""
+
+    @staticmethod
+    def generate_queue_qr(fila: Fila) -> Tuple[str, datetime]:
+        """Token assinado da geração atual do QR Code da fila e quando ele expira"""
+        token, expira_em = qr_signer.issue(fila.id, fila.qr_geracao)  # type: ignore
+        return token, datetime.utcfromtimestamp(expira_em)
 
     @staticmethod
-    def generate_queue_qr(fila: Fila) -> str:
-        """Gera código QR único para a fila"""
-        # Gera um UUID único para a fila
-        qr_code = str(uuid.uuid4())
-        # Em produção, isso seria salvo no banco ou cache
-        return qr_code
+    def rotate_queue_qr(fila: Fila, session: Session) -> Tuple[str, datetime]:
+        """Invalida todos os QR Codes já emitidos da fila e emite um novo"""
+        geracao = session.execute(
+            update(Fila).where(Fila.id == fila.id).values({Fila.qr_geracao: Fila.qr_geracao + 1})
+            .returning(Fila.qr_geracao).execution_options(synchronize_session=False)
+        ).scalar_one()
+        session.commit()
+        # Os tokens antigos vencem em até um TTL; até lá são recusados sem ir ao banco
+        qr_revocations.revoke(fila.id, geracao, time.time() + qr_signer.ttl)  # type: ignore
+        token, expira_em = qr_signer.issue(fila.id, geracao)  # type: ignore
+        return token, datetime.utcfromtimestamp(expira_em)
 
     @staticmethod
     def validate_qr_and_add_customer(qr_code: str, usuario: Usuario, session: Session, priority: Priority = Priority.normal) -> Optional[UsuariosNaFila]:
-        """Valida QR code e adiciona cliente à fila correspondente"""
-        # Em produção, buscar fila pelo QR code do banco/cache
-        # Por enquanto, simula busca por ID da fila
-        try:
-            fila_id = int(qr_code.split('-')[0])  # Simulação
-            fila = session.query(Fila).filter(Fila.id == fila_id).first()
-            if fila:
-                return QueueService.add_customer_to_queue(fila, usuario, session, priority)
-        except (ValueError, IndexError):
-            pass
-        return None
+        """Valida o QR Code e adiciona o cliente à fila dele.
+
+        Assinatura, expiração e revogação são conferidas em memória; só um
+        token válido chega ao banco. Levanta ValueError com o motivo da recusa.
+        """
+        fila_id, geracao, _ = qr_signer.verify(qr_code)
+        if qr_revocations.is_revoked(fila_id, geracao):
+            raise ValueError("QR Code revogado")
+
+        fila = session.query(Fila).filter(Fila.id == fila_id).first()
+        if not fila:
+            return None
+        if geracao != fila.qr_geracao:
+            # Rotacionado em outro processo: os próximos scans deste token param na memória
+            qr_revocations.revoke(fila_id, fila.qr_geracao, time.time() + qr_signer.ttl)  # type: ignore
+            raise ValueError("QR Code revogado")
+        return QueueService.add_customer_to_queue(fila, usuario, session, priority)
 
 class NotificationService:
-    """Service para gerenciar notificações"""
+    """Service para gerenciar notificações em tempo real (publica no canal WebSocket)"""
 
     @staticmethod
-    def notify_customer_called(customer: UsuariosNaFila, session: Session):
-        """Notifica cliente que foi chamado"""
-        # Em produção, enviar push notification, email, SMS
-        print(f"Cliente {customer.usuario_id} chamado para fila {customer.fila_id}")
+    def notify_customer_called(customer: UsuariosNaFila, session: Session, guiche: Optional[str] = None):
+        """Notifica cliente que foi chamado (e para qual guichê, se informado)"""
+        mensagem = {
+            "tipo": "chamado",
+            "fila_id": customer.fila_id,
+            "entrada_id": customer.id,
+            "ticket": customer.ordem,
+            "codigo_ticket": customer.codigo_ticket
+        }
+        if guiche is not None:
+            mensagem["guiche"] = guiche
+        event_hub.publish(("usuario", customer.usuario_id), mensagem)
 
     @staticmethod
-    def notify_queue_updated(fila: Fila, session: Session):
-        """Notifica funcionários sobre mudanças na fila"""
-        # Em produção, notificar via WebSocket ou push
-        print(f"Fila {fila.id} atualizada")
+    def notify_queue_updated(fila: Fila, session: Session, evento: str = "atualizada"):
+        """Notifica painéis sobre mudanças na fila e os clientes conectados sobre novas posições"""
+        NotificationService.notify_queues_updated([fila.id], session, evento)  # type: ignore
+
+    @staticmethod
+    def notify_queues_updated(fila_ids: List[int], session: Session, evento: str = "atualizada"):
+        """Uma notificação por fila alterada (ex.: depois de um lote), sem recarregar as filas.
+
+        Os contadores vêm de Fila, já gravados pelo commit da operação, e não
+        do motor deste processo, que pode nem ter a fila carregada. Só filas
+        com algum painel inscrito custam a consulta.
+        """
+        # O canal da fila é aberto a qualquer usuário autenticado: leva só contadores.
+        # Dados de cada entrada (ticket, posição) vão apenas no canal do próprio cliente
+        stats = QueueStatsRepository.counts(session, [f for f in fila_ids if event_hub.has_subscribers(("fila", f))])
+        for fila_id in fila_ids:
+            if fila_id in stats:
+                event_hub.publish(("fila", fila_id), {
+                    "tipo": evento,
+                    "fila_id": fila_id,
+                    "aguardando": stats[fila_id]["total_aguardando"],
+                    "prioridade_alta": stats[fila_id]["prioridade_alta"],
+                    "prioridade_normal": stats[fila_id]["prioridade_normal"]
+                })
+
+            engine = queue_engines.loaded(fila_id)
+            if engine is not None:
+                NotificationService.notify_positions(engine)
 
     @staticmethod
     def notify_customer_position(customer: UsuariosNaFila, session: Session):
         """Notifica cliente sobre mudança de posição"""
-        # Em produção, enviar notificação em tempo real
-        print(f"Cliente {customer.usuario_id} agora está na posição {customer.ordem}")
+        event_hub.publish(("usuario", customer.usuario_id), {
+            "tipo": "posicao",
+            "fila_id": customer.fila_id,
+            "entrada_id": customer.id,
+            "posicao": QueueService.get_position(customer, session)
+        })
+
+    @staticmethod
+    def notify_positions(engine: QueueEngine):
+        """Envia a posição atual a cada cliente conectado que aguarda na fila"""
+        conectados = event_hub.connected_users()
+        if not conectados:
+            return
+
+        if len(conectados) <= len(engine):
+            aguardando = [(u, engine.entry_for_user(u)) for u in conectados]
+        else:
+            aguardando = [(u, e) for u, e in engine.entries_by_user().items() if u in conectados]
+
+        for usuario_id, entrada_id in aguardando:
+            if entrada_id is None:
+                continue
+            previsao = engine.eta(entrada_id)
+            event_hub.publish(("usuario", usuario_id), {
+                "tipo": "posicao",
+                "fila_id": engine.fila_id,
+                "entrada_id": entrada_id,
+                "posicao": engine.position(entrada_id),
+                "tempo_espera_estimado": formatar_estimativa(previsao[1], previsao[2]) if previsao else None
+            })
 
 class DashboardService:
     """Service para dados de dashboard"""
@@ -236,9 +462,10 @@ class DashboardService:
     @staticmethod
     def get_owner_dashboard(owner: Usuario, session: Session) -> Dict:
         """Retorna dados estruturados para dashboard do dono"""
-        estabelecimentos = session.query(Fila).join(Fila.estabelecimento).filter(
-            Fila.estabelecimento.has(usuario_id=owner.id)
-        ).all()
+        estabelecimentos = session.query(Fila).join(Fila.estabelecimento)\
+            .options(contains_eager(Fila.estabelecimento))\
+            .filter(Estabelecimento.usuario_id == owner.id)\
+            .all()  # type: ignore
 
         dashboard_data = {
             "estabelecimentos": [],
@@ -251,14 +478,16 @@ class DashboardService:
         }
 
         for fila in estabelecimentos:
-            stats = QueueService.get_queue_stats(fila, session)
+            # Contadores mantidos na própria fila: nenhuma contagem de linhas
+            stats = QueueStatsRepository.of(fila)
             dashboard_data["estabelecimentos"].append({
                 "fila_id": fila.id,
                 "fila_nome": fila.nome,
                 "estabelecimento_nome": fila.estabelecimento.nome,
                 "clientes_aguardando": stats["total_aguardando"],
                 "prioridade_alta": stats["prioridade_alta"],
-                "prioridade_normal": stats["prioridade_normal"]
+                "prioridade_normal": stats["prioridade_normal"],
+                "total_atendidos": fila.total_atendidos
             })
 
             dashboard_data["metricas_gerais"]["total_filas"] += 1
@@ -287,7 +516,7 @@ class DashboardService:
         }
 
         for fila in filas:
-            stats = QueueService.get_queue_stats(fila, session)
+            stats = QueueStatsRepository.of(fila)
             dashboard_data["filas"].append({
                 "fila_id": fila.id,
                 "fila_nome": fila.nome,
@@ -307,36 +536,33 @@ class DashboardService:
     @staticmethod
     def get_customer_dashboard(customer: Usuario, session: Session) -> Dict:
         """Retorna dados para dashboard do cliente"""
-        posicoes = session.query(UsuariosNaFila).filter(
+        # A fila (nome e versão) vem no mesmo SELECT das entradas; o estabelecimento não é usado aqui
+        posicoes = session.query(UsuariosNaFila).options(joinedload(UsuariosNaFila.fila)).filter(
             and_(
                 UsuariosNaFila.usuario_id == customer.id,  # type: ignore
                 UsuariosNaFila.status == "aguardando"  # type: ignore
             )
         ).all()
 
-        historico = session.query(UsuariosNaFila).filter(
-            and_(
-                UsuariosNaFila.usuario_id == customer.id,  # type: ignore
-                UsuariosNaFila.status != "aguardando"  # type: ignore
-            )
-        ).order_by(UsuariosNaFila.horario_entrada.desc()).limit(10).all()
+        historico = HistoryRepository.for_user(session, customer.id, limite=10)  # type: ignore
 
         return {
             "posicoes_atuais": [
                 {
                     "fila_id": pos.fila_id,
                     "fila_nome": pos.fila.nome,
-                    "posicao": pos.ordem,
+                    "posicao": QueueService.get_position(pos, session),
+                    "codigo_ticket": pos.codigo_ticket,
                     "prioridade": pos.prioridade.value,
-                    "tempo_espera_estimado": "15-20 min"  # Calcular baseado em histórico
+                    **QueueService.estimate_wait(pos, session)
                 } for pos in posicoes
             ],
             "historico_recente": [
                 {
-                    "fila_nome": hist.fila.nome,
-                    "estabelecimento": hist.fila.estabelecimento.nome,
+                    "fila_nome": hist.fila_nome,
+                    "estabelecimento": hist.estabelecimento_nome,
                     "status": hist.status,
-                    "data": hist.horario_entrada.isoformat()
+                    "data": hist.horario_entrada
                 } for hist in historico
             ]
         }
\ No newline at end of file
@@ -0,0 +1,147 @@
+# Log de eventos das filas (append-only) e snapshots
+# Cada entrada, chamada, saída e remoção vira um evento numerado em sequência dentro da fila
+
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import Integer, bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from app.models import EventoFila, Fila, Priority, SnapshotFila, UsuariosNaFila
+
+ENTRADA = "entrada"
+CHAMADA = "chamada"
+SAIDA = "saida"
+REMOCAO = "remocao"  # a fila foi apagada
+RECARGA = "recarga"  # o estado foi refeito a partir da tabela (reparo); vale o snapshot da mesma sequência
+
+# (entrada_id, usuario_id, prioridade) de quem aguarda, na ordem de chegada
+Aguardando = List[Tuple[int, int, Priority]]
+
+_eventos = EventoFila.__table__
+
+# O número de cada evento sai de Fila.ultimo_evento, que o UPDATE dos contadores
+# já incrementou (e travou) na mesma transação: o último evento gravado fica com
+# o valor atual, o anterior com o valor menos 1, e assim por diante.
+_APPEND = insert(_eventos).from_select(
+    ["fila_id", "seq", "tipo", "entrada_id", "usuario_id", "prioridade", "criado_em"],
+    select(
+        bindparam("fila", type_=Integer),
+        select(Fila.ultimo_evento).where(Fila.id == bindparam("fila")).scalar_subquery() - bindparam("recuo", type_=Integer),
+        bindparam("tipo", type_=_eventos.c.tipo.type),
+        bindparam("entrada", type_=Integer),
+        bindparam("usuario", type_=Integer),
+        bindparam("prioridade", type_=_eventos.c.prioridade.type),
+        bindparam("criado_em", type_=_eventos.c.criado_em.type),
+    )
+)
+
+
+def _codificar(aguardando: Aguardando) -> str:
+    return json.dumps(
+        [[entrada_id, usuario_id, int(prioridade == Priority.high)] for entrada_id, usuario_id, prioridade in aguardando],
+        separators=(",", ":")
+    )
+
+
+def decode_snapshot(entradas: str) -> Aguardando:
+    return [(entrada_id, usuario_id, Priority.high if alta else Priority.normal) for entrada_id, usuario_id, alta in json.loads(entradas)]
+
+
+def contiguous(eventos: Sequence, desde: int, ultimo: int) -> bool:
+    """Os eventos cobrem, sem buraco, as sequências de `desde + 1` até `ultimo`"""
+    return len(eventos) >= ultimo - desde and all(evento.seq == desde + 1 + i for i, evento in enumerate(eventos))
+
+
+class EventLogRepository:
+    """Eventos das filas e snapshots do estado de quem aguarda"""
+
+    # Escritas: quem chama faz o commit junto com a alteração da fila
+
+    @staticmethod
+    def append(session: Session, fila_id: int, tipo: str, entradas: Optional[Sequence[Tuple[int, int, Optional[Priority]]]] = None,
+               quando: Optional[datetime] = None):
+        """Grava um evento por entrada (ou um só, sem entrada) em um INSERT ... SELECT.
+
+        Os números usados são os últimos `len(entradas)` reservados em
+        Fila.ultimo_evento; por isso a chamada vem depois do UPDATE dos
+        contadores (QueueStatsRepository), que soma os eventos da operação.
+        """
+        entradas = entradas or [(None, None, None)]
+        quando = quando or datetime.utcnow()
+        session.execute(_APPEND, [
+            {
+                "fila": fila_id, "recuo": len(entradas) - 1 - i, "tipo": tipo, "entrada": entrada_id,
+                "usuario": usuario_id, "prioridade": prioridade, "criado_em": quando
+            }
+            for i, (entrada_id, usuario_id, prioridade) in enumerate(entradas)
+        ])
+
+    @staticmethod
+    def record(session: Session, fila_id: int, tipo: str):
+        """Evento da fila sem entrada (ex.: remoção): reserva o número e grava"""
+        session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                Fila.ultimo_evento: Fila.ultimo_evento + 1, Fila.versao: Fila.versao + 1
+            }).execution_options(synchronize_session=False)
+        )
+        EventLogRepository.append(session, fila_id, tipo)
+        if tipo == REMOCAO:
+            session.execute(delete(SnapshotFila).where(SnapshotFila.fila_id == fila_id))
+
+    @staticmethod
+    def save_snapshots(session: Session, estados: Dict[int, Tuple[int, Aguardando]]):
+        """Substitui os snapshots das filas: {fila_id: (seq, aguardando)}"""
+        if not estados:
+            return
+        agora = datetime.utcnow()
+        session.execute(delete(SnapshotFila).where(SnapshotFila.fila_id.in_(list(estados))))  # type: ignore
+        session.execute(insert(SnapshotFila), [
+            {"fila_id": fila_id, "seq": seq, "entradas": _codificar(aguardando), "criado_em": agora}
+            for fila_id, (seq, aguardando) in estados.items()
+        ])
+
+    # Leituras
+
+    @staticmethod
+    def events_after(session: Session, fila_id: int, seq: int) -> List:
+        """Eventos da fila depois de `seq`, em ordem"""
+        return session.execute(
+            select(EventoFila.seq, EventoFila.tipo, EventoFila.entrada_id, EventoFila.usuario_id, EventoFila.prioridade)
+            .where(EventoFila.fila_id == fila_id, EventoFila.seq > seq)
+            .order_by(EventoFila.seq)
+        ).all()
+
+    @staticmethod
+    def events_after_snapshots(session: Session) -> Dict[int, List]:
+        """Eventos posteriores ao snapshot de cada fila, em uma consulta: {fila_id: [eventos em ordem]}"""
+        linhas = session.execute(
+            select(EventoFila.fila_id, EventoFila.seq, EventoFila.tipo, EventoFila.entrada_id, EventoFila.usuario_id, EventoFila.prioridade)
+            .join(SnapshotFila, (SnapshotFila.fila_id == EventoFila.fila_id) & (EventoFila.seq > SnapshotFila.seq))
+            .order_by(EventoFila.fila_id, EventoFila.seq)
+        ).all()
+        eventos: Dict[int, List] = {}
+        for linha in linhas:
+            eventos.setdefault(linha.fila_id, []).append(linha)
+        return eventos
+
+    @staticmethod
+    def for_queue(session: Session, fila_id: int) -> List[EventoFila]:
+        """Trilha de auditoria da fila, do evento mais antigo para o mais novo"""
+        return session.query(EventoFila).filter(EventoFila.fila_id == fila_id).order_by(EventoFila.seq).all()  # type: ignore
+
+    @staticmethod
+    def waiting_from_table(session: Session, fila_ids: Iterable[int]) -> Dict[int, Aguardando]:
+        """Quem aguarda em cada fila, lido de usuarios_na_fila (sem snapshot ou com buraco no log)"""
+        aguardando: Dict[int, Aguardando] = {fila_id: [] for fila_id in fila_ids}
+        if not aguardando:
+            return aguardando
+        linhas = session.query(UsuariosNaFila.fila_id, UsuariosNaFila.id, UsuariosNaFila.usuario_id, UsuariosNaFila.prioridade)\
+            .filter(
+                UsuariosNaFila.fila_id.in_(list(aguardando)),  # type: ignore
+                UsuariosNaFila.status == "aguardando"  # type: ignore
+            )\
+            .order_by(UsuariosNaFila.fila_id, UsuariosNaFila.id)\
+            .all()
+        for fila_id, entrada_id, usuario_id, prioridade in linhas:
+            aguardando[fila_id].append((entrada_id, usuario_id, prioridade or Priority.normal))
+        return aguardando
@@ -0,0 +1,111 @@
+# Repositório do histórico de filas
+# Move entradas finalizadas de usuarios_na_fila para historico_filas, que fica como tabela fria
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import DateTime, Integer, String, case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from app.models import Estabelecimento, Fila, HistoricoFila, UsuariosNaFila, mes_particao
+from app.pagination import paginate
+
+# Entradas movidas por lote no arquivamento agendado
+ARCHIVE_BATCH = 1000
+
+_COLUNAS = [
+    HistoricoFila.entrada_id, HistoricoFila.usuario_id, HistoricoFila.fila_id, HistoricoFila.ordem,
+    HistoricoFila.prioridade, HistoricoFila.status, HistoricoFila.horario_entrada, HistoricoFila.horario_saida,
+    HistoricoFila.mes, HistoricoFila.fila_nome, HistoricoFila.estabelecimento_nome
+]
+
+
+class HistoryRepository:
+    """Arquivamento das entradas atendidas/canceladas e leitura do histórico"""
+
+    @staticmethod
+    def archive(session: Session, entrada_ids: List[int], status: str, quando: Optional[datetime] = None):
+        """Copia as entradas para o histórico e as apaga de usuarios_na_fila.
+
+        São dois comandos (INSERT ... SELECT e DELETE) na transação de quem
+        chama, que faz o commit junto com a chamada ou a saída da fila. Objetos
+        dessas entradas carregados na sessão devem ser desanexados (expunge)
+        antes do commit, já que a linha deixa de existir. `quando` vira o
+        horario_saida (para atendidos, o horário da chamada).
+        """
+        if not entrada_ids:
+            return
+        quando = quando or datetime.utcnow()
+        origem = select(
+            UsuariosNaFila.id, UsuariosNaFila.usuario_id, UsuariosNaFila.fila_id, UsuariosNaFila.ordem,
+            UsuariosNaFila.prioridade, literal(status, String), UsuariosNaFila.horario_entrada, literal(quando, DateTime),
+            literal(mes_particao(quando), Integer), Fila.nome, Estabelecimento.nome
+        ).join(Fila, Fila.id == UsuariosNaFila.fila_id)\
+            .join(Estabelecimento, Estabelecimento.id == Fila.estabelecimento_id)\
+            .where(UsuariosNaFila.id.in_(entrada_ids))
+        session.execute(insert(HistoricoFila).from_select(_COLUNAS, origem))
+        session.execute(
+            delete(UsuariosNaFila).where(UsuariosNaFila.id.in_(entrada_ids)).execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def archive_finished(session: Session, limite: int = ARCHIVE_BATCH) -> int:
+        """Arquiva até `limite` entradas já finalizadas que ficaram na tabela quente; devolve quantas
+
+        Usado pelo arquivamento agendado (arquivar_historico.py) para dados
+        antigos, de antes do arquivamento na chamada. Sem horário de saída,
+        o mês da partição vem do horário de entrada. O commit fica com quem chama.
+        """
+        linhas = session.query(
+            UsuariosNaFila.id, UsuariosNaFila.usuario_id, UsuariosNaFila.fila_id, UsuariosNaFila.ordem,
+            UsuariosNaFila.prioridade, UsuariosNaFila.status, UsuariosNaFila.horario_entrada,
+            Fila.nome, Estabelecimento.nome
+        ).outerjoin(Fila, Fila.id == UsuariosNaFila.fila_id)\
+            .outerjoin(Estabelecimento, Estabelecimento.id == Fila.estabelecimento_id)\
+            .filter(UsuariosNaFila.status != "aguardando")\
+            .order_by(UsuariosNaFila.id)\
+            .limit(limite)\
+            .all()  # type: ignore
+        if not linhas:
+            return 0
+        agora = datetime.utcnow()
+        session.execute(insert(HistoricoFila), [
+            {
+                "entrada_id": entrada_id, "usuario_id": usuario_id, "fila_id": fila_id, "ordem": ordem,
+                "prioridade": prioridade, "status": "atendido" if status == "atendido" else "cancelado",
+                "horario_entrada": entrada or agora, "horario_saida": None, "mes": mes_particao(entrada or agora),
+                "fila_nome": fila_nome, "estabelecimento_nome": estabelecimento_nome
+            }
+            for entrada_id, usuario_id, fila_id, ordem, prioridade, status, entrada, fila_nome, estabelecimento_nome in linhas
+        ])
+        session.execute(
+            delete(UsuariosNaFila).where(UsuariosNaFila.id.in_([linha[0] for linha in linhas]))
+            .execution_options(synchronize_session=False)
+        )
+        return len(linhas)
+
+    @staticmethod
+    def for_user(session: Session, usuario_id: int, limite: Optional[int] = None) -> List[HistoricoFila]:
+        """Histórico do cliente, do mais recente para o mais antigo (uma consulta, sem joins)"""
+        consulta = session.query(HistoricoFila)\
+            .filter(HistoricoFila.usuario_id == usuario_id)\
+            .order_by(HistoricoFila.horario_entrada.desc(), HistoricoFila.id.desc())  # type: ignore
+        if limite is not None:
+            consulta = consulta.limit(limite)
+        return consulta.all()
+
+    @staticmethod
+    def page_for_user(session: Session, usuario_id: int, cursor: Optional[str], limite: int) -> Tuple[List[HistoricoFila], Optional[str]]:
+        """Uma página do histórico do cliente (mais recente primeiro) e o cursor da próxima"""
+        consulta = session.query(HistoricoFila).filter(HistoricoFila.usuario_id == usuario_id)  # type: ignore
+        return paginate(consulta, [HistoricoFila.horario_entrada, HistoricoFila.id], cursor, limite, descendente=True)
+
+    @staticmethod
+    def served_counts(session: Session, fila_ids: Optional[Iterable[int]] = None):
+        """(fila_id, atendidos, maior ticket) do histórico, para o reparo dos contadores"""
+        consulta = session.query(
+            HistoricoFila.fila_id,
+            func.sum(case((HistoricoFila.status == "atendido", 1), else_=0)),
+            func.max(HistoricoFila.ordem)
+        )
+        if fila_ids is not None:
+            consulta = consulta.filter(HistoricoFila.fila_id.in_(list(fila_ids)))  # type: ignore
+        return consulta.group_by(HistoricoFila.fila_id).all()
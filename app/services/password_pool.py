@@ -0,0 +1,108 @@
+# Pool de hashing de senhas
+# Executa bcrypt (hash e verificação) em threads dedicadas, com limite de admissão e métricas próprias
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional
+from app.config import PASSWORD_WORKERS, PASSWORD_MAX_PENDING
+from app.metrics import registry, password_duration, password_rejected
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext  # type: ignore
+
+
+class PasswordPoolBusy(Exception):
+    """O pool já tem o máximo de operações pendentes"""
+
+
+def criar_contexto_bcrypt():
+    """Contexto do passlib; importado no primeiro uso (ou no aquecimento), não na importação da aplicação"""
+    from passlib.context import CryptContext  # type: ignore
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordPool:
+    """Operações de senha fora do event loop e do threadpool das rotas.
+
+    bcrypt libera o GIL, então threads bastam. O limite de admissão conta
+    operações em execução + na fila: acima dele a chamada falha na hora
+    (PasswordPoolBusy), em vez de acumular logins atrás das rotas de fila.
+    """
+
+    def __init__(self, context: Optional["CryptContext"], workers: int, max_pending: int):
+        self._context = context  # None: contexto bcrypt padrão, criado no primeiro uso
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="senha")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._metrics = {"concluidas": 0, "falhas": 0, "rejeitadas": 0, "espera_total_s": 0.0, "execucao_total_s": 0.0}
+
+    @property
+    def context(self):
+        if self._context is None:
+            with self._lock:
+                if self._context is None:
+                    self._context = criar_contexto_bcrypt()
+        return self._context
+
+    def warm_up(self):
+        """Carrega o passlib e o backend do bcrypt (com o autoteste dele) fora do primeiro login"""
+        self.context.handler().get_backend()
+
+    async def hash(self, senha: str) -> str:
+        return await self._run("hash", self.context.hash, senha)
+
+    async def verify(self, senha: str, senha_hash: str) -> bool:
+        return await self._run("verify", self.context.verify, senha, senha_hash)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return dict(self._metrics, pendentes=self._pending, workers=self.workers, max_pendentes=self.max_pending)
+
+    async def _run(self, operacao: str, funcao, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._metrics["rejeitadas"] += 1
+                password_rejected.inc()
+                raise PasswordPoolBusy()
+            self._pending += 1
+        enfileirado = time.perf_counter()
+
+        def executar():
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args)
+            finally:
+                execucao = time.perf_counter() - inicio
+                password_duration.observe(inicio - enfileirado, operacao, "espera")
+                password_duration.observe(execucao, operacao, "execucao")
+                with self._lock:
+                    self._metrics["espera_total_s"] += inicio - enfileirado
+                    self._metrics["execucao_total_s"] += execucao
+
+        def liberar(futuro):
+            # Roda ao terminar ou ao ser cancelado (cliente desconectou antes de começar);
+            # canceladas e com erro contam à parte, não como concluídas
+            with self._lock:
+                self._pending -= 1
+                if not futuro.cancelled() and futuro.exception() is None:
+                    self._metrics["concluidas"] += 1
+                else:
+                    self._metrics["falhas"] += 1
+
+        futuro = self._executor.submit(executar)
+        futuro.add_done_callback(liberar)
+        return await asyncio.wrap_future(futuro)
+
+
+# Pool único do processo
+password_pool = PasswordPool(None, PASSWORD_WORKERS or min(4, os.cpu_count() or 1), PASSWORD_MAX_PENDING)
+registry.gauge(
+    "filadigital_password_pending", "Operações de senha em execução ou na fila", (),
+    lambda: [((), password_pool.metrics()["pendentes"])]
+)
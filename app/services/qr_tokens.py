@@ -0,0 +1,112 @@
+# Tokens dos QR Codes das filas
+# Assinados com HMAC e com expiração: a validação não consulta o banco
+
+import base64
+import hashlib
+import heapq
+import hmac
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import QR_ACTIVE_KEY, QR_KEYS, QR_TOKEN_TTL
+
+# Bytes do HMAC-SHA256 mantidos no token (128 bits), para o QR Code continuar pequeno
+ASSINATURA_BYTES = 16
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+
+def formatar_validade(segundos: int) -> str:
+    """Validade legível de um QR Code: 24h, 90 min"""
+    if segundos % 3600 == 0:
+        return f"{segundos // 3600}h"
+    return f"{max(1, segundos // 60)} min"
+
+
+class QRTokenSigner:
+    """Emite e confere tokens `chave.fila_id.geracao.expira_em.assinatura`.
+
+    A chave usada vem no próprio token, então trocar a chave ativa não invalida
+    os QR Codes já impressos enquanto a chave antiga continuar na lista.
+    """
+
+    def __init__(self, chaves: Dict[str, str], chave_ativa: str, ttl: int):
+        if chave_ativa not in chaves:
+            raise ValueError(f"Chave de QR Code ativa desconhecida: {chave_ativa}")
+        self.chaves = {kid: segredo.encode() for kid, segredo in chaves.items()}
+        self.chave_ativa = chave_ativa
+        self.ttl = ttl
+
+    def _assinar(self, kid: str, conteudo: str) -> str:
+        return _b64(hmac.new(self.chaves[kid], conteudo.encode(), hashlib.sha256).digest()[:ASSINATURA_BYTES])
+
+    def issue(self, fila_id: int, geracao: int, agora: Optional[float] = None) -> Tuple[str, int]:
+        """Devolve (token, expiração em segundos Unix)"""
+        expira_em = int(agora if agora is not None else time.time()) + self.ttl
+        conteudo = f"{self.chave_ativa}.{fila_id}.{geracao}.{expira_em}"
+        return f"{conteudo}.{self._assinar(self.chave_ativa, conteudo)}", expira_em
+
+    def verify(self, token: str, agora: Optional[float] = None) -> Tuple[int, int, int]:
+        """Devolve (fila_id, geracao, expira_em); token inválido ou expirado levanta ValueError"""
+        partes = token.strip().split(".")
+        if len(partes) != 5 or partes[0] not in self.chaves:
+            raise ValueError("QR Code inválido")
+        conteudo, assinatura = token.strip().rsplit(".", 1)
+        if not hmac.compare_digest(assinatura, self._assinar(partes[0], conteudo)):
+            raise ValueError("QR Code inválido")
+        fila_id, geracao, expira_em = int(partes[1]), int(partes[2]), int(partes[3])
+        if expira_em <= (agora if agora is not None else time.time()):
+            raise ValueError("QR Code expirado")
+        return fila_id, geracao, expira_em
+
+
+class RevocationList:
+    """Gerações de QR Code revogadas, por fila.
+
+    Guarda só a menor geração ainda válida de cada fila; tokens anteriores são
+    recusados sem consultar o banco. Cada registro vale até todos os tokens
+    revogados terem expirado e sai da memória por um heap de expirações.
+    """
+
+    def __init__(self):
+        self._minima: Dict[int, Tuple[int, float]] = {}  # fila_id -> (menor geração válida, até quando lembrar)
+        self._expiracoes: List[Tuple[float, int]] = []
+        self._lock = threading.Lock()
+
+    def revoke(self, fila_id: int, geracao_valida: int, ate: float):
+        """Tokens da fila com geração menor que `geracao_valida` deixam de valer"""
+        with self._lock:
+            atual = self._minima.get(fila_id)
+            if atual is not None and atual[0] >= geracao_valida:
+                return
+            self._minima[fila_id] = (geracao_valida, ate)
+            heapq.heappush(self._expiracoes, (ate, fila_id))
+
+    def is_revoked(self, fila_id: int, geracao: int, agora: Optional[float] = None) -> bool:
+        agora = agora if agora is not None else time.time()
+        with self._lock:
+            self._purge(agora)
+            registro = self._minima.get(fila_id)
+            return registro is not None and geracao < registro[0]
+
+    def clear(self):
+        with self._lock:
+            self._minima.clear()
+            self._expiracoes.clear()
+
+    def __len__(self) -> int:
+        return len(self._minima)
+
+    def _purge(self, agora: float):
+        while self._expiracoes and self._expiracoes[0][0] <= agora:
+            ate, fila_id = heapq.heappop(self._expiracoes)
+            # Uma revogação mais nova da mesma fila substitui a antiga no dicionário
+            registro = self._minima.get(fila_id)
+            if registro is not None and registro[1] == ate:
+                del self._minima[fila_id]
+
+
+qr_signer = QRTokenSigner(QR_KEYS, QR_ACTIVE_KEY, QR_TOKEN_TTL)
+qr_revocations = RevocationList()
@@ -0,0 +1,486 @@
+# Motor de filas em memória
+# Mantém, por fila, uma estrutura por classe de prioridade com enqueue, dequeue e rank em O(log n)
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import groupby
+from typing import Deque, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import Fila, HistoricoFila, Priority, SnapshotFila
+from app.services.event_log import CHAMADA, ENTRADA, RECARGA, REMOCAO, Aguardando, EventLogRepository, contiguous, decode_snapshot
+from app.metrics import registry
+from app.services.wait_estimator import WaitEstimator
+
+# Janela usada para a espera média das chamadas recentes (segundos)
+CALL_WINDOW = 15 * 60
+# Atendimentos do histórico usados para aquecer a estimativa quando o motor é criado
+ESTIMATOR_SEED = 64
+
+
+class _PriorityClass:
+    """Entradas aguardando de uma classe de prioridade, em ordem de chegada.
+
+    Cada entrada ocupa um slot (os ids chegam em ordem crescente) e uma árvore
+    de Fenwick sobre os slots ativos responde o rank e aceita remoções no meio
+    da fila sem deslocar nada.
+    """
+
+    # Abaixo desse tamanho não vale a pena compactar os slots removidos
+    _COMPACT_MIN = 64
+
+    def __init__(self):
+        self._ids: List[int] = []         # slot (base 0) -> entrada_id
+        self._tree: List[int] = [0]       # Fenwick em base 1
+        self._slots: Dict[int, int] = {}  # entrada_id ativa -> slot (base 1)
+        self._head = 0                    # primeiro slot possivelmente ativo
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, entrada_id: int) -> bool:
+        return entrada_id in self._slots
+
+    def _prefix(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _add(self, i: int, delta: int):
+        size = len(self._tree) - 1
+        while i <= size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _rebuild(self, ids: List[int]):
+        self._ids, self._tree, self._slots, self._head = [], [0], {}, 0
+        for entrada_id in ids:
+            self._append(entrada_id)
+
+    def _append(self, entrada_id: int):
+        i = len(self._tree)
+        # O nó i cobre os slots (i - lowbit(i), i]: soma os já existentes + o novo
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        self._ids.append(entrada_id)
+        self._slots[entrada_id] = i
+
+    def push(self, entrada_id: int):
+        if entrada_id in self._slots:
+            return
+        if self._ids and entrada_id < self._ids[-1]:
+            # Chegou fora de ordem (ex.: carga concorrente): reconstrói ordenado
+            self._rebuild(sorted(list(self._slots) + [entrada_id]))
+            return
+        self._append(entrada_id)
+
+    def remove(self, entrada_id: int) -> bool:
+        slot = self._slots.pop(entrada_id, None)
+        if slot is None:
+            return False
+        self._add(slot, -1)
+        if len(self._ids) > self._COMPACT_MIN and len(self._slots) * 2 < len(self._ids):
+            self._rebuild([i for i in self._ids if i in self._slots])
+        return True
+
+    def first(self) -> Optional[int]:
+        while self._head < len(self._ids) and self._ids[self._head] not in self._slots:
+            self._head += 1
+        if self._head < len(self._ids):
+            return self._ids[self._head]
+        return None
+
+    def rank(self, entrada_id: int) -> Optional[int]:
+        """Posição (base 1) da entrada dentro da classe"""
+        slot = self._slots.get(entrada_id)
+        if slot is None:
+            return None
+        return self._prefix(slot)
+
+
+class QueueEngine:
+    """Estado em memória dos clientes aguardando em uma fila"""
+
+    def __init__(self, fila_id: int):
+        self.fila_id = fila_id
+        self.lock = threading.RLock()
+        self._classes = {Priority.high: _PriorityClass(), Priority.normal: _PriorityClass()}
+        self._entries: Dict[int, Tuple[int, Priority]] = {}  # entrada_id -> (usuario_id, prioridade)
+        self._by_user: Dict[int, int] = {}                    # usuario_id -> entrada_id
+        self.last_ticket = 0                                  # maior ordem já emitida (o contador fica em Fila.ultimo_ticket)
+        self.versao = 0                                       # Fila.versao refletida neste estado
+        self.seq = 0                                          # último evento refletido no estado (Fila.ultimo_evento)
+        self._calls: Deque[Tuple[float, float]] = deque()     # (momento da chamada, espera em segundos)
+        self.estimator = WaitEstimator()                      # previsão de espera (sobrevive às recargas)
+
+    def _reset(self):
+        self._classes = {Priority.high: _PriorityClass(), Priority.normal: _PriorityClass()}
+        self._entries.clear()
+        self._by_user.clear()
+
+    def enqueue(self, entrada_id: int, usuario_id: int, prioridade: Optional[Priority]):
+        prioridade = prioridade or Priority.normal
+        with self.lock:
+            self._classes[prioridade].push(entrada_id)
+            self._entries[entrada_id] = (usuario_id, prioridade)
+            self._by_user[usuario_id] = entrada_id
+
+    def load(self, aguardando: Aguardando):
+        """Substitui o estado por quem aguarda (snapshot ou tabela), na ordem de chegada"""
+        with self.lock:
+            self._reset()
+            for entrada_id, usuario_id, prioridade in aguardando:
+                self.enqueue(entrada_id, usuario_id, prioridade)
+
+    def apply(self, eventos: List):
+        """Reproduz eventos do log em ordem.
+
+        Aplicar de novo um evento já refletido no estado não muda nada, então a
+        reprodução pode começar antes do ponto em que o motor realmente está.
+        """
+        with self.lock:
+            for evento in eventos:
+                if evento.tipo == ENTRADA:
+                    self.enqueue(evento.entrada_id, evento.usuario_id, evento.prioridade)
+                elif evento.tipo == REMOCAO:
+                    self._reset()
+                else:
+                    self.remove(evento.entrada_id)
+                self.seq = max(self.seq, evento.seq)
+
+    def advance(self, seq: int, eventos: int):
+        """Escrita deste processo gravou `eventos` eventos, o último com o número `seq`.
+
+        Só avança se nada ficou entre eles e o último evento já aplicado; se
+        outro worker escreveu no meio, a próxima atualização (versão nova no
+        banco) reproduz a partir do ponto antigo e pega o que faltou.
+        """
+        with self.lock:
+            if seq - eventos == self.seq:
+                self.seq = seq
+
+    def waiting(self) -> Aguardando:
+        """Quem aguarda, na ordem de chegada (conteúdo de um snapshot)"""
+        with self.lock:
+            return [(entrada_id, usuario_id, prioridade) for entrada_id, (usuario_id, prioridade) in sorted(self._entries.items())]
+
+    def remove(self, entrada_id: int) -> bool:
+        with self.lock:
+            entry = self._entries.pop(entrada_id, None)
+            if entry is None:
+                return False
+            usuario_id, prioridade = entry
+            self._classes[prioridade].remove(entrada_id)
+            if self._by_user.get(usuario_id) == entrada_id:
+                del self._by_user[usuario_id]
+            return True
+
+    def peek(self) -> Optional[int]:
+        """Próxima entrada a ser chamada: alta prioridade primeiro"""
+        with self.lock:
+            proximo = self._classes[Priority.high].first()
+            if proximo is None:
+                proximo = self._classes[Priority.normal].first()
+            return proximo
+
+    def position(self, entrada_id: int) -> Optional[int]:
+        """Posição geral (base 1) da entrada, considerando as prioridades"""
+        with self.lock:
+            entry = self._entries.get(entrada_id)
+            if entry is None:
+                return None
+            rank = self._classes[entry[1]].rank(entrada_id)
+            if entry[1] == Priority.normal:
+                rank += len(self._classes[Priority.high])  # type: ignore
+            return rank
+
+    def entry_for_user(self, usuario_id: int) -> Optional[int]:
+        with self.lock:
+            return self._by_user.get(usuario_id)
+
+    def entries_by_user(self) -> Dict[int, int]:
+        with self.lock:
+            return dict(self._by_user)
+
+    def counts(self) -> Tuple[int, int]:
+        """Retorna (prioridade alta, prioridade normal) aguardando"""
+        with self.lock:
+            return len(self._classes[Priority.high]), len(self._classes[Priority.normal])
+
+    def record_call(self, espera: float, agora: Optional[float] = None):
+        """Registra uma chamada e quanto tempo o cliente esperou"""
+        agora = time.monotonic() if agora is None else agora
+        with self.lock:
+            self._calls.append((agora, espera))
+            self._trim_calls(agora)
+
+    def record_calls(self, agora: datetime, entradas: List[datetime]):
+        """Registra clientes chamados juntos em `agora` (horários de entrada) nas métricas e na estimativa"""
+        with self.lock:
+            for entrada in entradas:
+                self.record_call((agora - entrada).total_seconds())
+            self.estimator.record(agora, entradas)
+
+    def eta(self, entrada_id: int) -> Optional[Tuple[float, float, float]]:
+        """(esperado, mínimo, máximo) em segundos até a entrada ser chamada, em O(1) a partir das estatísticas"""
+        with self.lock:
+            posicao = self.position(entrada_id)
+            return self.estimator.eta(posicao) if posicao is not None else None
+
+    def call_stats(self, agora: Optional[float] = None) -> Tuple[int, Optional[float]]:
+        """Retorna (chamadas no último minuto, espera média das chamadas da janela)"""
+        agora = time.monotonic() if agora is None else agora
+        with self.lock:
+            self._trim_calls(agora)
+            ultimo_minuto = sum(1 for momento, _ in self._calls if momento > agora - 60)
+            if not self._calls:
+                return ultimo_minuto, None
+            return ultimo_minuto, sum(espera for _, espera in self._calls) / len(self._calls)
+
+    def _trim_calls(self, agora: float):
+        while self._calls and self._calls[0][0] <= agora - CALL_WINDOW:
+            self._calls.popleft()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueueEngineRegistry:
+    """Um QueueEngine por fila, carregado sob demanda a partir do banco"""
+
+    def __init__(self):
+        self._engines: Dict[int, QueueEngine] = {}
+        self._lock = threading.Lock()
+
+    def get(self, fila_id: int, session: Session, versao: Optional[int] = None) -> QueueEngine:
+        """Motor da fila; `versao` é a Fila.versao lida do banco e, se for mais nova, atualiza o estado
+
+        Outro processo que escreva na mesma fila incrementa a versão no banco;
+        assim o motor deste processo percebe que ficou para trás e aplica os
+        eventos que perdeu.
+        """
+        engine = self._engines.get(fila_id)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(fila_id)
+                if engine is None:
+                    engine = QueueEngine(fila_id)
+                    self._populate(engine, session)
+                    self._warm_up(engine, session)
+                    self._engines[fila_id] = engine
+                return engine
+        if versao is not None and versao > engine.versao:
+            # Atualiza no mesmo objeto, sob o lock dele: quem já tem a referência continua válido
+            with engine.lock:
+                if versao > engine.versao:
+                    self._catch_up(engine, session)
+        return engine
+
+    def load_all(self, session: Session) -> int:
+        """Carrega os motores de todas as filas ainda não carregadas; devolve quantos criou.
+
+        Para reinícios a quente: o número de consultas não depende do número
+        de filas (contadores e snapshots, eventos posteriores aos snapshots,
+        a tabela só para filas sem snapshot ou com buraco no log, histórico
+        recente).
+        """
+        linhas = [
+            linha for linha in session.query(
+                Fila.id, Fila.versao, Fila.ultimo_ticket, Fila.ultimo_evento, SnapshotFila.seq, SnapshotFila.entradas
+            ).outerjoin(SnapshotFila, SnapshotFila.fila_id == Fila.id).all()
+            if linha.id not in self._engines
+        ]
+        if not linhas:
+            return 0
+        eventos = EventLogRepository.events_after_snapshots(session)
+        sem_log = [
+            linha.id for linha in linhas
+            if linha.seq is None or not contiguous(eventos.get(linha.id, []), linha.seq, linha.ultimo_evento)
+        ]
+        tabela = EventLogRepository.waiting_from_table(session, sem_log)
+
+        novos = []
+        for linha in linhas:
+            engine = QueueEngine(linha.id)
+            if linha.id in tabela:
+                engine.load(tabela[linha.id])
+            else:
+                engine.load(decode_snapshot(linha.entradas))
+                engine.apply(eventos.get(linha.id, []))
+            engine.seq = max(engine.seq, linha.ultimo_evento or 0)
+            engine.versao = linha.versao or 0
+            engine.last_ticket = linha.ultimo_ticket or 0
+            novos.append(engine)
+        self._feed_history(novos, session)
+
+        with self._lock:
+            for engine in novos:
+                self._engines.setdefault(engine.fila_id, engine)
+        return len(novos)
+
+    def save_snapshots(self, session: Session) -> int:
+        """Grava o estado dos motores carregados como snapshot das suas filas; devolve quantos gravou
+
+        A sequência gravada é a do último evento que o motor reflete. O commit fica com quem chama.
+        """
+        atuais = dict(session.query(Fila.id, SnapshotFila.seq).outerjoin(SnapshotFila, SnapshotFila.fila_id == Fila.id).all())
+        estados = {}
+        for engine in self.engines():
+            if engine.fila_id not in atuais:  # fila apagada
+                continue
+            with engine.lock:
+                anterior = atuais[engine.fila_id]
+                if anterior is None or engine.seq > anterior:
+                    estados[engine.fila_id] = (engine.seq, engine.waiting())
+        EventLogRepository.save_snapshots(session, estados)
+        return len(estados)
+
+    def loaded(self, fila_id: int) -> Optional[QueueEngine]:
+        return self._engines.get(fila_id)
+
+    def discard(self, fila_id: int):
+        with self._lock:
+            self._engines.pop(fila_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._engines.clear()
+
+    def engines(self) -> List[QueueEngine]:
+        return list(self._engines.values())
+
+    @staticmethod
+    def _populate(engine: QueueEngine, session: Session):
+        """Estado completo: último snapshot mais os eventos seguintes.
+
+        Sem snapshot, ou se faltar algum evento até Fila.ultimo_evento (ex.:
+        linhas gravadas por fora do serviço), lê quem aguarda direto da tabela.
+        """
+        contadores = session.query(Fila.versao, Fila.ultimo_ticket, Fila.ultimo_evento, SnapshotFila.seq, SnapshotFila.entradas)\
+            .outerjoin(SnapshotFila, SnapshotFila.fila_id == Fila.id)\
+            .filter(Fila.id == engine.fila_id)\
+            .first()  # type: ignore
+        ultimo = (contadores.ultimo_evento or 0) if contadores is not None else 0
+        eventos = None
+        if contadores is not None and contadores.seq is not None:
+            eventos = EventLogRepository.events_after(session, engine.fila_id, contadores.seq)
+            if not contiguous(eventos, contadores.seq, ultimo):
+                eventos = None
+
+        with engine.lock:
+            if eventos is not None:
+                engine.load(decode_snapshot(contadores.entradas))
+                engine.apply(eventos)
+            else:
+                engine.load(EventLogRepository.waiting_from_table(session, [engine.fila_id])[engine.fila_id])
+            engine.seq = max(engine.seq, ultimo)
+            if contadores is not None:
+                engine.versao = contadores.versao or 0
+                # O ticket nunca volta, nem se o contador no banco estiver atrasado
+                engine.last_ticket = max(engine.last_ticket, contadores.ultimo_ticket or 0)
+
+    @staticmethod
+    def _catch_up(engine: QueueEngine, session: Session):
+        """Aplica só os eventos posteriores ao último que o motor viu; recarga ou buraco no log refaz tudo"""
+        contadores = session.query(Fila.versao, Fila.ultimo_ticket, Fila.ultimo_evento).filter(Fila.id == engine.fila_id).first()  # type: ignore
+        if contadores is None:
+            return
+        eventos = EventLogRepository.events_after(session, engine.fila_id, engine.seq)
+        if not contiguous(eventos, engine.seq, contadores.ultimo_evento or 0) or any(e.tipo == RECARGA for e in eventos):
+            QueueEngineRegistry._populate(engine, session)
+            return
+        engine.apply(eventos)
+        engine.versao = contadores.versao or 0
+        engine.last_ticket = max(engine.last_ticket, contadores.ultimo_ticket or 0)
+        QueueEngineRegistry._feed_calls(engine, session, [e.entrada_id for e in eventos if e.tipo == CHAMADA])
+
+    @staticmethod
+    def _warm_up(engine: QueueEngine, session: Session):
+        """Alimenta a estimativa com os últimos atendimentos da fila (uma consulta, só na criação do motor)"""
+        recentes = session.query(HistoricoFila.horario_saida, HistoricoFila.horario_entrada)\
+            .filter(
+                HistoricoFila.fila_id == engine.fila_id,  # type: ignore
+                HistoricoFila.status == "atendido",  # type: ignore
+                HistoricoFila.horario_saida.isnot(None)  # type: ignore
+            )\
+            .order_by(HistoricoFila.horario_saida.desc())\
+            .limit(ESTIMATOR_SEED)\
+            .all()
+        _seed_estimator(engine, reversed(recentes))
+
+    @staticmethod
+    def _feed_calls(engine: QueueEngine, session: Session, entrada_ids: List[int]):
+        """Chamadas que outros workers fizeram entram na estimativa (horários do histórico, uma consulta)
+
+        As que não são mais novas que a última chamada vista pelo motor já
+        foram registradas (chamadas deste processo) e ficam de fora.
+        """
+        if not entrada_ids:
+            return
+        consulta = session.query(HistoricoFila.horario_saida, HistoricoFila.horario_entrada)\
+            .filter(
+                HistoricoFila.fila_id == engine.fila_id,  # type: ignore
+                HistoricoFila.entrada_id.in_(entrada_ids),  # type: ignore
+                HistoricoFila.status == "atendido",  # type: ignore
+                HistoricoFila.horario_saida.isnot(None)  # type: ignore
+            )
+        ultima = engine.estimator.ultima_chamada
+        if ultima is not None:
+            consulta = consulta.filter(HistoricoFila.horario_saida > ultima)  # type: ignore
+        _seed_estimator(engine, consulta.order_by(HistoricoFila.horario_saida).all())
+
+    @staticmethod
+    def _feed_history(engines: List[QueueEngine], session: Session):
+        """Como `_warm_up`, para várias filas em uma consulta (os últimos atendimentos de cada uma)"""
+        por_fila = {engine.fila_id: engine for engine in engines}
+        ordem = func.row_number().over(partition_by=HistoricoFila.fila_id, order_by=HistoricoFila.horario_saida.desc()).label("n")
+        recentes = select(HistoricoFila.fila_id, HistoricoFila.horario_saida, HistoricoFila.horario_entrada, ordem)\
+            .where(HistoricoFila.status == "atendido", HistoricoFila.horario_saida.isnot(None))\
+            .subquery()
+        linhas = session.execute(
+            select(recentes.c.fila_id, recentes.c.horario_saida, recentes.c.horario_entrada)
+            .where(recentes.c.n <= ESTIMATOR_SEED)
+            .order_by(recentes.c.fila_id, recentes.c.horario_saida)
+        ).all()
+        for fila_id, grupo in groupby(linhas, key=lambda linha: linha[0]):
+            if fila_id in por_fila:
+                _seed_estimator(por_fila[fila_id], ((saida, entrada) for _, saida, entrada in grupo))
+
+
+def _seed_estimator(engine: QueueEngine, recentes):
+    """`recentes`: (horario_saida, horario_entrada) do mais antigo para o mais novo"""
+    # Chamadas em lote têm o mesmo horário de saída
+    for saida, grupo in groupby(recentes, key=lambda linha: linha[0]):
+        engine.estimator.record(saida, [entrada or saida for _, entrada in grupo])
+
+
+# Registro único do processo
+queue_engines = QueueEngineRegistry()
+
+
+def _collect_waiting():
+    return [((str(e.fila_id),), len(e)) for e in queue_engines.engines()]
+
+def _collect_calls_per_minute():
+    return [((str(e.fila_id),), e.call_stats()[0]) for e in queue_engines.engines()]
+
+def _collect_average_wait():
+    medias = ((e.fila_id, e.call_stats()[1]) for e in queue_engines.engines())
+    return [((str(fila_id),), media) for fila_id, media in medias if media is not None]
+
+def _collect_service_interval():
+    medias = ((e.fila_id, e.estimator.snapshot()["intervalo_medio"]) for e in queue_engines.engines())
+    return [((str(fila_id),), media) for fila_id, media in medias if media is not None]
+
+# Métricas por fila (só filas já carregadas neste processo)
+registry.gauge("filadigital_queue_waiting", "Clientes aguardando na fila", ("fila_id",), _collect_waiting)
+registry.gauge("filadigital_queue_calls_per_minute", "Clientes chamados no último minuto", ("fila_id",), _collect_calls_per_minute)
+registry.gauge(
+    "filadigital_queue_average_wait_seconds", "Espera média dos clientes chamados nos últimos 15 minutos", ("fila_id",), _collect_average_wait
+)
+registry.gauge(
+    "filadigital_queue_service_interval_seconds", "Intervalo médio (EWMA) entre chamadas com a fila ocupada", ("fila_id",), _collect_service_interval
+)
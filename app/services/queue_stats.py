@@ -0,0 +1,167 @@
+# Repositório de estatísticas de filas
+# Lê e mantém os contadores guardados em cada fila, sem contar linhas de usuarios_na_fila nas leituras
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.models import Fila, UsuariosNaFila, Priority
+from app.services.history import HistoryRepository
+from app.services.event_log import RECARGA, EventLogRepository
+
+
+def _stats(alta: int, normal: int) -> Dict[str, int]:
+    return {"total_aguardando": alta + normal, "prioridade_alta": alta, "prioridade_normal": normal}
+
+
+def _coluna_aguardando(prioridade: Optional[Priority]):
+    return Fila.aguardando_alta if prioridade == Priority.high else Fila.aguardando_normal
+
+
+class QueueStatsRepository:
+    """Contadores por fila: aguardando por prioridade, atendidos, último ticket, versão e sequência de eventos"""
+
+    @staticmethod
+    def of(fila: Fila) -> Dict[str, int]:
+        """Estatísticas de uma fila já carregada, sem consulta"""
+        return _stats(fila.aguardando_alta or 0, fila.aguardando_normal or 0)  # type: ignore
+
+    @staticmethod
+    def counts(session: Session, fila_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """Retorna {fila_id: {total_aguardando, prioridade_alta, prioridade_normal}} em uma consulta"""
+        fila_ids = set(fila_ids)
+        stats = {fila_id: _stats(0, 0) for fila_id in fila_ids}
+        if not fila_ids:
+            return stats
+        linhas = session.query(Fila.id, Fila.aguardando_alta, Fila.aguardando_normal)\
+            .filter(Fila.id.in_(fila_ids))\
+            .all()  # type: ignore
+        for fila_id, alta, normal in linhas:
+            stats[fila_id] = _stats(alta, normal)
+        return stats
+
+    # Escritas: só montam o UPDATE; quem chama faz o commit junto com a alteração da entrada.
+    # Cada uma também reserva os números dos eventos da operação (EventLogRepository.append)
+    # e devolve o último deles (Fila.ultimo_evento), que o motor da fila passa a refletir
+
+    @staticmethod
+    def on_enqueue(session: Session, fila_id: int, prioridade: Optional[Priority]) -> Tuple[int, int]:
+        """Emite o próximo ticket da fila e conta a entrada, em um único UPDATE ... RETURNING; devolve (ticket, evento).
+
+        Deve ser a primeira escrita da transação: a linha da fila fica travada
+        até o commit, então entradas simultâneas (mesmo em outros workers)
+        recebem tickets diferentes e consecutivos.
+        """
+        coluna = _coluna_aguardando(prioridade)
+        ticket, evento = session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                coluna: coluna + 1, Fila.ultimo_ticket: Fila.ultimo_ticket + 1, Fila.versao: Fila.versao + 1,
+                Fila.ultimo_evento: Fila.ultimo_evento + 1
+            }).returning(Fila.ultimo_ticket, Fila.ultimo_evento).execution_options(synchronize_session=False)
+        ).one()
+        return ticket, evento
+
+    @staticmethod
+    def on_enqueue_batch(session: Session, fila_id: int, alta: int, normal: int) -> Tuple[int, int]:
+        """Reserva `alta + normal` tickets consecutivos de uma vez; devolve (primeiro ticket, último evento)"""
+        quantidade = alta + normal
+        ultimo, evento = session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                Fila.aguardando_alta: Fila.aguardando_alta + alta,
+                Fila.aguardando_normal: Fila.aguardando_normal + normal,
+                Fila.ultimo_ticket: Fila.ultimo_ticket + quantidade,
+                Fila.versao: Fila.versao + 1,
+                Fila.ultimo_evento: Fila.ultimo_evento + quantidade
+            }).returning(Fila.ultimo_ticket, Fila.ultimo_evento).execution_options(synchronize_session=False)
+        ).one()
+        return ultimo - quantidade + 1, evento
+
+    @staticmethod
+    def on_serve(session: Session, fila_id: int, prioridade: Optional[Priority]) -> int:
+        coluna = _coluna_aguardando(prioridade)
+        return session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                coluna: coluna - 1, Fila.total_atendidos: Fila.total_atendidos + 1, Fila.versao: Fila.versao + 1,
+                Fila.ultimo_evento: Fila.ultimo_evento + 1
+            }).returning(Fila.ultimo_evento).execution_options(synchronize_session=False)
+        ).scalar_one()
+
+    @staticmethod
+    def on_serve_batch(session: Session, fila_id: int, alta: int, normal: int) -> int:
+        return session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                Fila.aguardando_alta: Fila.aguardando_alta - alta,
+                Fila.aguardando_normal: Fila.aguardando_normal - normal,
+                Fila.total_atendidos: Fila.total_atendidos + alta + normal,
+                Fila.versao: Fila.versao + 1,
+                Fila.ultimo_evento: Fila.ultimo_evento + alta + normal
+            }).returning(Fila.ultimo_evento).execution_options(synchronize_session=False)
+        ).scalar_one()
+
+    @staticmethod
+    def on_leave(session: Session, fila_id: int, prioridade: Optional[Priority], status: str) -> Optional[int]:
+        """Entrada saiu da fila: quem aguardava sai da contagem (atendimentos vão para o histórico e continuam no total).
+
+        Se a fila mudou (e portanto ganhou uma versão nova), devolve o número do evento; senão, None.
+        """
+        if status != "aguardando":
+            return None
+        coluna = _coluna_aguardando(prioridade)
+        return session.execute(
+            update(Fila).where(Fila.id == fila_id).values({
+                coluna: coluna - 1, Fila.versao: Fila.versao + 1, Fila.ultimo_evento: Fila.ultimo_evento + 1
+            }).returning(Fila.ultimo_evento).execution_options(synchronize_session=False)
+        ).scalar_one()
+
+    @staticmethod
+    def repair(session: Session, fila_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """Recalcula os contadores a partir de usuarios_na_fila e do histórico; devolve os ids das filas corrigidas
+
+        Filas corrigidas ganham uma versão nova, um evento de recarga e um snapshot
+        lido da tabela, o que faz os motores em memória recarregarem.
+        O commit fica com quem chama.
+        """
+        consulta_filas = session.query(Fila)
+        consulta_entradas = session.query(
+            UsuariosNaFila.fila_id, UsuariosNaFila.status, UsuariosNaFila.prioridade,
+            func.count(UsuariosNaFila.id), func.max(UsuariosNaFila.ordem)
+        )
+        if fila_ids is not None:
+            fila_ids = list(fila_ids)
+            consulta_filas = consulta_filas.filter(Fila.id.in_(fila_ids))  # type: ignore
+            consulta_entradas = consulta_entradas.filter(UsuariosNaFila.fila_id.in_(fila_ids))  # type: ignore
+
+        esperado: Dict[int, Dict[str, int]] = {}
+        linhas = consulta_entradas.group_by(UsuariosNaFila.fila_id, UsuariosNaFila.status, UsuariosNaFila.prioridade).all()
+        for fila_id, status, prioridade, quantidade, maior_ordem in linhas:
+            valores = esperado.setdefault(fila_id, {"aguardando_alta": 0, "aguardando_normal": 0, "total_atendidos": 0, "ultimo_ticket": 0})
+            if status == "aguardando":
+                valores["aguardando_alta" if prioridade == Priority.high else "aguardando_normal"] += quantidade
+            elif status == "atendido":
+                valores["total_atendidos"] += quantidade
+            valores["ultimo_ticket"] = max(valores["ultimo_ticket"], maior_ordem or 0)
+
+        # Atendimentos já arquivados continuam contando
+        for fila_id, atendidos, maior_ordem in HistoryRepository.served_counts(session, fila_ids):
+            valores = esperado.setdefault(fila_id, {"aguardando_alta": 0, "aguardando_normal": 0, "total_atendidos": 0, "ultimo_ticket": 0})
+            valores["total_atendidos"] += atendidos or 0
+            valores["ultimo_ticket"] = max(valores["ultimo_ticket"], maior_ordem or 0)
+
+        corrigidas = []
+        for fila in consulta_filas.all():
+            valores = esperado.get(fila.id, {"aguardando_alta": 0, "aguardando_normal": 0, "total_atendidos": 0, "ultimo_ticket": 0})  # type: ignore
+            # O último ticket nunca volta: saídas apagam linhas, mas o ticket já foi emitido
+            valores["ultimo_ticket"] = max(valores["ultimo_ticket"], fila.ultimo_ticket or 0)  # type: ignore
+            if any(getattr(fila, coluna) != valor for coluna, valor in valores.items()):
+                for coluna, valor in valores.items():
+                    setattr(fila, coluna, valor)
+                fila.versao = (fila.versao or 0) + 1  # type: ignore
+                fila.ultimo_evento = (fila.ultimo_evento or 0) + 1  # type: ignore
+                corrigidas.append(fila)
+
+        if corrigidas:
+            session.flush()
+            aguardando = EventLogRepository.waiting_from_table(session, [fila.id for fila in corrigidas])  # type: ignore
+            for fila in corrigidas:
+                EventLogRepository.append(session, fila.id, RECARGA)  # type: ignore
+            EventLogRepository.save_snapshots(session, {fila.id: (fila.ultimo_evento, aguardando[fila.id]) for fila in corrigidas})  # type: ignore
+        return [fila.id for fila in corrigidas]  # type: ignore
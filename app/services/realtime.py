@@ -0,0 +1,102 @@
+# Canal de tempo real
+# Distribui eventos de filas (entradas, chamadas, saídas e posições) para os clientes conectados via WebSocket
+# Os inscritos ficam em memória: cada worker só entrega o que ele mesmo publicou
+
+import asyncio
+import threading
+from typing import Dict, Hashable, Set
+
+
+# Cada conexão guarda no máximo esse número de mensagens pendentes
+SUBSCRIPTION_BUFFER = 256
+
+
+class Subscription:
+    """Uma conexão inscrita em um ou mais canais"""
+
+    def __init__(self, usuario_id: int, loop: asyncio.AbstractEventLoop):
+        self.usuario_id = usuario_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIPTION_BUFFER)
+        self.channels: Set[Hashable] = set()
+
+    def _put(self, mensagem: Dict):
+        if self.queue.full():
+            # Cliente lento: descarta o acumulado e pede para ele recarregar tudo
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            mensagem = {"tipo": "ressincronizar"}
+        self.queue.put_nowait(mensagem)
+
+    def push(self, mensagem: Dict):
+        """Entrega a mensagem; pode ser chamado de qualquer thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, mensagem)
+        except RuntimeError:
+            # Loop da conexão já foi encerrado
+            pass
+
+
+class QueueEventHub:
+    """Publica mensagens por canal: ("fila", id) para painéis e ("usuario", id) para clientes"""
+
+    def __init__(self):
+        self._channels: Dict[Hashable, Set[Subscription]] = {}
+        self._users: Dict[int, int] = {}  # usuario_id -> conexões abertas
+        self._lock = threading.Lock()
+
+    def connect(self, usuario_id: int) -> Subscription:
+        assinatura = Subscription(usuario_id, asyncio.get_running_loop())
+        with self._lock:
+            self._users[usuario_id] = self._users.get(usuario_id, 0) + 1
+        self.subscribe(assinatura, ("usuario", usuario_id))
+        return assinatura
+
+    def disconnect(self, assinatura: Subscription):
+        with self._lock:
+            for canal in assinatura.channels:
+                inscritos = self._channels.get(canal)
+                if inscritos is not None:
+                    inscritos.discard(assinatura)
+                    if not inscritos:
+                        del self._channels[canal]
+            assinatura.channels.clear()
+            restantes = self._users.get(assinatura.usuario_id, 0) - 1
+            if restantes > 0:
+                self._users[assinatura.usuario_id] = restantes
+            else:
+                self._users.pop(assinatura.usuario_id, None)
+
+    def subscribe(self, assinatura: Subscription, canal: Hashable):
+        with self._lock:
+            self._channels.setdefault(canal, set()).add(assinatura)
+            assinatura.channels.add(canal)
+
+    def unsubscribe(self, assinatura: Subscription, canal: Hashable):
+        with self._lock:
+            inscritos = self._channels.get(canal)
+            if inscritos is not None:
+                inscritos.discard(assinatura)
+                if not inscritos:
+                    del self._channels[canal]
+            assinatura.channels.discard(canal)
+
+    def has_subscribers(self, canal: Hashable) -> bool:
+        return canal in self._channels
+
+    def connected_users(self) -> Set[int]:
+        with self._lock:
+            return set(self._users)
+
+    def publish(self, canal: Hashable, mensagem: Dict):
+        inscritos = self._channels.get(canal)
+        if not inscritos:
+            return
+        with self._lock:
+            inscritos = list(inscritos)
+        for assinatura in inscritos:
+            assinatura.push(mensagem)
+
+
+# Hub único do processo
+event_hub = QueueEventHub()
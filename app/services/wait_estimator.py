@@ -0,0 +1,167 @@
+# Estimativa de espera por fila
+# Estatísticas atualizadas a cada chamada (EWMA e quantis P²); a previsão para uma posição sai em O(1)
+
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Peso da observação mais recente nas médias móveis exponenciais
+EWMA_ALPHA = 0.2
+# Intervalos observados antes de arriscar uma previsão
+MIN_SAMPLES = 3
+# z da faixa de ~80% (10% a 90%) da previsão
+FAIXA_Z = 1.2816
+
+
+class EWMA:
+    """Média e variância móveis exponenciais (atualização incremental de West)"""
+
+    __slots__ = ("alpha", "mean", "var", "count")
+
+    def __init__(self, alpha: float = EWMA_ALPHA):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def update(self, valor: float):
+        self.count += 1
+        if self.count == 1:
+            self.mean = valor
+            return
+        diferenca = valor - self.mean
+        incremento = self.alpha * diferenca
+        self.mean += incremento
+        self.var = (1 - self.alpha) * (self.var + diferenca * incremento)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class P2Quantile:
+    """Quantil aproximado em memória constante (algoritmo P² de Jain e Chlamtac)"""
+
+    __slots__ = ("p", "_q", "_n", "_np", "_dn", "_iniciais")
+
+    def __init__(self, p: float):
+        self.p = p
+        self._iniciais: List[float] = []
+        self._q: List[float] = []
+        self._n: List[int] = []
+        self._np: List[float] = []
+        self._dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def __len__(self) -> int:
+        return self._n[4] if self._n else len(self._iniciais)
+
+    def add(self, valor: float):
+        if not self._q:
+            self._iniciais.append(valor)
+            if len(self._iniciais) == 5:
+                self._q = sorted(self._iniciais)
+                self._n = [1, 2, 3, 4, 5]
+                p = self.p
+                self._np = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+            return
+
+        q, n = self._q, self._n
+        if valor < q[0]:
+            q[0] = valor
+            k = 0
+        elif valor >= q[4]:
+            q[4] = valor
+            k = 3
+        else:
+            k = 0
+            while valor >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+
+        # Ajusta os três marcadores do meio para perto das posições desejadas
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                passo = 1 if d > 0 else -1
+                candidato = q[i] + passo / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + passo) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - passo) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidato < q[i + 1]:
+                    candidato = q[i] + passo * (q[i + passo] - q[i]) / (n[i + passo] - n[i])
+                q[i] = candidato
+                n[i] += passo
+
+    def value(self) -> Optional[float]:
+        if self._q:
+            return self._q[2]
+        if not self._iniciais:
+            return None
+        ordenados = sorted(self._iniciais)
+        return ordenados[min(len(ordenados) - 1, int(round(self.p * (len(ordenados) - 1))))]
+
+
+class WaitEstimator:
+    """Estatísticas de atendimento de uma fila, alimentadas a cada chamada.
+
+    O intervalo entre chamadas só entra na conta quando a fila não ficou
+    vazia no meio (o cliente chamado já aguardava na chamada anterior);
+    caso contrário o tempo ocioso inflaria a estimativa. Chamadas em lote
+    dividem o intervalo igualmente entre os clientes chamados.
+    """
+
+    def __init__(self):
+        self.intervalo = EWMA()
+        self.espera = EWMA()
+        self.intervalo_p90 = P2Quantile(0.9)
+        self.espera_p50 = P2Quantile(0.5)
+        self.espera_p90 = P2Quantile(0.9)
+        self.ultima_chamada: Optional[datetime] = None
+
+    def record(self, agora: datetime, entradas: List[datetime]):
+        """Registra os clientes chamados em `agora`; `entradas` são os horários em que entraram na fila"""
+        if not entradas:
+            return
+        for entrada in entradas:
+            espera = max(0.0, (agora - entrada).total_seconds())
+            self.espera.update(espera)
+            self.espera_p50.add(espera)
+            self.espera_p90.add(espera)
+
+        anterior = self.ultima_chamada
+        if anterior is not None and agora > anterior and any(entrada <= anterior for entrada in entradas):
+            intervalo = (agora - anterior).total_seconds() / len(entradas)
+            for _ in entradas:
+                self.intervalo.update(intervalo)
+                self.intervalo_p90.add(intervalo)
+        if anterior is None or agora > anterior:
+            self.ultima_chamada = agora
+
+    def eta(self, posicao: int) -> Optional[Tuple[float, float, float]]:
+        """(esperado, mínimo, máximo) em segundos até a chamada de quem está na `posicao`"""
+        if posicao < 1 or self.intervalo.count < MIN_SAMPLES:
+            return None
+        esperado = posicao * self.intervalo.mean
+        # Soma de `posicao` intervalos: o desvio cresce com a raiz da posição
+        margem = FAIXA_Z * self.intervalo.std * math.sqrt(posicao)
+        return esperado, max(0.0, esperado - margem), esperado + margem
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "intervalo_medio": self.intervalo.mean if self.intervalo.count else None,
+            "intervalo_p90": self.intervalo_p90.value(),
+            "espera_media": self.espera.mean if self.espera.count else None,
+            "espera_p50": self.espera_p50.value(),
+            "espera_p90": self.espera_p90.value()
+        }
+
+
+def formatar_estimativa(minimo: float, maximo: float) -> str:
+    """Faixa em minutos para exibição (ex.: "12-18 min")"""
+    if maximo < 60:
+        return "menos de 1 min"
+    de, ate = max(1, math.floor(minimo / 60)), math.ceil(maximo / 60)
+    return f"{ate} min" if de >= ate else f"{de}-{ate} min"
@@ -0,0 +1,80 @@
+# Perfil de SQL por requisição
+# Conta e cronometra os comandos de cada requisição e aponta comandos repetidos (provável N+1)
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event  # type: ignore
+
+# A partir de quantas execuções do mesmo comando na requisição ele é tratado como N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+
+class SQLProfile:
+    """Comandos executados durante uma requisição (ou um bloco `with sql_profile()`)"""
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Dict[str, int] = {}  # texto parametrizado -> execuções
+
+    def record(self, statement: str, duracao: float):
+        self.count += 1
+        self.duration += duracao
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, minimo: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Comandos idênticos executados `minimo` vezes ou mais, do mais repetido para o menos"""
+        return sorted(
+            ((statement, vezes) for statement, vezes in self.statements.items() if vezes >= minimo),
+            key=lambda item: -item[1]
+        )
+
+
+# Perfil da requisição em andamento (o threadpool das rotas herda o contexto)
+current_profile: ContextVar[Optional[SQLProfile]] = ContextVar("current_profile", default=None)
+
+
+def install(engine, on_statement=None):
+    """Registra os listeners no engine; `on_statement` é chamado a cada comando (ex.: métricas)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sql_profile_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info["sql_profile_inicio"].pop()
+        if on_statement is not None:
+            on_statement()
+        perfil = current_profile.get()
+        if perfil is not None:
+            perfil.record(statement, time.perf_counter() - inicio)
+
+
+@contextmanager
+def sql_profile() -> Iterator[SQLProfile]:
+    """Mede os comandos executados no bloco (mesma thread ou threads que herdam o contexto)"""
+    perfil = SQLProfile()
+    token = current_profile.set(perfil)
+    try:
+        yield perfil
+    finally:
+        current_profile.reset(token)
+
+
+def debug_headers(perfil: SQLProfile) -> List[Tuple[bytes, bytes]]:
+    """Cabeçalhos X-SQL-* com o resumo do perfil"""
+    cabecalhos = [
+        (b"x-sql-count", str(perfil.count).encode()),
+        (b"x-sql-time-ms", f"{perfil.duration * 1000:.2f}".encode()),
+    ]
+    repetidos = perfil.repeated()
+    if repetidos:
+        # Só o início de cada comando, para o cabeçalho não ficar enorme
+        resumo = "; ".join(f"{vezes}x {' '.join(statement.split())[:80]}" for statement, vezes in repetidos[:3])
+        cabecalhos.append((b"x-sql-n-plus-one", resumo.encode("latin-1", "replace")))
+    return cabecalhos
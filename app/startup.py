@@ -0,0 +1,77 @@
+# Inicialização e desligamento da aplicação
+# Schema opcional, aquecimento antes de aceitar requisições e snapshot das filas ao desligar
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from app.config import DB_POOL_SIZE, WARMUP_DB_CONNECTIONS
+from app.database import Base, SessionLocal, engine
+from app.metrics import registry
+from app.services.password_pool import password_pool
+from app.services.queue_engine import queue_engines
+
+# Duração de cada etapa do último aquecimento (segundos)
+warm_up_seconds: Dict[str, float] = {}
+
+registry.gauge(
+    "filadigital_startup_warmup_seconds", "Duração de cada etapa do aquecimento na inicialização", ("etapa",),
+    lambda: [((etapa,), segundos) for etapa, segundos in warm_up_seconds.items()]
+)
+
+
+@contextmanager
+def _etapa(nome: str) -> Iterator[None]:
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        warm_up_seconds[nome] = time.perf_counter() - inicio
+
+
+def create_schema():
+    """Cria as tabelas que faltarem (testes e desenvolvimento); em produção o schema vem do Alembic"""
+    Base.metadata.create_all(bind=engine)
+
+
+def warm_up() -> Dict[str, float]:
+    """Deixa o processo pronto antes da primeira requisição; devolve a duração de cada etapa
+
+    Abre conexões do pool (no SQLite, os PRAGMAs rodam na abertura), carrega
+    o bcrypt e o JWT, que a importação da aplicação deixa para depois, e monta
+    os motores de todas as filas a partir dos snapshots e do log de eventos.
+    """
+    with _etapa("conexoes"):
+        conexoes = []
+        try:
+            for _ in range(max(0, min(WARMUP_DB_CONNECTIONS, DB_POOL_SIZE))):
+                conexoes.append(engine.connect())
+        finally:
+            for conexao in conexoes:
+                conexao.close()
+
+    with _etapa("senhas"):
+        password_pool.warm_up()
+
+    with _etapa("tokens"):
+        from jose import jwt  # type: ignore  # noqa: F401
+
+    with _etapa("filas"):
+        session = SessionLocal()
+        try:
+            queue_engines.load_all(session)
+        finally:
+            session.close()
+
+    return dict(warm_up_seconds)
+
+
+def shut_down(snapshots: bool = True):
+    """Grava o estado das filas carregadas como snapshot e fecha as conexões do pool"""
+    if snapshots and queue_engines.engines():
+        session = SessionLocal()
+        try:
+            queue_engines.save_snapshots(session)
+            session.commit()
+        finally:
+            session.close()
+    engine.dispose()
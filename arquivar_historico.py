@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Move para historico_filas as entradas finalizadas que ainda estão em usuarios_na_fila.
+
+Chamadas e saídas já arquivam na hora; este script cuida dos dados de antes
+disso e pode rodar agendado (cron), já que só encontra trabalho se sobrar algo.
+
+Uso:
+    python arquivar_historico.py            # arquiva tudo, em lotes
+    python arquivar_historico.py --lote 500 # tamanho do lote (uma transação por lote)
+"""
+
+import sys
+from app.database import SessionLocal
+from app.services.history import ARCHIVE_BATCH, HistoryRepository
+
+
+def main():
+    argumentos = sys.argv[1:]
+    lote = int(argumentos[argumentos.index("--lote") + 1]) if "--lote" in argumentos else ARCHIVE_BATCH
+
+    total = 0
+    session = SessionLocal()
+    try:
+        while True:
+            movidas = HistoryRepository.archive_finished(session, lote)
+            session.commit()
+            total += movidas
+            if movidas < lote:
+                break
+    finally:
+        session.close()
+
+    print(f"Entradas arquivadas: {total}")
+
+
+if __name__ == "__main__":
+    main()
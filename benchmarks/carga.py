@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Suíte de carga da API FilaDigital
+
+Semeia N estabelecimentos, filas e clientes em um banco SQLite temporário e
+executa, em sequência, misturas de tráfego realistas:
+
+    entrada     clientes entrando em filas (POST /filas/entrar-na-fila)
+    chamada     donos chamando o próximo (POST /filas/{id}/chamar-proximo)
+    posicao     clientes consultando a posição (GET /filas/minha-posicao)
+    dashboards  dashboards e listagens de cliente, dono e funcionário
+    misto       tudo junto, na proporção de um horário de pico
+
+Para cada mistura reporta requisições por segundo, latências p50/p95/p99 e
+comandos SQL por requisição (por rota e no total). A aplicação roda em
+processo (httpx + ASGITransport) ou, com --uvicorn, em um servidor uvicorn
+local; nesse modo os comandos SQL não são contados.
+
+Os resultados podem ser salvos como baseline e comparados entre versões:
+
+    python benchmarks/carga.py --salvar benchmarks/baselines/1.0.0.json
+    python benchmarks/carga.py --comparar benchmarks/baselines/1.0.0.json --tolerancia 15
+    python benchmarks/carga.py --misturas posicao,chamada --duracao 5 --uvicorn
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+RAIZ_PADRAO = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MISTURAS_PADRAO = ["entrada", "chamada", "posicao", "dashboards", "misto"]
+
+# Comandos SQL da requisição em andamento (cada cliente simulado é uma task própria)
+_sql_da_requisicao = contextvars.ContextVar("sql_da_requisicao", default=None)
+
+
+def preparar_ambiente(raiz):
+    """Importa a aplicação de `raiz` usando um banco temporário; devolve (app, engine, pasta)"""
+    pasta = tempfile.mkdtemp(prefix="filadigital-bench-")
+    # O banco padrão é relativo ao diretório atual; o front-end é montado na importação
+    os.symlink(os.path.join(raiz, "frontend"), os.path.join(pasta, "frontend"))
+    os.chdir(pasta)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(pasta, 'bench.db')}")
+    # Todo o tráfego simulado sai do mesmo IP: o limite de entradas por IP recusaria a carga
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    sys.path.insert(0, raiz)
+
+    from app.main import app  # noqa: E402
+    from app.database import Base, engine  # noqa: E402
+    Base.metadata.create_all(bind=engine)
+    return app, engine, pasta
+
+
+def contar_sql(engine):
+    """Soma cada comando executado no contador da requisição corrente"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        contador = _sql_da_requisicao.get()
+        if contador is not None:
+            contador[0] += 1
+
+
+def semear(engine, estabelecimentos, filas_por_estabelecimento, clientes_por_fila, novos_clientes=0):
+    """Cria os dados diretamente pelo ORM e devolve os tokens de acesso"""
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Usuario, Estabelecimento, Fila, UsuariosNaFila, Role, Priority
+    from app.routers.usuarios import criar_token
+
+    session = sessionmaker(bind=engine)()
+    senha = "bench-sem-login"
+
+    donos, funcionarios, clientes, novos, filas = [], [], [], [], []
+    for e in range(estabelecimentos):
+        dono = Usuario(f"Dono {e}", f"dono{e}@bench.com", senha, role=Role.dono)
+        session.add(dono)
+        session.flush()
+        estabelecimento = Estabelecimento(f"Estabelecimento {e}", "Rua", "Bairro", "Cidade", "SP", "0", dono.id)  # type: ignore
+        session.add(estabelecimento)
+        session.flush()
+        funcionario = Usuario(f"Funcionário {e}", f"funcionario{e}@bench.com", senha, role=Role.funcionario)
+        funcionario.establishment_id = estabelecimento.id
+        session.add(funcionario)
+        donos.append(dono)
+        funcionarios.append(funcionario)
+        for f in range(filas_por_estabelecimento):
+            fila = Fila(f"Fila {e}-{f}", "Fila de benchmark", estabelecimento.id)  # type: ignore
+            session.add(fila)
+            session.flush()
+            filas.append(fila)
+
+    contador = 0
+    for fila in filas:
+        for ordem in range(1, clientes_por_fila + 1):
+            cliente = Usuario(f"Cliente {contador}", f"cliente{contador}@bench.com", senha, role=Role.usuario)
+            session.add(cliente)
+            session.flush()
+            prioridade = Priority.high if ordem % 5 == 0 else Priority.normal
+            session.add(UsuariosNaFila(cliente.id, fila.id, ordem, prioridade=prioridade))  # type: ignore
+            clientes.append(cliente)
+            contador += 1
+
+    # Clientes que ainda não estão em fila nenhuma, usados pela mistura de entrada
+    for n in range(novos_clientes):
+        novo = Usuario(f"Novo {n}", f"novo{n}@bench.com", senha, role=Role.usuario)
+        session.add(novo)
+        novos.append(novo)
+    session.commit()
+
+    # As entradas foram inseridas direto: recalcula os contadores das filas, se a versão medida tiver
+    try:
+        from app.services.queue_stats import QueueStatsRepository
+        if hasattr(QueueStatsRepository, "repair"):
+            QueueStatsRepository.repair(session)
+            session.commit()
+    except ImportError:
+        pass
+
+    tokens = {
+        "donos": [(criar_token(d.id, d.role), [f.id for f in filas if f.estabelecimento.usuario_id == d.id]) for d in donos],
+        "funcionarios": [criar_token(f.id, f.role) for f in funcionarios],
+        "clientes": [criar_token(c.id, c.role) for c in clientes],
+        "novos": [criar_token(n.id, n.role) for n in novos],
+        "filas": [f.id for f in filas],
+    }
+    session.close()
+    return tokens
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+def montar_misturas(tokens, rng):
+    """Mistura -> lista de (peso, rota, função que devolve (método, url, token, corpo))"""
+    clientes, donos, filas = tokens["clientes"], tokens["donos"], tokens["filas"]
+    # Cada cliente novo entra em filas diferentes até esgotar os pares
+    entradas = [(token, fila_id) for token in tokens["novos"] for fila_id in rng.sample(filas, min(3, len(filas)))]
+    rng.shuffle(entradas)
+
+    def entrar():
+        token, fila_id = entradas.pop() if entradas else (rng.choice(clientes), rng.choice(filas))
+        corpo = {"usuario_id": 0, "fila_id": fila_id, "ordem": 0, "status": "aguardando", "prioridade": "normal"}
+        return "POST", "/filas/entrar-na-fila", token, corpo
+
+    def chamar():
+        token, filas_do_dono = rng.choice(donos)
+        return "POST", f"/filas/{rng.choice(filas_do_dono)}/chamar-proximo", token, None
+
+    def ler(url, grupo):
+        def montar():
+            escolhido = rng.choice(tokens[grupo])
+            return "GET", url, escolhido[0] if grupo == "donos" else escolhido, None
+        return montar
+
+    posicao = (1, "GET /filas/minha-posicao", ler("/filas/minha-posicao", "clientes"))
+    dashboards = [
+        (3, "GET /filas/dashboard-cliente", ler("/filas/dashboard-cliente", "clientes")),
+        (2, "GET /filas/disponiveis", ler("/filas/disponiveis", "clientes")),
+        (2, "GET /estabelecimentos/dashboard", ler("/estabelecimentos/dashboard", "donos")),
+        (1, "GET /filas/", ler("/filas/", "donos")),
+        (1, "GET /filas/dashboard-funcionario", ler("/filas/dashboard-funcionario", "funcionarios")),
+    ]
+    return {
+        "entrada": [(1, "POST /filas/entrar-na-fila", entrar)],
+        "chamada": [(1, "POST /filas/{id}/chamar-proximo", chamar)],
+        "posicao": [posicao],
+        "dashboards": dashboards,
+        "misto": [
+            (35, posicao[1], posicao[2]),
+            (15, "POST /filas/entrar-na-fila", entrar),
+            (10, "POST /filas/{id}/chamar-proximo", chamar),
+        ] + [(peso * 4, rota, montar) for peso, rota, montar in dashboards],
+    }
+
+
+def resumir(latencias, sql, status, decorrido):
+    """Consolida as medições de uma mistura"""
+    todas = [l for valores in latencias.values() for l in valores]
+    total_sql = [s for valores in sql.values() for s in valores]
+
+    def media(valores):
+        return round(sum(valores) / len(valores), 2) if valores else None
+
+    def linha(valores, comandos):
+        return {
+            "requisicoes": len(valores),
+            "p50_ms": round(percentil(valores, 50) * 1000, 2),
+            "p95_ms": round(percentil(valores, 95) * 1000, 2),
+            "p99_ms": round(percentil(valores, 99) * 1000, 2),
+            "sql_por_requisicao": media(comandos),
+        }
+
+    resultado = linha(todas, total_sql)
+    resultado["duracao_s"] = round(decorrido, 2)
+    resultado["rps"] = round(len(todas) / decorrido, 1) if decorrido else 0.0
+    resultado["rotas"] = {}
+    for nome in sorted(latencias):
+        rota = linha(latencias[nome], sql[nome])
+        rota["erros_4xx"] = status[nome][4]
+        rota["erros_5xx"] = status[nome][5]
+        resultado["rotas"][nome] = rota
+    return resultado
+
+
+async def executar_mistura(http, mistura, clientes, duracao, rng, medir_sql):
+    pesos = [m[0] for m in mistura]
+    latencias, sql = defaultdict(list), defaultdict(list)
+    status = defaultdict(lambda: defaultdict(int))
+    fim = time.perf_counter() + duracao
+
+    async def cliente():
+        while time.perf_counter() < fim:
+            _, nome, montar = rng.choices(mistura, weights=pesos)[0]
+            metodo, url, token, corpo = montar()
+            contador = [0]
+            _sql_da_requisicao.set(contador)
+            inicio = time.perf_counter()
+            resposta = await http.request(metodo, url, json=corpo, headers={"Authorization": f"Bearer {token}"})
+            latencias[nome].append(time.perf_counter() - inicio)
+            if medir_sql:
+                sql[nome].append(contador[0])
+            status[nome][resposta.status_code // 100] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(clientes)))
+    return resumir(latencias, sql, status, time.perf_counter() - inicio)
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_uvicorn(raiz, pasta, workers):
+    """Sobe `uvicorn app.main:app` no mesmo banco semeado e espera ficar pronto"""
+    import httpx
+
+    porta = porta_livre()
+    env = dict(os.environ, PYTHONPATH=raiz)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--workers", str(workers), "--log-level", "warning"],
+        cwd=pasta, env=env
+    )
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            httpx.get(url + "/usuarios/")
+            return processo, url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("uvicorn não respondeu em 30s")
+
+
+async def executar(alvo, misturas, nomes, clientes, duracao, semente, medir_sql):
+    import httpx
+
+    rng = random.Random(semente)
+    if isinstance(alvo, str):
+        http = httpx.AsyncClient(base_url=alvo, timeout=60)
+    else:
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=alvo), base_url="http://bench", timeout=60)
+    resultados = {}
+    async with http:
+        for nome in nomes:
+            resultados[nome] = await executar_mistura(http, misturas[nome], clientes, duracao, rng, medir_sql)
+    return resultados
+
+
+def variacao(atual, antes):
+    if not antes or atual is None:
+        return None
+    return (atual - antes) / antes * 100
+
+
+def imprimir(resultado, anterior=None):
+    print(f"modo: {resultado['modo']}  clientes simultâneos: {resultado['clientes']}  duração por mistura: {resultado['duracao_s']}s")
+    print(f"dados: {resultado['dados']}")
+    if anterior and anterior.get("modo") != resultado["modo"]:
+        print(f"atenção: a baseline foi medida em outro modo ({anterior.get('modo')}); compare com cuidado")
+    if anterior and any(anterior.get(chave) != resultado[chave] for chave in ("clientes", "duracao_s", "dados")):
+        # O estado das filas muda com a carga (ex.: chamadas esvaziam filas), então até o SQL por requisição varia
+        print("atenção: a baseline usou outros parâmetros (clientes, duração ou dados); os números não são comparáveis")
+    for nome, mistura in resultado["misturas"].items():
+        antes = (anterior or {}).get("misturas", {}).get(nome)
+        print()
+        print(f"== {nome}: {mistura['rps']} rps, {mistura['requisicoes']} requisições")
+        for chave in ("rps", "p50_ms", "p95_ms", "p99_ms", "sql_por_requisicao"):
+            texto = f"   {chave:20} {'-' if mistura[chave] is None else mistura[chave]}"
+            delta = variacao(mistura[chave], antes and antes.get(chave))
+            if delta is not None:
+                texto += f"  ({delta:+.1f}% vs {antes[chave]})"  # type: ignore
+            print(texto)
+        print(f"   {'rota':38} {'req':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8} {'4xx':>5} {'5xx':>5}")
+        for rota, r in mistura["rotas"].items():
+            sql = "-" if r["sql_por_requisicao"] is None else r["sql_por_requisicao"]
+            print(f"   {rota:38} {r['requisicoes']:>7} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {sql:>8} {r['erros_4xx']:>5} {r['erros_5xx']:>5}")
+
+
+def regressoes(resultado, anterior, tolerancia):
+    """Lista as misturas que pioraram além da tolerância (%) em rps, p99 ou SQL por requisição"""
+    encontradas = []
+    for nome, mistura in resultado["misturas"].items():
+        antes = anterior.get("misturas", {}).get(nome)
+        if not antes:
+            continue
+        queda_rps = variacao(mistura["rps"], antes["rps"])
+        if queda_rps is not None and queda_rps < -tolerancia:
+            encontradas.append(f"{nome}: rps {queda_rps:+.1f}%")
+        alta_p99 = variacao(mistura["p99_ms"], antes["p99_ms"])
+        if alta_p99 is not None and alta_p99 > tolerancia:
+            encontradas.append(f"{nome}: p99 {alta_p99:+.1f}%")
+        alta_sql = variacao(mistura["sql_por_requisicao"], antes.get("sql_por_requisicao"))
+        if alta_sql is not None and alta_sql > tolerancia:
+            encontradas.append(f"{nome}: SQL por requisição {antes['sql_por_requisicao']} -> {mistura['sql_por_requisicao']}")
+    return encontradas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", default=RAIZ_PADRAO, help="raiz do projeto a ser medido")
+    parser.add_argument("--misturas", default=",".join(MISTURAS_PADRAO), help="misturas a executar, em ordem")
+    parser.add_argument("--clientes", type=int, default=32, help="clientes simultâneos")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de carga por mistura")
+    parser.add_argument("--estabelecimentos", type=int, default=20)
+    parser.add_argument("--filas", type=int, default=5, help="filas por estabelecimento")
+    parser.add_argument("--clientes-por-fila", type=int, default=30)
+    parser.add_argument("--novos-clientes", type=int, default=1000, help="clientes sem fila, usados pela mistura de entrada")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--uvicorn", action="store_true", help="mede através de um uvicorn local em vez de em processo")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn (com --uvicorn)")
+    parser.add_argument("--salvar", help="salva o resultado (baseline) em JSON")
+    parser.add_argument("--comparar", help="baseline JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, help="com --comparar: sai com código 1 se piorar mais que esse %%")
+    args = parser.parse_args()
+
+    nomes = [n.strip() for n in args.misturas.split(",") if n.strip()]
+    desconhecidas = set(nomes) - set(MISTURAS_PADRAO)
+    if desconhecidas:
+        parser.error(f"misturas desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    raiz = os.path.abspath(args.raiz)
+    app, engine, pasta = preparar_ambiente(raiz)
+    tokens = semear(engine, args.estabelecimentos, args.filas, args.clientes_por_fila, args.novos_clientes)
+    misturas = montar_misturas(tokens, random.Random(args.semente))
+
+    processo = None
+    if args.uvicorn:
+        processo, alvo = subir_uvicorn(raiz, pasta, args.workers)
+        medir_sql = False
+    else:
+        contar_sql(engine)
+        alvo, medir_sql = app, True
+
+    try:
+        medicoes = asyncio.run(executar(alvo, misturas, nomes, args.clientes, args.duracao, args.semente, medir_sql))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+    resultado = {
+        "modo": f"uvicorn ({args.workers} workers)" if args.uvicorn else "em processo",
+        "clientes": args.clientes,
+        "duracao_s": args.duracao,
+        "dados": {
+            "estabelecimentos": args.estabelecimentos,
+            "filas_por_estabelecimento": args.filas,
+            "clientes_por_fila": args.clientes_por_fila,
+            "novos_clientes": args.novos_clientes,
+            "semente": args.semente,
+        },
+        "ambiente": {"python": platform.python_version(), "plataforma": platform.platform()},
+        "misturas": medicoes,
+    }
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar) as arquivo:
+            anterior = json.load(arquivo)
+    imprimir(resultado, anterior)
+
+    if args.salvar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salvar)), exist_ok=True)
+        with open(args.salvar, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    if anterior is not None and args.tolerancia is not None:
+        encontradas = regressoes(resultado, anterior, args.tolerancia)
+        if encontradas:
+            print()
+            print("regressões acima da tolerância:")
+            for regressao in encontradas:
+                print(f"   {regressao}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
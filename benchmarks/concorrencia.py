@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concorrência da API FilaDigital
+
+Sobe a aplicação em processo (httpx + ASGITransport) sobre um banco SQLite
+temporário, semeia estabelecimentos, filas e clientes e dispara clientes
+simultâneos misturando leituras rápidas com dashboards pesados. Reporta
+requisições por segundo e latências p50/p99 por rota. A semeadura é a mesma
+da suíte completa (carga.py).
+
+Uso:
+    python benchmarks/concorrencia.py --clientes 32 --duracao 10
+    python benchmarks/concorrencia.py --raiz /caminho/de/outra/versao --saida antes.json
+    python benchmarks/concorrencia.py --saida depois.json --comparar antes.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+from carga import RAIZ_PADRAO, preparar_ambiente, semear, percentil
+
+
+async def executar(app, tokens_donos, tokens_clientes, clientes, duracao, semente):
+    import httpx
+
+    rng = random.Random(semente)
+    # (peso, nome, função que monta a requisição)
+    mistura = [
+        (40, "GET /filas/minha-posicao", lambda: ("GET", "/filas/minha-posicao", rng.choice(tokens_clientes))),
+        (20, "GET /filas/dashboard-cliente", lambda: ("GET", "/filas/dashboard-cliente", rng.choice(tokens_clientes))),
+        (15, "GET /filas/disponiveis", lambda: ("GET", "/filas/disponiveis", rng.choice(tokens_clientes))),
+        (15, "GET /estabelecimentos/dashboard", lambda: ("GET", "/estabelecimentos/dashboard", rng.choice(tokens_donos)[0])),
+        (10, "POST /filas/{id}/chamar-proximo", lambda: (lambda d: ("POST", f"/filas/{rng.choice(d[1])}/chamar-proximo", d[0]))(rng.choice(tokens_donos))),
+    ]
+    pesos = [m[0] for m in mistura]
+
+    latencias = defaultdict(list)
+    erros = defaultdict(int)
+    fim = time.perf_counter() + duracao
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        async def cliente():
+            while time.perf_counter() < fim:
+                _, nome, montar = rng.choices(mistura, weights=pesos)[0]
+                metodo, url, token = montar()
+                inicio = time.perf_counter()
+                resposta = await http.request(metodo, url, headers={"Authorization": f"Bearer {token}"})
+                latencias[nome].append(time.perf_counter() - inicio)
+                if resposta.status_code >= 500:
+                    erros[nome] += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+        decorrido = time.perf_counter() - inicio
+
+    todas = [l for valores in latencias.values() for l in valores]
+    return {
+        "clientes": clientes,
+        "duracao_s": round(decorrido, 2),
+        "requisicoes": len(todas),
+        "rps": round(len(todas) / decorrido, 1),
+        "p50_ms": round(percentil(todas, 50) * 1000, 2),
+        "p99_ms": round(percentil(todas, 99) * 1000, 2),
+        "rotas": {
+            nome: {
+                "requisicoes": len(valores),
+                "p50_ms": round(percentil(valores, 50) * 1000, 2),
+                "p99_ms": round(percentil(valores, 99) * 1000, 2),
+                "erros_5xx": erros[nome],
+            }
+            for nome, valores in sorted(latencias.items())
+        },
+    }
+
+
+def imprimir(resultado, anterior=None):
+    def delta(chave, atual):
+        if not anterior:
+            return ""
+        antes = anterior[chave]
+        if not antes:
+            return ""
+        return f"  ({(atual - antes) / antes * 100:+.1f}% vs {antes})"
+
+    print(f"clientes simultâneos: {resultado['clientes']}  duração: {resultado['duracao_s']}s")
+    print(f"requisições: {resultado['requisicoes']}")
+    print(f"rps:    {resultado['rps']}{delta('rps', resultado['rps'])}")
+    print(f"p50 ms: {resultado['p50_ms']}{delta('p50_ms', resultado['p50_ms'])}")
+    print(f"p99 ms: {resultado['p99_ms']}{delta('p99_ms', resultado['p99_ms'])}")
+    print()
+    print(f"{'rota':40} {'req':>7} {'p50 ms':>9} {'p99 ms':>9} {'5xx':>5}")
+    for nome, rota in resultado["rotas"].items():
+        print(f"{nome:40} {rota['requisicoes']:>7} {rota['p50_ms']:>9} {rota['p99_ms']:>9} {rota['erros_5xx']:>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", default=RAIZ_PADRAO, help="raiz do projeto a ser medido")
+    parser.add_argument("--clientes", type=int, default=32, help="clientes simultâneos")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de carga")
+    parser.add_argument("--estabelecimentos", type=int, default=20)
+    parser.add_argument("--filas", type=int, default=5, help="filas por estabelecimento")
+    parser.add_argument("--clientes-por-fila", type=int, default=30)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="salva o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args()
+
+    app, engine, _ = preparar_ambiente(os.path.abspath(args.raiz))
+    tokens = semear(engine, args.estabelecimentos, args.filas, args.clientes_por_fila)
+    resultado = asyncio.run(executar(app, tokens["donos"], tokens["clientes"], args.clientes, args.duracao, args.semente))
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar) as arquivo:
+            anterior = json.load(arquivo)
+    imprimir(resultado, anterior)
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
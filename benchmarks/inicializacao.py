@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização da API FilaDigital
+
+Cada medição roda em um interpretador novo (como um worker recém-iniciado ou
+uma execução dos testes), sobre um banco SQLite temporário já com o schema e,
+opcionalmente, com filas e clientes semeados pela suíte de carga (carga.py):
+
+    importar_db     import app.database (scripts de manutenção e Alembic)
+    importar_app    import app.main (worker do uvicorn, suíte de testes)
+    inicializar     startup do lifespan até a aplicação aceitar requisições
+    primeira        primeira requisição autenticada (GET /filas/minha-posicao)
+
+Reporta a mediana e o mínimo de cada etapa. Para comparar com outra versão,
+aponte --raiz para outro checkout (ex.: git worktree add /tmp/antes HEAD~1):
+
+    python benchmarks/inicializacao.py
+    python benchmarks/inicializacao.py --raiz /tmp/antes --filas 50 --saida antes.json
+    python benchmarks/inicializacao.py --detalhar   # módulos mais caros de importar (python -X importtime)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from carga import RAIZ_PADRAO
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+PREPARAR = """
+import sys
+sys.path[:0] = [{raiz!r}, {benchmarks!r}]
+import app.models
+from app.database import Base, engine
+Base.metadata.create_all(bind=engine)
+from carga import semear
+tokens = semear(engine, {estabelecimentos}, {filas}, {clientes})
+print(tokens["clientes"][0])
+"""
+
+MEDIR_DB = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+import app.database
+print(json.dumps({{"importar_db": time.perf_counter() - inicio}}))
+"""
+
+MEDIR_APP = """
+import asyncio, json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+from app.main import app
+importado = time.perf_counter()
+import httpx  # cliente do benchmark, fora das medições
+
+async def subir():
+    inicio = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        pronto = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            resposta = await http.get("/filas/minha-posicao", headers={{"Authorization": "Bearer {token}"}})
+        resposta.raise_for_status()
+        primeira = time.perf_counter() - pronto
+    return pronto - inicio, primeira
+
+inicializar, primeira = asyncio.run(subir())
+print(json.dumps({{"importar_app": importado - inicio, "inicializar": inicializar, "primeira": primeira}}))
+"""
+
+
+def executar(codigo, pasta, ambiente, argumentos=()):
+    saida = subprocess.run(
+        [sys.executable, *argumentos, "-c", codigo], cwd=pasta, env=ambiente, capture_output=True, text=True
+    )
+    if saida.returncode != 0:
+        raise SystemExit(saida.stderr)
+    return saida
+
+
+def preparar(raiz, pasta, ambiente, args):
+    """Cria o banco com o schema e os dados; devolve um token de cliente"""
+    # O front-end fica na raiz medida; o banco padrão é relativo ao diretório atual
+    os.symlink(os.path.join(raiz, "frontend"), os.path.join(pasta, "frontend"))
+    codigo = PREPARAR.format(
+        raiz=raiz, benchmarks=PASTA_BENCHMARKS, estabelecimentos=args.estabelecimentos,
+        filas=args.filas, clientes=args.clientes_por_fila
+    )
+    return executar(codigo, pasta, ambiente).stdout.strip().splitlines()[-1]
+
+
+def medir(raiz, pasta, ambiente, token, repeticoes):
+    amostras = {}
+    for _ in range(repeticoes):
+        for codigo in (MEDIR_DB.format(raiz=raiz), MEDIR_APP.format(raiz=raiz, token=token)):
+            for etapa, segundos in json.loads(executar(codigo, pasta, ambiente).stdout.strip().splitlines()[-1]).items():
+                amostras.setdefault(etapa, []).append(segundos)
+    return {
+        etapa: {"mediana_ms": round(statistics.median(valores) * 1000, 1), "minimo_ms": round(min(valores) * 1000, 1)}
+        for etapa, valores in amostras.items()
+    }
+
+
+def detalhar(raiz, pasta, ambiente, quantidade=15):
+    """Módulos com maior tempo acumulado de importação em `import app.main`"""
+    saida = executar(f"import sys; sys.path.insert(0, {raiz!r}); import app.main", pasta, ambiente, ("-X", "importtime"))
+    linhas = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        proprio, acumulado, modulo = linha[len("import time:"):].split("|")
+        if proprio.strip().isdigit():  # pula o cabeçalho
+            linhas.append((int(acumulado), int(proprio), modulo.rstrip()))
+    return sorted(linhas, reverse=True)[:quantidade]
+
+
+def imprimir(resultado):
+    print(f"{'etapa':14} {'mediana ms':>11} {'mínimo ms':>10}")
+    for etapa, linha in resultado.items():
+        print(f"{etapa:14} {linha['mediana_ms']:>11} {linha['minimo_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", default=RAIZ_PADRAO, help="raiz do projeto a ser medido")
+    parser.add_argument("--estabelecimentos", type=int, default=2)
+    parser.add_argument("--filas", type=int, default=10, help="filas por estabelecimento")
+    parser.add_argument("--clientes-por-fila", type=int, default=5)
+    parser.add_argument("--repeticoes", type=int, default=5, help="processos novos por etapa")
+    parser.add_argument("--detalhar", action="store_true", help="mostra os módulos mais caros de importar")
+    parser.add_argument("--saida", help="salva o resultado em JSON")
+    args = parser.parse_args()
+
+    raiz = os.path.abspath(args.raiz)
+    pasta = tempfile.mkdtemp(prefix="filadigital-inicio-")
+    ambiente = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'bench.db')}", RATE_LIMIT_ENABLED="false")
+    try:
+        token = preparar(raiz, pasta, ambiente, args)
+        resultado = medir(raiz, pasta, ambiente, token, args.repeticoes)
+        imprimir(resultado)
+        if args.detalhar:
+            print(f"\n{'acumulado ms':>12} {'próprio ms':>11}  módulo")
+            for acumulado, proprio, modulo in detalhar(raiz, pasta, ambiente):
+                print(f"{acumulado / 1000:>12.1f} {proprio / 1000:>11.1f}  {modulo}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
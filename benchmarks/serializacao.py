@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialização das respostas da API FilaDigital
+
+Semeia o banco temporário da suíte de carga (carga.py), faz uma requisição real
+a cada uma das rotas com as maiores respostas e guarda o valor devolvido pelo
+handler. Em seguida mede só a etapa de serialização, com os mesmos dados, de
+duas formas:
+
+    antes   sem response_model: jsonable_encoder + JSONResponse (json.dumps)
+    depois  como a API faz hoje: response_model da rota (pydantic-core) + ORJSONResponse
+
+Reporta o tempo médio por resposta em cada caminho, o tamanho do corpo e a
+economia. Banco, validação de token e consultas ficam de fora da medição.
+
+Uso:
+    python benchmarks/serializacao.py
+    python benchmarks/serializacao.py --filas 100 --repeticoes 500 --saida serializacao.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from carga import RAIZ_PADRAO, preparar_ambiente, semear
+
+# (rota, url, grupo de tokens que faz a requisição)
+ROTAS = [
+    ("GET /filas/disponiveis", "/filas/disponiveis?limite=200", "clientes"),
+    ("GET /filas/", "/filas/", "donos"),
+    ("GET /estabelecimentos/dashboard", "/estabelecimentos/dashboard", "donos"),
+    ("GET /filas/dashboard-cliente", "/filas/dashboard-cliente", "clientes"),
+    ("GET /filas/minha-posicao", "/filas/minha-posicao", "clientes"),
+]
+
+
+async def capturar(app, tokens):
+    """Faz uma requisição por rota e devolve {rota: (APIRoute, valor devolvido pelo handler)}"""
+    import httpx
+    from fastapi.routing import APIRoute
+
+    rotas = {f"{metodo} {r.path}": r for r in app.routes if isinstance(r, APIRoute) for metodo in r.methods}
+    capturados = {}
+
+    for nome, url, grupo in ROTAS:
+        rota = rotas[nome]
+        original = rota.dependant.call
+
+        def espiao(*args, _original=original, _nome=nome, _rota=rota, **kwargs):
+            valor = _original(*args, **kwargs)
+            capturados[_nome] = (_rota, valor)
+            return valor
+
+        rota.dependant.call = espiao
+        try:
+            token = tokens[grupo][0]
+            token = token[0] if grupo == "donos" else token
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+                resposta = await http.get(url, headers={"Authorization": f"Bearer {token}"})
+            resposta.raise_for_status()
+        finally:
+            rota.dependant.call = original
+    return capturados
+
+
+async def medir(rota, valor, repeticoes):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+
+    campo = rota.secure_cloned_response_field
+
+    async def depois():
+        conteudo = await serialize_response(field=campo, response_content=valor, exclude_unset=rota.response_model_exclude_unset)
+        return ORJSONResponse(conteudo).body
+
+    # O handler antigo devolvia dicts montados à mão com o mesmo conteúdo
+    dados = campo.serialize(campo.validate(valor, {}, loc=("response",))[0], mode="python", exclude_unset=rota.response_model_exclude_unset)
+
+    def antes():
+        return JSONResponse(jsonable_encoder(dados)).body
+
+    corpo_antes, corpo_depois = antes(), await depois()
+    for _ in range(max(1, repeticoes // 10)):  # aquecimento
+        antes()
+        await depois()
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        antes()
+    tempo_antes = (time.perf_counter() - inicio) / repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        await depois()
+    tempo_depois = (time.perf_counter() - inicio) / repeticoes
+
+    return {
+        "bytes": len(corpo_depois),
+        "antes_us": round(tempo_antes * 1e6, 1),
+        "depois_us": round(tempo_depois * 1e6, 1),
+        "economia_pct": round((tempo_antes - tempo_depois) / tempo_antes * 100, 1),
+        "mesmo_conteudo": json.loads(corpo_antes) == json.loads(corpo_depois),
+    }
+
+
+def imprimir(resultado):
+    print(f"{'rota':34} {'bytes':>8} {'antes µs':>10} {'depois µs':>10} {'economia':>9}")
+    for nome, linha in resultado.items():
+        aviso = "" if linha["mesmo_conteudo"] else "  (conteúdo diferente!)"
+        print(f"{nome:34} {linha['bytes']:>8} {linha['antes_us']:>10} {linha['depois_us']:>10} {linha['economia_pct']:>8}%{aviso}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", default=RAIZ_PADRAO, help="raiz do projeto a ser medido")
+    parser.add_argument("--estabelecimentos", type=int, default=4)
+    parser.add_argument("--filas", type=int, default=50, help="filas por estabelecimento")
+    parser.add_argument("--clientes-por-fila", type=int, default=2)
+    parser.add_argument("--repeticoes", type=int, default=300, help="serializações medidas por rota")
+    parser.add_argument("--saida", help="salva o resultado em JSON")
+    args = parser.parse_args()
+
+    app, engine, _ = preparar_ambiente(os.path.abspath(args.raiz))
+    tokens = semear(engine, args.estabelecimentos, args.filas, args.clientes_por_fila)
+
+    async def executar():
+        capturados = await capturar(app, tokens)
+        return {nome: await medir(rota, valor, args.repeticoes) for nome, (rota, valor) in capturados.items()}
+
+    resultado = asyncio.run(executar())
+    imprimir(resultado)
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
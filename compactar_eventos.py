@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Grava um snapshot novo de cada fila a partir do log de eventos (eventos_fila).
+
+A carga das filas em memória parte do último snapshot e reproduz só os eventos
+seguintes; rodar este script agendado (cron) mantém essa reprodução curta. Os
+eventos não são apagados: o log continua completo para auditoria.
+
+Uso:
+    python compactar_eventos.py
+"""
+
+from app.database import SessionLocal
+from app.services.queue_engine import QueueEngineRegistry
+
+
+def main():
+    # Registro próprio: os motores deste processo só existem para gerar os snapshots
+    motores = QueueEngineRegistry()
+    session = SessionLocal()
+    try:
+        carregadas = motores.load_all(session)
+        gravados = motores.save_snapshots(session)
+        session.commit()
+    finally:
+        session.close()
+
+    print(f"Filas carregadas: {carregadas}; snapshots gravados: {gravados}")
+
+
+if __name__ == "__main__":
+    main()
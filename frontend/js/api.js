@@ -28,7 +28,9 @@ const API_CONFIG = {
         HISTORICO: '/filas/historico',
         DASHBOARD_FUNCIONARIO: '/filas/dashboard-funcionario',
         DASHBOARD_CLIENTE: '/filas/dashboard-cliente'
-    }
+    },
+    // Itens por página nas listagens paginadas
+    PAGE_SIZE: 20
 };
 
 // Estado de autenticação
@@ -274,20 +276,41 @@ function parseJwt(token) {
 // API DE ESTABELECIMENTOS
 // ====================
 
-async function getEstablishments() {
+// Monta a URL de uma página: listagens longas são paginadas por cursor
+function pageUrl(endpoint, cursor = null, limite = API_CONFIG.PAGE_SIZE) {
+    const params = new URLSearchParams({ limite });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    return `${endpoint}?${params.toString()}`;
+}
+
+async function getEstablishmentsPage(cursor = null) {
     try {
-        const response = await apiRequest(API_CONFIG.ENDPOINTS.ESTABELECIMENTOS);
+        const response = await apiRequest(pageUrl(API_CONFIG.ENDPOINTS.ESTABELECIMENTOS + '/', cursor));
         if (response.ok) {
             const data = await response.json();
-            return data.estabelecimentos || [];
+            return { items: data.estabelecimentos || [], proximoCursor: data.proximo_cursor || null };
         }
-        return [];
+        return { items: [], proximoCursor: null };
     } catch (error) {
         console.error('Error fetching establishments:', error);
-        return [];
+        return { items: [], proximoCursor: null };
     }
 }
 
+// Todos os estabelecimentos do dono (selects e funcionários), página a página
+async function getEstablishments() {
+    const estabelecimentos = [];
+    let cursor = null;
+    do {
+        const page = await getEstablishmentsPage(cursor);
+        estabelecimentos.push(...page.items);
+        cursor = page.proximoCursor;
+    } while (cursor);
+    return estabelecimentos;
+}
+
 async function createEstablishment(establishmentData) {
     try {
         const response = await apiRequest(API_CONFIG.ENDPOINTS.ESTABELECIMENTOS + '/criar-estabelecimento', {
@@ -360,20 +383,24 @@ async function getQueues() {
     }
 }
 
-async function getAvailableQueues() {
+async function getAvailableQueuesPage(cursor = null) {
     try {
-        const response = await apiRequest(API_CONFIG.ENDPOINTS.FILAS_DISPONIVEIS);
+        const response = await apiRequest(pageUrl(API_CONFIG.ENDPOINTS.FILAS_DISPONIVEIS, cursor));
         if (response.ok) {
             const data = await response.json();
-            return data.filas || [];
+            return { items: data.filas || [], proximoCursor: data.proximo_cursor || null };
         }
-        return [];
+        return { items: [], proximoCursor: null };
     } catch (error) {
         console.error('Error fetching available queues:', error);
-        return [];
+        return { items: [], proximoCursor: null };
     }
 }
 
+async function getAvailableQueues() {
+    return (await getAvailableQueuesPage()).items;
+}
+
 async function createQueue(queueData) {
     try {
         const response = await apiRequest(API_CONFIG.ENDPOINTS.FILAS + '/criar-fila', {
@@ -480,19 +507,24 @@ async function getMyPosition() {
     }
 }
 
-async function getQueueHistory() {
+// O histórico continua sendo uma lista; o cursor da próxima página vem no cabeçalho
+async function getQueueHistoryPage(cursor = null) {
     try {
-        const response = await apiRequest(API_CONFIG.ENDPOINTS.HISTORICO);
+        const response = await apiRequest(pageUrl(API_CONFIG.ENDPOINTS.HISTORICO, cursor));
         if (response.ok) {
-            return await response.json();
+            return { items: await response.json(), proximoCursor: response.headers.get('X-Proximo-Cursor') };
         }
-        return [];
+        return { items: [], proximoCursor: null };
     } catch (error) {
         console.error('Error fetching queue history:', error);
-        return [];
+        return { items: [], proximoCursor: null };
     }
 }
 
+async function getQueueHistory() {
+    return (await getQueueHistoryPage()).items;
+}
+
 async function getEmployeeDashboard() {
     try {
         const response = await apiRequest(API_CONFIG.ENDPOINTS.DASHBOARD_FUNCIONARIO);
@@ -568,6 +600,22 @@ async function generateQRCode(queueId) {
     }
 }
 
+// Invalida os QR Codes já emitidos da fila e devolve um novo
+async function rotateQRCode(queueId) {
+    try {
+        const response = await apiRequest(`${API_CONFIG.ENDPOINTS.FILAS}/${queueId}/qr-code/rotacionar`, {
+            method: 'POST'
+        });
+        if (response.ok) {
+            return await response.json();
+        }
+        return null;
+    } catch (error) {
+        console.error('Error rotating QR code:', error);
+        return null;
+    }
+}
+
 async function joinQueueViaQR(qrCode) {
     try {
         const response = await apiRequest(API_CONFIG.ENDPOINTS.FILAS + '/entrar-via-qr', {
@@ -597,11 +645,13 @@ window.FilaDigitalAPI = {
     getCurrentUser,
     hasRole,
     getEstablishments,
+    getEstablishmentsPage,
     createEstablishment,
     deleteEstablishment,
     getOwnerDashboard,
     getQueues,
     getAvailableQueues,
+    getAvailableQueuesPage,
     createQueue,
     deleteQueue,
     joinQueue,
@@ -609,10 +659,12 @@ window.FilaDigitalAPI = {
     callNextCustomer,
     getMyPosition,
     getQueueHistory,
+    getQueueHistoryPage,
     getEmployeeDashboard,
     getCustomerDashboard,
     getEstablishmentEmployees,
     addEmployeeToEstablishment,
     generateQRCode,
+    rotateQRCode,
     joinQueueViaQR
 };
\ No newline at end of file
@@ -356,6 +356,41 @@ async function loadEmployeeDashboard() {
     await loadServiceHistory();
 }
 
+// Listagens paginadas: mostra a primeira página e um botão "Carregar mais"
+// enquanto o servidor devolver um cursor para a próxima
+async function renderPaginated(container, fetchPage, renderItem, emptyMessage) {
+    const firstPage = await fetchPage(null);
+    container.innerHTML = '';
+
+    if (firstPage.items.length === 0) {
+        container.innerHTML = `<p class="no-data">${emptyMessage}</p>`;
+        return [];
+    }
+
+    const loaded = [];
+    const appendPage = (page) => {
+        page.items.forEach(item => container.appendChild(renderItem(item)));
+        loaded.push(...page.items);
+
+        if (page.proximoCursor) {
+            const moreButton = document.createElement('button');
+            moreButton.className = 'btn btn-secondary load-more';
+            moreButton.textContent = 'Carregar mais';
+            moreButton.onclick = async () => {
+                moreButton.disabled = true;
+                moreButton.textContent = 'Carregando...';
+                const nextPage = await fetchPage(page.proximoCursor);
+                moreButton.remove();
+                appendPage(nextPage);
+            };
+            container.appendChild(moreButton);
+        }
+    };
+
+    appendPage(firstPage);
+    return loaded;
+}
+
 // Carregar filas (Cliente)
 async function loadQueuesGrid() {
     const filasGrid = document.getElementById('filasGrid');
@@ -364,18 +399,13 @@ async function loadQueuesGrid() {
     filasGrid.innerHTML = '<div class="loading">Carregando filas...</div>';
 
     try {
-        const queues = await window.FilaDigitalAPI.getAvailableQueues();
-        filasGrid.innerHTML = '';
-
-        if (queues.length === 0) {
-            filasGrid.innerHTML = '<p class="no-data">Nenhuma fila disponível no momento.</p>';
-            return;
-        }
-
-        queues.forEach(queue => {
-            const queueCard = createQueueCard(queue);
-            filasGrid.appendChild(queueCard);
-        });
+        // appState.queues guarda as filas já exibidas (inclusive as de "Carregar mais")
+        appState.queues = await renderPaginated(
+            filasGrid,
+            window.FilaDigitalAPI.getAvailableQueuesPage,
+            createQueueCard,
+            'Nenhuma fila disponível no momento.'
+        );
     } catch (error) {
         console.error('Error loading queues:', error);
         filasGrid.innerHTML = '<p class="error">Erro ao carregar filas. Tente novamente.</p>';
@@ -385,6 +415,7 @@ async function loadQueuesGrid() {
 function createQueueCard(queue) {
     const card = document.createElement('div');
     card.className = 'queue-card';
+    card.dataset.filaId = queue.id;
 
     // Calcular status baseado no número de pessoas
     let status = 'active';
@@ -425,9 +456,12 @@ function getStatusText(status) {
 // Entrar na fila
 async function joinQueue(queueId) {
     try {
-        // Buscar informações da fila
-        const queues = await window.FilaDigitalAPI.getAvailableQueues();
-        const queue = queues.find(q => q.id === queueId);
+        // A fila já foi carregada na grade; busca de novo só se não estiver lá
+        let queue = appState.queues.find(q => q.id === queueId);
+        if (!queue) {
+            const queues = await window.FilaDigitalAPI.getAvailableQueues();
+            queue = queues.find(q => q.id === queueId);
+        }
 
         if (!queue) {
             alert('Fila não encontrada.');
@@ -497,18 +531,19 @@ async function showCurrentQueue() {
             const currentEstablishment = document.getElementById('currentEstablishment');
             const estimatedTime = document.getElementById('estimatedTime');
 
-            if (positionNumber) positionNumber.textContent = currentPosition.ordem;
-            if (currentEstablishment) currentEstablishment.textContent = currentPosition.fila.nome;
-            if (estimatedTime) estimatedTime.textContent = '15-20 min'; // Pode ser calculado
+            if (positionNumber) positionNumber.textContent = currentPosition.posicao;
+            if (currentEstablishment) currentEstablishment.textContent = currentPosition.fila_nome;
+            if (estimatedTime) estimatedTime.textContent = currentPosition.tempo_espera_estimado || 'calculando...';
 
             appState.currentQueue = {
                 id: currentPosition.fila_id,
                 positionId: currentPosition.id,
-                userPosition: currentPosition.ordem,
-                name: currentPosition.fila.nome
+                userPosition: currentPosition.posicao,
+                name: currentPosition.fila_nome
             };
 
             currentQueueSection.style.display = 'block';
+            subscribeRenderedQueues();
         }
     } catch (error) {
         console.error('Error getting current position:', error);
@@ -551,15 +586,7 @@ async function loadClientHistory() {
     historyList.innerHTML = '<div class="loading">Carregando histórico...</div>';
 
     try {
-        const history = await window.FilaDigitalAPI.getQueueHistory();
-        historyList.innerHTML = '';
-
-        if (history.length === 0) {
-            historyList.innerHTML = '<p class="no-data">Nenhum histórico encontrado.</p>';
-            return;
-        }
-
-        history.forEach(item => {
+        await renderPaginated(historyList, window.FilaDigitalAPI.getQueueHistoryPage, item => {
             const historyItem = document.createElement('div');
             historyItem.className = 'list-item';
 
@@ -578,8 +605,8 @@ async function loadClientHistory() {
                 </div>
             `;
 
-            historyList.appendChild(historyItem);
-        });
+            return historyItem;
+        }, 'Nenhum histórico encontrado.');
     } catch (error) {
         console.error('Error loading history:', error);
         historyList.innerHTML = '<p class="error">Erro ao carregar histórico.</p>';
@@ -594,15 +621,7 @@ async function loadEstablishmentsList() {
     establishmentsList.innerHTML = '<div class="loading">Carregando estabelecimentos...</div>';
 
     try {
-        const establishments = await window.FilaDigitalAPI.getEstablishments();
-        establishmentsList.innerHTML = '';
-
-        if (establishments.length === 0) {
-            establishmentsList.innerHTML = '<p class="no-data">Nenhum estabelecimento encontrado.</p>';
-            return;
-        }
-
-        establishments.forEach(establishment => {
+        await renderPaginated(establishmentsList, window.FilaDigitalAPI.getEstablishmentsPage, establishment => {
             const listItem = document.createElement('div');
             listItem.className = 'list-item';
 
@@ -617,8 +636,8 @@ async function loadEstablishmentsList() {
                 </div>
             `;
 
-            establishmentsList.appendChild(listItem);
-        });
+            return listItem;
+        }, 'Nenhum estabelecimento encontrado.');
     } catch (error) {
         console.error('Error loading establishments:', error);
         establishmentsList.innerHTML = '<p class="error">Erro ao carregar estabelecimentos.</p>';
@@ -693,11 +712,12 @@ async function loadQueuesList() {
         queues.forEach(queue => {
             const listItem = document.createElement('div');
             listItem.className = 'list-item';
+            listItem.dataset.filaId = queue.id;
 
             listItem.innerHTML = `
                 <div class="item-info">
                     <h4>${queue.nome}</h4>
-                    <p>${queue.descricao || 'Sem descrição'} - ${queue.pessoas_na_fila} pessoas</p>
+                    <p>${queue.descricao || 'Sem descrição'} - <span class="people-count">${queue.pessoas_na_fila} pessoas</span></p>
                 </div>
                 <div class="item-actions">
                     <button class="btn btn-secondary" onclick="editQueue(${queue.id})">Editar</button>
@@ -747,6 +767,7 @@ async function loadEmployeeQueues() {
 function createEmployeeQueueCard(queue) {
     const card = document.createElement('div');
     card.className = 'employee-queue-card';
+    card.dataset.filaId = queue.fila_id;
 
     card.innerHTML = `
         <div class="queue-header">
@@ -835,16 +856,7 @@ async function loadServiceHistory() {
     try {
         // Por enquanto, vamos buscar o histórico de filas do cliente
         // que pode incluir atendimentos realizados
-        const history = await window.FilaDigitalAPI.getQueueHistory();
-
-        serviceHistory.innerHTML = '';
-
-        if (history.length === 0) {
-            serviceHistory.innerHTML = '<p class="no-data">Nenhum atendimento encontrado.</p>';
-            return;
-        }
-
-        history.forEach(item => {
+        await renderPaginated(serviceHistory, window.FilaDigitalAPI.getQueueHistoryPage, item => {
             const historyItem = document.createElement('div');
             historyItem.className = 'list-item';
 
@@ -862,8 +874,8 @@ async function loadServiceHistory() {
                 </div>
             `;
 
-            serviceHistory.appendChild(historyItem);
-        });
+            return historyItem;
+        }, 'Nenhum atendimento encontrado.');
     } catch (error) {
         console.error('Error loading service history:', error);
         serviceHistory.innerHTML = '<p class="error">Erro ao carregar histórico de atendimentos.</p>';
@@ -913,7 +925,7 @@ function simulateScan() {
     }, 2000);
 }
 
-function generateQR() {
+async function generateQR(rotate = false) {
     const queueSelect = document.getElementById('queueSelect');
     if (!queueSelect || !queueSelect.value) {
         alert('Por favor, selecione uma fila primeiro.');
@@ -925,11 +937,28 @@ function generateQR() {
 
     console.log('Generating QR code for:', queueName);
 
+    // Rotacionar invalida os QR Codes já impressos ou compartilhados desta fila
+    const qr = rotate
+        ? await window.FilaDigitalAPI.rotateQRCode(queueSelect.value)
+        : await window.FilaDigitalAPI.generateQRCode(queueSelect.value);
+    if (!qr) {
+        alert('Erro ao gerar QR Code.');
+        return;
+    }
+
     const qrDisplay = document.getElementById('qrDisplay');
     const qrQueueName = document.getElementById('qrQueueName');
+    const qrValidity = document.getElementById('qrValidity');
 
     if (qrQueueName) qrQueueName.textContent = queueName;
-    if (qrDisplay) qrDisplay.style.display = 'block';
+    if (qrValidity) {
+        const expiresAt = new Date(qr.expira_em + 'Z');
+        qrValidity.textContent = `Válido até ${expiresAt.toLocaleString('pt-BR')}`;
+    }
+    if (qrDisplay) {
+        qrDisplay.dataset.qrCode = qr.qr_code;
+        qrDisplay.style.display = 'block';
+    }
 }
 
 function shareQR() {
@@ -1115,31 +1144,155 @@ function filterQueues(searchTerm) {
     });
 }
 
-// Simulação de atualizações em tempo real
+// Atualizações em tempo real
+// O servidor envia deltas por WebSocket; o polling fica só como reserva
+const REALTIME_RECONNECT_DELAY = 10000;
+const POLLING_INTERVAL = 30000;
+
+let realtimeSocket = null;
+let pollingTimer = null;
+const subscribedQueues = new Set();
+
+function getRealtimeUrl() {
+    const token = localStorage.getItem('accessToken');
+    if (!token) return null;
+    const origin = window.location.origin.replace(/^http/, 'ws');
+    return `${origin}/tempo-real/ws?token=${encodeURIComponent(token)}`;
+}
+
 function startRealTimeUpdates() {
-    // Simular atualizações periódicas das filas
-    setInterval(async () => {
+    const url = getRealtimeUrl();
+    if (!url || !('WebSocket' in window)) {
+        startPollingFallback();
+        return;
+    }
+
+    realtimeSocket = new WebSocket(url);
+
+    realtimeSocket.onopen = () => {
+        stopPollingFallback();
+        subscribedQueues.clear();
+        subscribeRenderedQueues();
+    };
+
+    realtimeSocket.onmessage = (event) => {
         try {
-            // Recarregar dados se estivermos na página apropriada
-            const currentPage = getCurrentPage();
-            if (currentPage === 'dashboard-cliente') {
-                await loadQueuesGrid();
-            } else if (currentPage === 'dashboard-funcionario') {
-                await loadEmployeeQueues();
-            } else if (currentPage === 'dashboard-dono') {
-                await loadEstablishmentsList();
-                await loadEmployeesList();
-                await loadQueuesList();
-            }
+            handleRealtimeMessage(JSON.parse(event.data));
         } catch (error) {
-            console.error('Error in real-time updates:', error);
+            console.error('Error handling real-time message:', error);
+        }
+    };
+
+    realtimeSocket.onclose = () => {
+        realtimeSocket = null;
+        startPollingFallback();
+        setTimeout(startRealTimeUpdates, REALTIME_RECONNECT_DELAY);
+    };
+}
+
+// Inscreve o socket nas filas que estão na tela (cards com data-fila-id)
+function subscribeRenderedQueues() {
+    const queueIds = new Set();
+    document.querySelectorAll('[data-fila-id]').forEach(element => {
+        queueIds.add(Number(element.dataset.filaId));
+    });
+    if (appState.currentQueue && appState.currentQueue.id) {
+        queueIds.add(Number(appState.currentQueue.id));
+    }
+
+    if (!realtimeSocket || realtimeSocket.readyState !== WebSocket.OPEN) return;
+
+    queueIds.forEach(filaId => {
+        if (!subscribedQueues.has(filaId)) {
+            realtimeSocket.send(JSON.stringify({ acao: 'assinar', fila_id: filaId }));
+            subscribedQueues.add(filaId);
+        }
+    });
+}
+
+function handleRealtimeMessage(message) {
+    switch (message.tipo) {
+        case 'posicao': {
+            // O cliente pode aguardar em várias filas; a tela mostra só a fila atual
+            if (!isCurrentQueue(message.fila_id)) break;
+            const positionNumber = document.getElementById('positionNumber');
+            if (positionNumber) positionNumber.textContent = message.posicao;
+            const estimatedTime = document.getElementById('estimatedTime');
+            if (estimatedTime && message.tempo_espera_estimado) estimatedTime.textContent = message.tempo_espera_estimado;
+            if (appState.currentQueue) appState.currentQueue.userPosition = message.posicao;
+            break;
+        }
+        case 'chamado': {
+            if (!isCurrentQueue(message.fila_id)) {
+                alert('Você foi chamado! Dirija-se ao atendimento.');
+                break;
+            }
+            const currentQueueSection = document.getElementById('currentQueue');
+            if (currentQueueSection) currentQueueSection.style.display = 'none';
+            appState.currentQueue = null;
+            alert('Você foi chamado! Dirija-se ao atendimento.');
+            break;
+        }
+        case 'entrada':
+        case 'chamada':
+        case 'saida':
+            updateQueueCounters(message.fila_id, message.aguardando);
+            break;
+        case 'removida':
+        case 'ressincronizar':
+            reloadRealtimeSections();
+            break;
+    }
+}
+
+function isCurrentQueue(filaId) {
+    return Boolean(appState.currentQueue) && Number(appState.currentQueue.id) === Number(filaId);
+}
+
+function updateQueueCounters(filaId, aguardando) {
+    document.querySelectorAll(`[data-fila-id="${filaId}"]`).forEach(element => {
+        const peopleCount = element.querySelector('.people-count');
+        if (peopleCount) peopleCount.textContent = `${aguardando} pessoas`;
+
+        const queueCount = element.querySelector('.queue-count');
+        if (queueCount) queueCount.textContent = aguardando;
+
+        const callButton = element.querySelector('.queue-actions .btn-primary');
+        if (callButton) callButton.disabled = aguardando === 0;
+    });
+}
+
+async function reloadRealtimeSections() {
+    try {
+        const currentPage = getCurrentPage();
+        if (currentPage === 'dashboard-cliente') {
+            await loadQueuesGrid();
+            await showCurrentQueue();
+        } else if (currentPage === 'dashboard-funcionario') {
+            await loadEmployeeQueues();
+        } else if (currentPage === 'dashboard-dono') {
+            await loadQueuesList();
         }
-    }, 30000); // Atualizar a cada 30 segundos
+        subscribeRenderedQueues();
+    } catch (error) {
+        console.error('Error in real-time updates:', error);
+    }
+}
+
+function startPollingFallback() {
+    if (pollingTimer) return;
+    pollingTimer = setInterval(reloadRealtimeSections, POLLING_INTERVAL);
+}
+
+function stopPollingFallback() {
+    if (!pollingTimer) return;
+    clearInterval(pollingTimer);
+    pollingTimer = null;
 }
 
 // Iniciar atualizações em tempo real quando a página carregar
 document.addEventListener('DOMContentLoaded', () => {
-    setTimeout(startRealTimeUpdates, 5000); // Começar após 5 segundos
+    setTimeout(startRealTimeUpdates, 1000);
 });
 
 // Utilitários
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Recalcula os contadores das filas (aguardando, atendidos, último ticket) a partir de usuarios_na_fila e do histórico.
+
+Uso:
+    python reparar_contadores.py            # todas as filas
+    python reparar_contadores.py 3 7        # só as filas 3 e 7
+    python reparar_contadores.py --verificar  # só mostra o que está divergente
+"""
+
+import sys
+from app.database import SessionLocal
+from app.services.queue_stats import QueueStatsRepository
+
+
+def main():
+    argumentos = sys.argv[1:]
+    verificar = "--verificar" in argumentos
+    fila_ids = [int(a) for a in argumentos if a != "--verificar"] or None
+
+    session = SessionLocal()
+    try:
+        corrigidas = QueueStatsRepository.repair(session, fila_ids)
+        if verificar:
+            session.rollback()
+        else:
+            session.commit()
+    finally:
+        session.close()
+
+    if not corrigidas:
+        print("Contadores consistentes em todas as filas verificadas.")
+    elif verificar:
+        print(f"Filas com contadores divergentes: {', '.join(map(str, corrigidas))}")
+        sys.exit(1)
+    else:
+        print(f"Contadores recalculados nas filas: {', '.join(map(str, corrigidas))}")
+
+
+if __name__ == "__main__":
+    main()
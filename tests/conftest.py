@@ -1,5 +1,25 @@
+import os
+
+# Os testes usam um banco próprio, recriado a cada execução
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///test_filadigital.db"
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(f"test_filadigital.db{sufixo}"):
+            os.remove(f"test_filadigital.db{sufixo}")
+# Respostas trazem X-SQL-Count/X-SQL-N-Plus-One para os orçamentos de consultas
+os.environ.setdefault("SQL_DEBUG_HEADERS", "true")
+# Os testes entram em filas muitas vezes do mesmo IP; test_limite_de_taxa liga o limite explicitamente
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import uuid
 from fastapi.testclient import TestClient
+from jose import jwt  # type: ignore
 from app.main import app
+from app.models import Usuario, Estabelecimento, Fila
+from app.startup import create_schema
+
+# O schema não é mais criado na importação da aplicação; os testes usam as tabelas dos modelos
+create_schema()
 
 client = TestClient(app)
 
@@ -14,4 +34,49 @@ def autenticar():
         "senha": "123456"
     })
     token = resp.json().get("access_token")
-    return {"Authorization": f"Bearer {token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
+
+def registrar(role):
+    """Registra um usuário novo com o role informado e devolve (token, headers)"""
+    email = f"{role}-{uuid.uuid4().hex[:8]}@teste.com"
+    client.post("/usuarios/registrar", json={"nome": role, "email": email, "senha": "123456", "role": role})
+    token = client.post("/usuarios/login", json={"email": email, "senha": "123456"}).json()["access_token"]
+    return token, {"Authorization": f"Bearer {token}"}
+
+def criar_fila(headers, token):
+    """Cria um estabelecimento e uma fila para o dono do token e devolve o id da fila"""
+    dono_id = int(jwt.get_unverified_claims(token)["sub"])
+    resposta = client.post("/estabelecimentos/criar-estabelecimento", headers=headers, json={
+        "nome": "Padaria", "rua": "Rua", "bairro": "Centro", "cidade": "Cidade",
+        "estado": "SP", "telefone": "11999999999", "usuario_id": dono_id
+    })
+    estabelecimento_id = int(resposta.json()["message"].rsplit(":", 1)[1])
+    resposta = client.post("/filas/criar-fila", headers=headers, json={
+        "nome": "Caixa", "descricao": "Fila do caixa", "estabelecimento_id": estabelecimento_id
+    })
+    return int(resposta.json()["message"].rsplit(":", 1)[1])
+
+def semear_filas(session, quantidade=1, email="dono@teste.com"):
+    """Cria direto na sessão (sem a API) um dono, um estabelecimento e `quantidade` filas; devolve (dono, filas)"""
+    dono = Usuario("Dono", email, "x")
+    session.add(dono)
+    session.flush()
+    estabelecimento = Estabelecimento("E", "r", "b", "c", "SP", "1", dono.id)  # type: ignore
+    session.add(estabelecimento)
+    session.flush()
+    nomes = ["Fila"] if quantidade == 1 else [f"Fila {i}" for i in range(quantidade)]
+    filas = [Fila(nome, "", estabelecimento.id) for nome in nomes]  # type: ignore
+    session.add_all(filas)
+    session.flush()
+    return dono, filas
+
+def entrar(headers, fila_id, prioridade="normal"):
+    return client.post("/filas/entrar-na-fila", headers=headers, json={
+        "usuario_id": 0, "fila_id": fila_id, "ordem": 0, "status": "aguardando", "prioridade": prioridade
+    })
+
+def orcamento_sql(resposta, maximo):
+    """Falha se a resposta usou mais de `maximo` comandos SQL ou repetiu um comando (N+1)"""
+    quantidade = int(resposta.headers["X-SQL-Count"])
+    assert quantidade <= maximo, f"{quantidade} comandos SQL, orçamento de {maximo}"
+    assert "X-SQL-N-Plus-One" not in resposta.headers, resposta.headers["X-SQL-N-Plus-One"]
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Fila, UsuariosNaFila, Priority
+from app.services import QueueService
+from app.services.queue_engine import queue_engines
+from app.services.queue_stats import QueueStatsRepository
+from tests.conftest import semear_filas
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Cada worker é um processo com o próprio motor em memória, como um worker do uvicorn
+WORKER = """
+import json, sys, time
+fila_id, inicio, lote = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+from app.database import SessionLocal
+from app.models import Fila
+from app.services import QueueService
+chamados = []
+time.sleep(max(0, inicio - time.time()))
+while True:
+    session = SessionLocal()
+    try:
+        if lote == 1:
+            entrada = QueueService.call_next_customer(session.get(Fila, fila_id), session, None)
+            lista = [entrada] if entrada is not None else []
+        else:
+            lista = QueueService.call_next_customers(session.get(Fila, fila_id), session, None, lote)
+        if not lista:
+            break
+        chamados.extend(entrada.id for entrada in lista)
+    finally:
+        session.close()
+print(json.dumps(chamados))
+"""
+
+def semear(url, clientes):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    dono, (fila,) = semear_filas(session, email="dono@stress.com")
+    for ordem in range(1, clientes + 1):
+        prioridade = Priority.high if ordem % 4 == 0 else Priority.normal
+        session.add(UsuariosNaFila(dono.id, fila.id, ordem, prioridade=prioridade))  # type: ignore
+    QueueStatsRepository.repair(session)
+    session.commit()
+    return engine, session, fila.id
+
+@pytest.mark.parametrize("lote", [1, 7])
+def test_cada_cliente_e_chamado_uma_unica_vez_entre_processos(tmp_path, lote):
+    url = f"sqlite:///{tmp_path / 'stress.db'}"
+    clientes, processos = 400, 6
+    engine, session, fila_id = semear(url, clientes)
+
+    inicio = time.time() + 3
+    env = dict(os.environ, DATABASE_URL=url, PYTHONPATH=RAIZ)
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, str(fila_id), str(inicio), str(lote)], cwd=RAIZ, env=env, stdout=subprocess.PIPE, text=True)
+        for _ in range(processos)
+    ]
+    chamados = []
+    for worker in workers:
+        saida, _ = worker.communicate(timeout=120)
+        assert worker.returncode == 0
+        chamados.append(json.loads(saida.strip().splitlines()[-1]))
+
+    todos = [entrada_id for lista in chamados for entrada_id in lista]
+    assert len(todos) == clientes
+    assert len(set(todos)) == clientes
+    assert sum(1 for lista in chamados if lista) > 1  # a carga foi mesmo dividida entre os processos
+
+    fila = session.get(Fila, fila_id)
+    assert (fila.aguardando_alta, fila.aguardando_normal, fila.total_atendidos) == (0, 0, clientes)  # type: ignore
+    assert session.query(UsuariosNaFila).filter(UsuariosNaFila.status == "aguardando").count() == 0
+    session.close()
+    engine.dispose()
+
+def test_prioridade_alta_e_chamada_antes(tmp_path):
+    engine, session, fila_id = semear(f"sqlite:///{tmp_path / 'ordem.db'}", 12)
+    queue_engines.discard(fila_id)
+    ordem = []
+    while True:
+        entrada = QueueService.call_next_customer(session.get(Fila, fila_id), session, None)  # type: ignore
+        if entrada is None:
+            break
+        ordem.append((entrada.prioridade, entrada.ordem))
+    queue_engines.discard(fila_id)
+    session.close()
+    engine.dispose()
+
+    assert ordem == [(Priority.high, n) for n in (4, 8, 12)] + [(Priority.normal, n) for n in range(1, 13) if n % 4]
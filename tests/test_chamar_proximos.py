@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models import Fila
+from tests.conftest import registrar, criar_fila, entrar, orcamento_sql
+
+client = TestClient(app)
+
+def test_chama_varios_em_ordem_de_prioridade_com_guiches():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(5)]
+    for i, headers in enumerate(clientes):
+        entrar(headers, fila_id, "high" if i == 2 else "normal")
+
+    resposta = client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"guiches": ["A", "B", "C"]})
+
+    assert resposta.status_code == 200
+    chamados = resposta.json()["chamados"]
+    assert [(c["codigo_ticket"], c["guiche"]) for c in chamados] == [("P003", "A"), ("N001", "B"), ("N002", "C")]
+    assert client.get("/filas/minha-posicao", headers=clientes[4]).json()[0]["posicao"] == 2
+
+    resposta = client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 5})
+    assert [c["guiche"] for c in resposta.json()["chamados"]] == ["1", "2"]
+    assert resposta.json()["guiches_livres"] == ["3", "4", "5"]
+    assert client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 2}).status_code == 404
+
+    session = SessionLocal()
+    try:
+        fila = session.get(Fila, fila_id)
+        assert (fila.aguardando_alta, fila.aguardando_normal, fila.total_atendidos) == (0, 0, 5)  # type: ignore
+    finally:
+        session.close()
+
+def test_uma_notificacao_de_fila_e_sql_constante():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    for _ in range(12):
+        entrar(registrar("usuario")[1], fila_id)
+
+    with client.websocket_connect(f"/tempo-real/ws?token={token_dono}") as painel:
+        painel.send_json({"acao": "assinar", "fila_id": fila_id})
+        painel.receive_json()
+        um = client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 1})
+        assert painel.receive_json()["aguardando"] == 11
+        dez = client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 10})
+        delta = painel.receive_json()
+        assert (delta["tipo"], delta["aguardando"]) == ("chamada", 1)
+
+    assert len(dez.json()["chamados"]) == 10
+    orcamento_sql(dez, int(um.headers["X-SQL-Count"]))
+
+def test_guiches_e_quantidade_precisam_bater():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    resposta = client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 3, "guiches": ["1"]})
+    assert resposta.status_code == 422
+    assert client.post(f"/filas/{fila_id}/chamar-proximos", headers=cliente, json={}).status_code == 403
+
+def test_so_a_equipe_da_fila_chama_clientes():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    _, outro_dono = registrar("dono")
+    entrar(cliente, fila_id)
+
+    for estranho in (cliente, outro_dono):
+        assert client.post(f"/filas/{fila_id}/chamar-proximo", headers=estranho).status_code == 403
+        assert client.post(f"/filas/{fila_id}/chamar-proximos", headers=estranho, json={}).status_code == 403
+    assert client.get("/filas/minha-posicao", headers=cliente).json()[0]["posicao"] == 1
+    assert client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono).status_code == 200
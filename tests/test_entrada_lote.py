@@ -0,0 +1,96 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from jose import jwt  # type: ignore
+from app.main import app
+from app.database import engine
+from tests.conftest import registrar, criar_fila, entrar, orcamento_sql
+
+client = TestClient(app)
+
+def usuario_id(token):
+    return int(jwt.get_unverified_claims(token)["sub"])
+
+def test_lote_informa_resultado_por_item():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario") for _ in range(3)]
+    entrar(clientes[0][1], fila_id)
+    ids = [usuario_id(token) for token, _ in clientes]
+
+    resposta = client.post("/filas/entrar-em-lote", headers=dono, json={"entradas": [
+        {"usuario_id": ids[0], "fila_id": fila_id},
+        {"usuario_id": ids[1], "fila_id": fila_id},
+        {"usuario_id": ids[1], "fila_id": fila_id},
+        {"usuario_id": ids[2], "fila_id": fila_id, "prioridade": "high"},
+        {"usuario_id": ids[2], "fila_id": 999999},
+        {"usuario_id": 999999, "fila_id": fila_id},
+    ]})
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert (corpo["inseridos"], corpo["recusados"]) == (2, 4)
+    r = corpo["resultados"]
+    assert [item["sucesso"] for item in r] == [False, True, False, True, False, False]
+    assert r[0]["erro"] == r[2]["erro"] == "Usuário já está nesta fila"
+    assert r[4]["erro"] == "Fila não encontrada"
+    assert r[5]["erro"] == "Usuário não encontrado"
+    assert (r[1]["ticket"], r[1]["codigo_ticket"], r[1]["posicao"]) == (2, "N002", 3)
+    assert (r[3]["ticket"], r[3]["codigo_ticket"], r[3]["posicao"]) == (3, "P003", 1)
+    assert client.get("/filas/minha-posicao", headers=clientes[1][1]).json()[0]["posicao"] == 3
+
+def test_lote_custa_o_mesmo_numero_de_comandos_qualquer_que_seja_o_tamanho():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    ids = [usuario_id(registrar("usuario")[0]) for _ in range(12)]
+
+    pequeno = client.post("/filas/entrar-em-lote", headers=dono, json={"entradas": [
+        {"usuario_id": i, "fila_id": fila_id} for i in ids[:2]
+    ]})
+    grande = client.post("/filas/entrar-em-lote", headers=dono, json={"entradas": [
+        {"usuario_id": i, "fila_id": fila_id} for i in ids[2:]
+    ]})
+
+    assert grande.json()["inseridos"] == 10
+    assert [item["ticket"] for item in grande.json()["resultados"]] == list(range(3, 13))
+    orcamento_sql(grande, int(pequeno.headers["X-SQL-Count"]))
+
+def test_lote_exige_acesso_a_fila():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    cliente_token, cliente = registrar("usuario")
+    _, outro_dono = registrar("dono")
+
+    assert client.post("/filas/entrar-em-lote", headers=cliente, json={"entradas": [
+        {"usuario_id": usuario_id(cliente_token), "fila_id": fila_id}
+    ]}).status_code == 403
+    resposta = client.post("/filas/entrar-em-lote", headers=outro_dono, json={"entradas": [
+        {"usuario_id": usuario_id(cliente_token), "fila_id": fila_id}
+    ]})
+    assert resposta.json()["resultados"][0]["erro"] == "Acesso negado à fila"
+
+def test_lotes_atualizam_as_filas_sempre_na_mesma_ordem():
+    token_dono, dono = registrar("dono")
+    filas = sorted(criar_fila(dono, token_dono) for _ in range(2))
+    ids = [usuario_id(registrar("usuario")[0]) for _ in range(4)]
+
+    # Fila de cada UPDATE dos contadores (o id é o último parâmetro, do WHERE)
+    atualizadas = []
+    def registrar_update(conn, cursor, statement, parametros, context, executemany):
+        if statement.startswith("UPDATE filas"):
+            atualizadas.append(parametros[-1])
+
+    event.listen(engine, "before_cursor_execute", registrar_update)
+    try:
+        ordens = []
+        for itens in ([(ids[0], filas[1]), (ids[1], filas[0])], [(ids[2], filas[0]), (ids[3], filas[1])]):
+            atualizadas.clear()
+            resposta = client.post("/filas/entrar-em-lote", headers=dono, json={"entradas": [
+                {"usuario_id": u, "fila_id": f} for u, f in itens
+            ]})
+            assert resposta.json()["inseridos"] == 2
+            ordens.append(list(atualizadas))
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar_update)
+
+    # Itens em ordens opostas, linhas de filas travadas na mesma ordem
+    assert ordens == [filas, filas]
@@ -0,0 +1,80 @@
+import random
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import Base
+from app.models import HistoricoFila, Priority
+from app.services.queue_engine import QueueEngineRegistry
+from app.services.wait_estimator import P2Quantile, WaitEstimator, formatar_estimativa
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+INICIO = datetime(2024, 5, 1, 9, 0)
+
+def test_p2_aproxima_o_quantil_sem_guardar_as_amostras():
+    gerador = random.Random(7)
+    amostras = [gerador.expovariate(1 / 120) for _ in range(20000)]
+    p90 = P2Quantile(0.9)
+    for valor in amostras:
+        p90.add(valor)
+
+    exato = sorted(amostras)[int(0.9 * len(amostras))]
+    assert abs(p90.value() - exato) / exato < 0.03  # type: ignore
+    assert len(p90) == len(amostras)
+
+def test_estimativa_ignora_fila_ociosa_e_divide_chamadas_em_lote():
+    estimador = WaitEstimator()
+    # Fila sempre ocupada: um atendimento a cada 2 minutos
+    for i in range(1, 6):
+        estimador.record(INICIO + timedelta(minutes=2 * i), [INICIO])
+    # Cliente que chegou depois da última chamada: o intervalo inclui tempo ocioso e não conta
+    estimador.record(INICIO + timedelta(hours=3), [INICIO + timedelta(hours=2)])
+    # Três guichês chamando juntos depois de 6 minutos: 2 minutos por cliente
+    estimador.record(INICIO + timedelta(hours=3, minutes=6), [INICIO] * 3)
+
+    esperado, minimo, maximo = estimador.eta(5)  # type: ignore
+    assert esperado == 600
+    assert minimo <= esperado <= maximo
+    assert estimador.eta(0) is None
+    assert formatar_estimativa(minimo, maximo) == "10 min"
+    assert formatar_estimativa(9 * 60, 14.5 * 60) == "9-15 min"
+
+def test_motor_novo_aquece_a_estimativa_pelo_historico():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for i in range(6):
+        saida = INICIO + timedelta(minutes=3 * i)
+        session.add(HistoricoFila(
+            entrada_id=i + 1, usuario_id=1, fila_id=7, ordem=i + 1, prioridade=Priority.normal, status="atendido",
+            horario_entrada=INICIO - timedelta(minutes=1), horario_saida=saida, mes=202405
+        ))
+    session.commit()
+
+    motor = QueueEngineRegistry().get(7, session)
+    motor.enqueue(100, usuario_id=2, prioridade=Priority.normal)
+    motor.enqueue(101, usuario_id=3, prioridade=Priority.normal)
+
+    assert motor.eta(101)[0] == 360  # type: ignore
+    session.close()
+
+def test_posicao_traz_a_estimativa_depois_das_primeiras_chamadas():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(6)]
+    for headers in clientes:
+        entrar(headers, fila_id)
+
+    assert client.get("/filas/minha-posicao", headers=clientes[-1]).json()[0]["tempo_espera_estimado"] is None
+
+    for _ in range(4):
+        client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+
+    posicao = client.get("/filas/minha-posicao", headers=clientes[-1]).json()[0]
+    assert posicao["posicao"] == 2
+    assert posicao["tempo_espera_estimado"] == "menos de 1 min"
+    assert posicao["tempo_espera_segundos"] is not None
+    dashboard = client.get("/filas/dashboard-cliente", headers=clientes[-1]).json()
+    assert dashboard["posicoes_atuais"][0]["tempo_espera_estimado"] == "menos de 1 min"
@@ -0,0 +1,117 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models import Fila, SnapshotFila
+from app.sql_profile import sql_profile
+from app.services.event_log import EventLogRepository
+from app.services.queue_engine import QueueEngineRegistry, queue_engines
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+
+def _posicoes(clientes):
+    return [client.get("/filas/minha-posicao", headers=c).json()[0]["posicao"] for c in clientes]
+
+def test_cada_transicao_vira_um_evento_em_sequencia():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(5)]
+    for i, headers in enumerate(clientes):
+        entrar(headers, fila_id, "high" if i == 3 else "normal")
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 2})
+    posicao = client.get("/filas/minha-posicao", headers=clientes[4]).json()[0]
+    client.delete(f"/filas/sair-da-fila/{posicao['id']}", headers=clientes[4])
+
+    session = SessionLocal()
+    try:
+        eventos = EventLogRepository.for_queue(session, fila_id)
+        assert [e.seq for e in eventos] == list(range(1, 10))
+        assert [e.tipo for e in eventos] == ["entrada"] * 5 + ["chamada"] * 3 + ["saida"]
+        assert [e.entrada_id for e in eventos[5:8]] == [eventos[3].entrada_id, eventos[0].entrada_id, eventos[1].entrada_id]
+        assert session.get(Fila, fila_id).ultimo_evento == 9  # type: ignore
+    finally:
+        session.close()
+
+def test_motor_reconstruido_pelo_snapshot_e_pelos_eventos_seguintes():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(6)]
+    for headers in clientes[:3]:
+        entrar(headers, fila_id)
+
+    # Como compactar_eventos.py: registro próprio, carregado do banco
+    session = SessionLocal()
+    try:
+        motores = QueueEngineRegistry()
+        motores.load_all(session)
+        motores.save_snapshots(session)
+        session.commit()
+        assert session.get(SnapshotFila, fila_id).seq == 3  # type: ignore
+    finally:
+        session.close()
+
+    for i, headers in enumerate(clientes[3:]):
+        entrar(headers, fila_id, "high" if i == 1 else "normal")
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    esperado = _posicoes(clientes[:4] + clientes[5:])
+
+    # Outro processo (registro novo) parte do snapshot e não lê usuarios_na_fila
+    session = SessionLocal()
+    try:
+        with sql_profile() as perfil:
+            motor = QueueEngineRegistry().get(fila_id, session)
+        assert not any("usuarios_na_fila" in comando for comando in perfil.statements)
+        assert motor.waiting() == queue_engines.loaded(fila_id).waiting()  # type: ignore
+        assert motor.seq == 7
+    finally:
+        session.close()
+
+    queue_engines.clear()
+    assert _posicoes(clientes[:4] + clientes[5:]) == esperado == [1, 2, 3, 4, 5]
+
+def test_carga_de_todas_as_filas_e_remocao():
+    token_dono, dono = registrar("dono")
+    filas = [criar_fila(dono, token_dono) for _ in range(2)]
+    clientes = [registrar("usuario")[1] for _ in range(2)]
+    for fila_id in filas:
+        for headers in clientes:
+            entrar(headers, fila_id)
+
+    session = SessionLocal()
+    try:
+        motores = QueueEngineRegistry()
+        assert motores.load_all(session) >= 2
+        for fila_id in filas:
+            assert motores.loaded(fila_id).waiting() == queue_engines.get(fila_id, session).waiting()  # type: ignore
+        assert motores.load_all(session) == 0
+    finally:
+        session.close()
+
+    client.post(f"/filas/apagar-fila/{filas[0]}", headers=dono)
+    session = SessionLocal()
+    try:
+        assert [e.tipo for e in EventLogRepository.for_queue(session, filas[0])][-1] == "remocao"
+        assert session.get(SnapshotFila, filas[0]) is None
+    finally:
+        session.close()
+
+def test_escritas_do_processo_avancam_a_sequencia_do_motor():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(4)]
+    for headers in clientes:
+        entrar(headers, fila_id)
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    client.post(f"/filas/{fila_id}/chamar-proximos", headers=dono, json={"quantidade": 2})
+
+    session = SessionLocal()
+    try:
+        assert queue_engines.loaded(fila_id).seq == session.get(Fila, fila_id).ultimo_evento == 7  # type: ignore
+        # O snapshot do desligamento sai na sequência atual: o próximo início não reproduz nada
+        queue_engines.save_snapshots(session)
+        session.commit()
+        assert session.get(SnapshotFila, fila_id).seq == 7  # type: ignore
+        assert EventLogRepository.events_after(session, fila_id, 7) == []
+    finally:
+        session.close()
@@ -0,0 +1,75 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import Base, SessionLocal
+from app.models import Fila, UsuariosNaFila, HistoricoFila, Priority
+from app.services.history import HistoryRepository
+from app.services.queue_stats import QueueStatsRepository
+from tests.conftest import registrar, criar_fila, entrar, semear_filas
+
+client = TestClient(app)
+
+def test_atendidos_e_cancelados_saem_da_tabela_quente():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    _, outro = registrar("usuario")
+    entrar(cliente, fila_id)
+    entrar(outro, fila_id)
+
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    entrar(cliente, fila_id, "high")
+    posicao = client.get("/filas/minha-posicao", headers=cliente).json()[0]
+    client.delete(f"/filas/sair-da-fila/{posicao['id']}", headers=cliente)
+
+    session = SessionLocal()
+    try:
+        restantes = session.query(UsuariosNaFila.status).filter(UsuariosNaFila.fila_id == fila_id).all()
+        assert restantes == [("aguardando",)]
+        assert session.get(Fila, fila_id).total_atendidos == 1  # type: ignore
+        assert QueueStatsRepository.repair(session, [fila_id]) == []
+    finally:
+        session.close()
+
+    historico = client.get("/filas/historico", headers=cliente).json()
+    assert [(h["codigo_ticket"], h["status"]) for h in historico] == [("P003", "cancelado"), ("N001", "concluido")]
+    assert {(h["fila_nome"], h["estabelecimento_nome"]) for h in historico} == {("Caixa", "Padaria")}
+
+    recente = client.get("/filas/dashboard-cliente", headers=cliente).json()["historico_recente"]
+    assert [h["status"] for h in recente] == ["cancelado", "atendido"]
+
+    # O histórico não depende da fila continuar existindo
+    client.post(f"/filas/apagar-fila/{fila_id}", headers=dono)
+    assert len(client.get("/filas/historico", headers=cliente).json()) == 2
+
+def test_arquivamento_agendado_move_entradas_antigas_em_lotes():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    dono, (fila,) = semear_filas(session)
+    for ordem in range(1, 6):
+        status = "aguardando" if ordem == 5 else "atendido" if ordem % 2 else "saiu"
+        entrada = UsuariosNaFila(dono.id, fila.id, ordem, status=status, prioridade=Priority.normal)  # type: ignore
+        entrada.horario_entrada = datetime(2024, ordem, 10)  # type: ignore
+        session.add(entrada)
+    session.commit()
+
+    assert HistoryRepository.archive_finished(session, limite=3) == 3
+    assert HistoryRepository.archive_finished(session, limite=3) == 1
+    assert HistoryRepository.archive_finished(session, limite=3) == 0
+    session.commit()
+
+    arquivadas = session.query(HistoricoFila.ordem, HistoricoFila.status, HistoricoFila.mes, HistoricoFila.fila_nome)\
+        .order_by(HistoricoFila.ordem).all()
+    assert arquivadas == [
+        (1, "atendido", 202401, "Fila"), (2, "cancelado", 202402, "Fila"),
+        (3, "atendido", 202403, "Fila"), (4, "cancelado", 202404, "Fila")
+    ]
+    assert session.query(UsuariosNaFila).count() == 1
+
+    # Contadores continuam vendo os atendimentos arquivados
+    QueueStatsRepository.repair(session)
+    assert (fila.total_atendidos, fila.ultimo_ticket, fila.aguardando_normal) == (2, 5, 1)  # type: ignore
+    session.close()
@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.database import engine
+from app.services.queue_engine import queue_engines
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+
+def capturar_consultas(acao):
+    """Executa a ação e devolve os comandos SQL (com parâmetros) emitidos"""
+    consultas = []
+
+    def registrar_consulta(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            consultas.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", registrar_consulta)
+    try:
+        acao()
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar_consulta)
+    return consultas
+
+def planos_sem_indice(consultas, tabela):
+    """EXPLAIN QUERY PLAN de cada consulta; devolve as que varrem a tabela inteira"""
+    falhas = []
+    with engine.connect() as conn:
+        for statement, parameters in consultas:
+            if tabela not in statement or statement.lstrip().upper().startswith("INSERT"):
+                continue
+            plano = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            for linha in plano:
+                detalhe = linha[-1]
+                if detalhe.startswith(f"SCAN {tabela}") and "INDEX" not in detalhe:
+                    falhas.append((statement, detalhe))
+    return falhas
+
+def test_caminhos_quentes_da_fila_usam_indices():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(3)]
+    for i, cliente in enumerate(clientes):
+        entrar(cliente, fila_id, "high" if i == 1 else "normal")
+
+    def fluxo():
+        # Força a carga do motor em memória para que a consulta de carga também seja verificada
+        queue_engines.clear()
+        client.get("/filas/", headers=dono)
+        client.get("/estabelecimentos/dashboard", headers=dono)
+        client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+        client.get("/filas/disponiveis", headers=clientes[0])
+        client.get("/filas/minha-posicao", headers=clientes[0])
+        client.get("/filas/historico", headers=clientes[1])
+        client.get("/filas/dashboard-cliente", headers=clientes[2])
+        posicao = client.get("/filas/minha-posicao", headers=clientes[2]).json()[0]
+        client.delete(f"/filas/sair-da-fila/{posicao['id']}", headers=clientes[2])
+
+    consultas = capturar_consultas(fluxo)
+
+    assert any("usuarios_na_fila" in statement for statement, _ in consultas)
+    assert planos_sem_indice(consultas, "usuarios_na_fila") == []
+    assert any("historico_filas" in statement for statement, _ in consultas)
+    assert planos_sem_indice(consultas, "historico_filas") == []
@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.models import SnapshotFila
+from app.services.queue_engine import queue_engines
+from tests.conftest import registrar, criar_fila, entrar
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def _modulos_carregados(importacao):
+    """Importa em um processo novo e devolve quais módulos pesados ficaram carregados"""
+    codigo = f"import sys; {importacao}; print(' '.join(m for m in ('fastapi', 'passlib', 'jose') if m in sys.modules))"
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=dict(os.environ), capture_output=True, text=True, check=True)
+    return saida.stdout.split()
+
+def test_importacao_nao_carrega_dependencias_pesadas():
+    # Scripts e Alembic só precisam do banco
+    assert _modulos_carregados("import app.database") == []
+    # A aplicação deixa bcrypt e JWT para o aquecimento
+    assert _modulos_carregados("import app.main") == ["fastapi"]
+
+def test_lifespan_aquece_e_grava_snapshots_ao_desligar():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    entrar(cliente, fila_id)
+    queue_engines.clear()
+
+    with TestClient(app) as client:
+        assert queue_engines.loaded(fila_id) is not None
+        texto = client.get("/metrics").text
+        assert 'filadigital_startup_warmup_seconds{etapa="filas"}' in texto
+        assert client.get("/filas/minha-posicao", headers=cliente).json()[0]["posicao"] == 1
+
+    session = SessionLocal()
+    try:
+        assert session.get(SnapshotFila, fila_id) is not None
+    finally:
+        session.close()
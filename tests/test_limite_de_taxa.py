@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import rate_limited
+from app.rate_limit import MemoryBackend, join_limiter, parse_limite
+from app.services.qr_tokens import qr_signer
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+
+@pytest.fixture
+def limite(monkeypatch):
+    """Liga o limite de entradas com baldes novos; o teste escolhe os limites"""
+    monkeypatch.setattr(join_limiter, "enabled", True)
+    monkeypatch.setattr(join_limiter, "backend", MemoryBackend())
+    def configurar(**limites):
+        monkeypatch.setattr(join_limiter, "limites", {escopo: parse_limite(valor) for escopo, valor in limites.items()})
+    return configurar
+
+def test_usuario_insistente_recebe_429_sem_consultar_o_banco(limite):
+    limite(usuario="2/60", ip="", fila="")
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    outra_fila = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    antes = rate_limited.values().get(("entrada", "usuario"), 0)
+
+    assert entrar(cliente, fila_id).status_code == 200
+    assert entrar(cliente, fila_id).status_code == 400  # já está na fila, mas gastou a tentativa
+    recusada = entrar(cliente, outra_fila)
+    assert recusada.status_code == 429
+    assert int(recusada.headers["Retry-After"]) >= 1
+    assert recusada.headers["X-SQL-Count"] == "0"
+    assert rate_limited.values()[("entrada", "usuario")] == antes + 1
+
+    # O balde é por usuário: outro cliente continua entrando
+    _, outro = registrar("usuario")
+    assert entrar(outro, fila_id).status_code == 200
+
+def test_balde_da_fila_vale_tambem_para_qr_code(limite):
+    limite(usuario="", ip="", fila="2/60")
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    qr_code, _ = qr_signer.issue(fila_id, 0)
+
+    _, primeiro = registrar("usuario")
+    _, segundo = registrar("usuario")
+    _, terceiro = registrar("usuario")
+    assert entrar(primeiro, fila_id).status_code == 200
+    assert client.post("/filas/entrar-via-qr", headers=segundo, json={"qr_code": qr_code}).status_code == 200
+    assert client.post("/filas/entrar-via-qr", headers=terceiro, json={"qr_code": qr_code}).status_code == 429
+
+    # Token falso não gasta o balde de fila nenhuma
+    assert client.post("/filas/entrar-via-qr", headers=terceiro, json={"qr_code": "x.1.0.1.y"}).status_code == 400
+
+def test_token_bucket_repoe_com_o_tempo():
+    backend = MemoryBackend()
+    capacidade, taxa = parse_limite("2/1")  # type: ignore
+    assert backend.take("k", capacidade, taxa) == 0
+    assert backend.take("k", capacidade, taxa) == 0
+    espera = backend.take("k", capacidade, taxa)
+    assert 0 < espera <= 0.5
+    assert parse_limite("0") is None and parse_limite("") is None
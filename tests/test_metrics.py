@@ -0,0 +1,53 @@
+import threading
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import MetricsRegistry
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+
+def test_contadores_de_varias_threads_somam_na_coleta():
+    registro = MetricsRegistry()
+    contador = registro.counter("teste_total", "Teste", ("rota",))
+    histograma = registro.histogram("teste_segundos", "Teste", (), buckets=(0.1, 1.0))
+
+    def trabalhar():
+        for _ in range(1000):
+            contador.inc("/a")
+            histograma.observe(0.5)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    texto = registro.render()
+    assert 'teste_total{rota="/a"} 4000' in texto
+    assert 'teste_segundos_bucket{le="0.1"} 0' in texto
+    assert 'teste_segundos_bucket{le="1"} 4000' in texto
+    assert 'teste_segundos_bucket{le="+Inf"} 4000' in texto
+    assert "teste_segundos_count 4000" in texto
+
+def test_metrics_expoe_rotas_sql_e_filas():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    entrar(cliente, fila_id)
+    client.get("/filas/minha-posicao", headers=cliente)
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+
+    resposta = client.get("/metrics")
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
+    texto = resposta.text
+    assert 'filadigital_http_request_duration_seconds_count{method="GET",route="/filas/minha-posicao",status="200"}' in texto
+    assert 'filadigital_http_request_duration_seconds_count{method="POST",route="/filas/{fila_id}/chamar-proximo",status="200"}' in texto
+    assert 'filadigital_sql_statements_per_request_count{route="/filas/minha-posicao"}' in texto
+    assert "filadigital_http_requests_in_flight 1" in texto  # a própria leitura de /metrics
+    assert "filadigital_db_pool_checkouts_total" in texto
+    assert "filadigital_password_seconds_count" in texto
+    assert f'filadigital_queue_waiting{{fila_id="{fila_id}"}} 0' in texto
+    assert f'filadigital_queue_calls_per_minute{{fila_id="{fila_id}"}} 1' in texto
+    assert f'filadigital_queue_average_wait_seconds{{fila_id="{fila_id}"}}' in texto
@@ -0,0 +1,68 @@
+from datetime import datetime
+from fastapi.testclient import TestClient
+from jose import jwt  # type: ignore
+from app.main import app
+from app.database import SessionLocal
+from app.models import HistoricoFila, Priority, mes_particao
+from tests.conftest import registrar, criar_fila
+
+client = TestClient(app)
+
+def _todas_as_paginas(url, headers, chave=None):
+    """Percorre a listagem com limite=2 seguindo o cursor; devolve as páginas"""
+    paginas, cursor = [], None
+    while True:
+        params = {"limite": 2, **({"cursor": cursor} if cursor else {})}
+        resposta = client.get(url, headers=headers, params=params)
+        assert resposta.status_code == 200
+        corpo = resposta.json()
+        paginas.append(corpo[chave] if chave else corpo)
+        cursor = resposta.headers.get("X-Proximo-Cursor")
+        if chave:
+            assert corpo["proximo_cursor"] == cursor
+        if not cursor:
+            return paginas
+
+def test_estabelecimentos_e_filas_paginados_sem_repetir():
+    token_dono, dono = registrar("dono")
+    for _ in range(5):
+        criar_fila(dono, token_dono)
+
+    paginas = _todas_as_paginas("/estabelecimentos/", dono, "estabelecimentos")
+    ids = [e["id"] for pagina in paginas for e in pagina]
+    assert [len(p) for p in paginas] == [2, 2, 1]
+    assert ids == sorted(set(ids))
+
+    _, cliente = registrar("usuario")
+    paginas = _todas_as_paginas("/filas/disponiveis", cliente, "filas")
+    ids = [f["id"] for pagina in paginas for f in pagina]
+    assert all(len(p) <= 2 for p in paginas)
+    assert ids == sorted(set(ids))
+    assert len(ids) >= 5
+
+def test_historico_com_horarios_iguais_desempata_pelo_id():
+    token, cliente = registrar("usuario")
+    usuario_id = int(jwt.get_unverified_claims(token)["sub"])
+    quando = datetime(2024, 3, 1, 12, 0)
+    session = SessionLocal()
+    try:
+        session.add_all([
+            HistoricoFila(entrada_id=900000 + i, usuario_id=usuario_id, fila_id=1, ordem=i + 1,
+                          prioridade=Priority.normal, status="atendido", horario_entrada=quando,
+                          horario_saida=quando, mes=mes_particao(quando), fila_nome="Caixa",
+                          estabelecimento_nome="Padaria")
+            for i in range(5)
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+    paginas = _todas_as_paginas("/filas/historico", cliente)
+    tickets = [h["codigo_ticket"] for pagina in paginas for h in pagina]
+    assert tickets == ["N005", "N004", "N003", "N002", "N001"]
+
+def test_cursor_e_limite_invalidos():
+    _, dono = registrar("dono")
+    assert client.get("/estabelecimentos/", headers=dono, params={"cursor": "nao-e-cursor"}).status_code == 400
+    assert client.get("/estabelecimentos/", headers=dono, params={"limite": 0}).status_code == 422
+    assert client.get("/estabelecimentos/", headers=dono, params={"limite": 201}).status_code == 422
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.password_pool import PasswordPool, PasswordPoolBusy, password_pool
+
+client = TestClient(app)
+
+class ContextoLento:
+    """Imita o CryptContext, mas só responde quando liberado"""
+
+    def __init__(self):
+        self.liberar = threading.Event()
+
+    def verify(self, senha, senha_hash):
+        self.liberar.wait(5)
+        return senha == senha_hash
+
+def test_pool_recusa_acima_do_limite():
+    contexto = ContextoLento()
+    pool = PasswordPool(contexto, workers=1, max_pending=1)  # type: ignore
+
+    async def cenario():
+        primeira = asyncio.create_task(pool.verify("a", "a"))
+        await asyncio.sleep(0)
+        try:
+            await pool.verify("b", "b")
+            assert False, "segunda verificação deveria ser recusada"
+        except PasswordPoolBusy:
+            pass
+        contexto.liberar.set()
+        return await primeira
+
+    assert asyncio.run(cenario()) is True
+    metricas = pool.metrics()
+    assert metricas["rejeitadas"] == 1
+    assert metricas["concluidas"] == 1
+    assert metricas["pendentes"] == 0
+
+def test_login_com_pool_cheio_retorna_503():
+    client.post("/usuarios/registrar", json={"nome": "Lotado", "email": "lotado@teste.com", "senha": "123456"})
+    limite = password_pool.max_pending
+    password_pool.max_pending = 0
+    try:
+        resposta = client.post("/usuarios/login", json={"email": "lotado@teste.com", "senha": "123456"})
+    finally:
+        password_pool.max_pending = limite
+
+    assert resposta.status_code == 503
+    assert resposta.headers["Retry-After"] == "1"
+    assert client.post("/usuarios/login", json={"email": "lotado@teste.com", "senha": "123456"}).status_code == 200
+
+def test_canceladas_e_com_erro_nao_contam_como_concluidas():
+    contexto = ContextoLento()
+    pool = PasswordPool(contexto, workers=1, max_pending=3)  # type: ignore
+
+    def falhar(senha, senha_hash):
+        raise ValueError("hash inválido")
+
+    async def cenario():
+        ocupada = asyncio.create_task(pool.verify("a", "a"))
+        # Ainda na fila do executor quando o cliente desiste
+        desistente = asyncio.create_task(pool.verify("b", "b"))
+        await asyncio.sleep(0)
+        desistente.cancel()
+        contexto.liberar.set()
+        await ocupada
+        contexto.verify = falhar  # type: ignore
+        try:
+            await pool.verify("c", "c")
+            assert False, "verificação deveria falhar"
+        except ValueError:
+            pass
+
+    asyncio.run(cenario())
+    metricas = pool.metrics()
+    assert (metricas["concluidas"], metricas["falhas"], metricas["pendentes"]) == (1, 2, 0)
@@ -0,0 +1,46 @@
+import re
+from fastapi.testclient import TestClient
+from jose import jwt  # type: ignore
+from sqlalchemy import event
+from app.main import app
+from app.database import engine
+from tests.conftest import registrar, criar_fila
+
+client = TestClient(app)
+
+def consultas_em_usuarios(acao):
+    consultas = []
+
+    def registrar_consulta(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"FROM usuarios\b", statement):
+            consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", registrar_consulta)
+    try:
+        acao()
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar_consulta)
+    return consultas
+
+def test_token_repetido_nao_consulta_usuarios():
+    _, headers = registrar("usuario")
+    client.get("/filas/dashboard-cliente", headers=headers)
+
+    consultas = consultas_em_usuarios(lambda: client.get("/filas/dashboard-cliente", headers=headers))
+
+    assert consultas == []
+
+def test_adicionar_funcionario_invalida_cache():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    estabelecimento_id = next(f["estabelecimento_id"] for f in client.get("/filas/", headers=dono).json()["filas"] if f["id"] == fila_id)
+    token_funcionario, funcionario = registrar("usuario")
+    funcionario_id = int(jwt.get_unverified_claims(token_funcionario)["sub"])
+
+    assert client.get("/filas/dashboard-funcionario", headers=funcionario).status_code == 403
+
+    resposta = client.post(f"/estabelecimentos/{estabelecimento_id}/adicionar-funcionario", headers=dono, params={"funcionario_id": funcionario_id})
+    assert resposta.status_code == 200
+
+    # Mesmo token: o role novo precisa valer imediatamente
+    assert client.get("/filas/dashboard-funcionario", headers=funcionario).status_code == 200
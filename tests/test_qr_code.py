@@ -0,0 +1,72 @@
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.qr_tokens import RevocationList, qr_revocations, qr_signer
+from tests.conftest import registrar, criar_fila
+
+client = TestClient(app)
+
+def _entrar(headers, qr_code):
+    return client.post("/filas/entrar-via-qr", headers=headers, json={"qr_code": qr_code})
+
+def test_qr_code_assinado_entra_na_fila_com_prioridade():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    qr = client.get(f"/filas/{fila_id}/qr-code", headers=dono).json()
+    assert qr["validade"] == "24h" and qr["expira_em"]
+
+    _, cliente = registrar("usuario")
+    resposta = _entrar(cliente, qr["qr_code"])
+    assert resposta.status_code == 200
+    assert resposta.json()["codigo_ticket"] == "P001"
+    # Leitores que só abrem uma URL mandam o token na query
+    _, outro = registrar("usuario")
+    assert client.post("/filas/entrar-via-qr", headers=outro, params={"qr_code": qr["qr_code"]}).status_code == 200
+
+    assert _entrar(cliente, qr["qr_code"]).status_code == 400  # já está na fila
+
+def test_qr_code_adulterado_ou_expirado_e_recusado():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    qr_code = client.get(f"/filas/{fila_id}/qr-code", headers=dono).json()["qr_code"]
+    _, cliente = registrar("usuario")
+
+    chave, _, geracao, expira_em, assinatura = qr_code.split(".")
+    outra_fila = f"{chave}.{fila_id + 1}.{geracao}.{expira_em}.{assinatura}"
+    assert _entrar(cliente, outra_fila).json()["detail"] == "QR Code inválido"
+    assert _entrar(cliente, "nao-e-um-qr").json()["detail"] == "QR Code inválido"
+
+    vencido, _ = qr_signer.issue(fila_id, 0, agora=time.time() - qr_signer.ttl - 1)
+    assert _entrar(cliente, vencido).json()["detail"] == "QR Code expirado"
+
+def test_rotacionar_revoga_os_qr_codes_anteriores():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    antigo = client.get(f"/filas/{fila_id}/qr-code", headers=dono).json()["qr_code"]
+    novo = client.post(f"/filas/{fila_id}/qr-code/rotacionar", headers=dono).json()["qr_code"]
+
+    _, cliente = registrar("usuario")
+    assert _entrar(cliente, antigo).json()["detail"] == "QR Code revogado"
+
+    # Outro processo não viu a rotação: confere a geração no banco e passa a lembrar dela
+    qr_revocations.clear()
+    assert _entrar(cliente, antigo).json()["detail"] == "QR Code revogado"
+    assert qr_revocations.is_revoked(fila_id, 0)
+
+    assert _entrar(cliente, novo).status_code == 200
+    _, outro_dono = registrar("dono")
+    assert client.post(f"/filas/{fila_id}/qr-code/rotacionar", headers=outro_dono).status_code == 403
+
+def test_revogacoes_saem_da_memoria_quando_os_tokens_expiram():
+    revogacoes = RevocationList()
+    revogacoes.revoke(1, 2, ate=100)
+    revogacoes.revoke(1, 3, ate=200)
+    revogacoes.revoke(2, 1, ate=150)
+
+    assert revogacoes.is_revoked(1, 2, agora=120)
+    assert not revogacoes.is_revoked(1, 3, agora=120)
+    assert revogacoes.is_revoked(2, 0, agora=120)
+    assert not revogacoes.is_revoked(2, 0, agora=160)
+    assert len(revogacoes) == 1
+    assert not revogacoes.is_revoked(1, 2, agora=200)
+    assert len(revogacoes) == 0
@@ -0,0 +1,50 @@
+from app.models import Priority, formatar_ticket
+from app.services.queue_engine import QueueEngine
+
+def test_alta_prioridade_na_frente():
+    engine = QueueEngine(fila_id=1)
+    engine.enqueue(1, usuario_id=10, prioridade=Priority.normal)
+    engine.enqueue(2, usuario_id=11, prioridade=Priority.normal)
+    engine.enqueue(3, usuario_id=12, prioridade=Priority.high)
+
+    assert engine.peek() == 3
+    assert engine.position(3) == 1
+    assert engine.position(1) == 2
+    assert engine.position(2) == 3
+    assert engine.counts() == (1, 2)
+
+def test_remover_no_meio_atualiza_posicoes():
+    engine = QueueEngine(fila_id=1)
+    for entrada_id in range(1, 6):
+        engine.enqueue(entrada_id, usuario_id=100 + entrada_id, prioridade=Priority.normal)
+
+    assert engine.remove(3)
+    assert not engine.remove(3)
+    assert engine.position(4) == 3
+    assert engine.entry_for_user(103) is None
+    assert engine.entry_for_user(104) == 4
+
+    engine.remove(engine.peek())  # type: ignore
+    assert engine.peek() == 2
+    assert engine.position(5) == 3
+
+def test_muitas_chamadas_compactam_sem_perder_ordem():
+    engine = QueueEngine(fila_id=1)
+    for entrada_id in range(1, 1001):
+        prioridade = Priority.high if entrada_id % 10 == 0 else Priority.normal
+        engine.enqueue(entrada_id, usuario_id=entrada_id, prioridade=prioridade)
+
+    chamados = []
+    for _ in range(950):
+        proximo = engine.peek()
+        chamados.append(proximo)
+        engine.remove(proximo)  # type: ignore
+
+    assert chamados[:100] == list(range(10, 1001, 10))
+    assert len(engine) == 50
+    assert engine.position(1000 - 1) == 50
+
+def test_codigo_do_ticket_para_o_painel():
+    assert formatar_ticket(42, Priority.normal) == "N042"
+    assert formatar_ticket(7, Priority.high) == "P007"
+    assert formatar_ticket(1234, None) == "N1234"
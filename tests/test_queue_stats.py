@@ -0,0 +1,125 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Fila, UsuariosNaFila, Priority
+from app.services.queue_engine import QueueEngineRegistry, queue_engines
+from app.services.queue_stats import QueueStatsRepository
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from tests.conftest import registrar, criar_fila, entrar, semear_filas
+
+def criar_sessao():
+    queue_engines.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)()
+
+def test_contagem_de_varias_filas_em_uma_consulta():
+    engine, session = criar_sessao()
+    dono, filas = semear_filas(session, 5)
+    for i, fila in enumerate(filas):
+        for ordem in range(1, i + 2):
+            prioridade = Priority.high if ordem == 1 else Priority.normal
+            session.add(UsuariosNaFila(dono.id, fila.id, ordem, prioridade=prioridade))  # type: ignore
+    session.add(UsuariosNaFila(dono.id, filas[0].id, 99, status="atendido"))  # type: ignore
+    session.commit()
+    fila_ids = [fila.id for fila in filas]
+
+    # Linhas inseridas direto no banco: os contadores só ficam certos depois do reparo
+    assert sorted(QueueStatsRepository.repair(session)) == sorted(fila_ids)  # type: ignore
+    session.commit()
+
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+    stats = QueueStatsRepository.counts(session, fila_ids)  # type: ignore
+
+    assert len(consultas) == 1
+    assert stats[fila_ids[0]] == {"total_aguardando": 1, "prioridade_alta": 1, "prioridade_normal": 0}
+    assert stats[fila_ids[4]] == {"total_aguardando": 5, "prioridade_alta": 1, "prioridade_normal": 4}
+    assert session.get(Fila, fila_ids[0]).total_atendidos == 1  # type: ignore
+    assert session.get(Fila, fila_ids[0]).ultimo_ticket == 99  # type: ignore
+
+def test_contadores_acompanham_entradas_chamadas_e_saidas():
+    client = TestClient(app)
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(3)]
+    entrar(clientes[0], fila_id, "high")
+    entrar(clientes[1], fila_id)
+    entrar(clientes[2], fila_id)
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    posicao = client.get("/filas/minha-posicao", headers=clientes[2]).json()[0]
+    client.delete(f"/filas/sair-da-fila/{posicao['id']}", headers=clientes[2])
+
+    session = SessionLocal()
+    try:
+        fila = session.get(Fila, fila_id)
+        assert (fila.aguardando_alta, fila.aguardando_normal, fila.total_atendidos, fila.ultimo_ticket) == (0, 1, 1, 3)  # type: ignore
+        assert fila.versao == 5  # type: ignore
+        assert QueueStatsRepository.repair(session, [fila_id]) == []
+    finally:
+        session.close()
+
+def test_motor_recarrega_quando_outro_processo_escreve():
+    engine, session = criar_sessao()
+    dono, (fila,) = semear_filas(session)
+    session.commit()
+
+    motor = queue_engines.get(fila.id, session, fila.versao)  # type: ignore
+    assert len(motor) == 0
+
+    # Simula outro worker: grava a entrada e incrementa a versão no banco
+    ordem, _ = QueueStatsRepository.on_enqueue(session, fila.id, Priority.normal)  # type: ignore
+    session.add(UsuariosNaFila(dono.id, fila.id, ordem))  # type: ignore
+    session.commit()
+
+    assert queue_engines.get(fila.id, session, fila.versao) is motor  # type: ignore
+    assert len(motor) == 1
+    assert motor.last_ticket == 1
+
+def test_ticket_vem_do_contador_e_nunca_se_repete():
+    client = TestClient(app)
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(3)]
+
+    primeiro = entrar(clientes[0], fila_id).json()
+    segundo = entrar(clientes[1], fila_id, "high").json()
+    client.delete(f"/filas/sair-da-fila/{client.get('/filas/minha-posicao', headers=clientes[0]).json()[0]['id']}", headers=clientes[0])
+    terceiro = entrar(clientes[2], fila_id).json()
+
+    assert [r["ticket"] for r in (primeiro, segundo, terceiro)] == [1, 2, 3]
+    assert [r["codigo_ticket"] for r in (primeiro, segundo, terceiro)] == ["N001", "P002", "N003"]
+    assert client.get("/filas/minha-posicao", headers=clientes[2]).json()[0]["codigo_ticket"] == "N003"
+    chamado = client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono).json()
+    assert chamado["codigo_ticket"] == "P002"
+
+def test_leituras_de_outro_worker_acompanham_as_escritas(monkeypatch):
+    import app.services as services
+    client = TestClient(app)
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    clientes = [registrar("usuario")[1] for _ in range(4)]
+    for headers in clientes[:3]:
+        entrar(headers, fila_id)
+
+    # Worker B: registro próprio, sobre o mesmo banco, já com a fila carregada
+    worker_a, worker_b = services.queue_engines, QueueEngineRegistry()
+    monkeypatch.setattr(services, "queue_engines", worker_b)
+    assert client.get("/filas/minha-posicao", headers=clientes[2]).json()[0]["posicao"] == 3
+
+    # Worker A atende o primeiro e recebe mais um cliente
+    monkeypatch.setattr(services, "queue_engines", worker_a)
+    client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    entrar(clientes[3], fila_id)
+
+    monkeypatch.setattr(services, "queue_engines", worker_b)
+    assert client.get("/filas/minha-posicao", headers=clientes[2]).json()[0]["posicao"] == 2
+    assert client.get("/filas/minha-posicao", headers=clientes[3]).json()[0]["posicao"] == 3
+    assert client.get("/filas/dashboard-cliente", headers=clientes[3]).json()["posicoes_atuais"][0]["posicao"] == 3
+    session = SessionLocal()
+    try:
+        assert services.QueueService.get_queue_stats(session.get(Fila, fila_id), session)["total_aguardando"] == 3  # type: ignore
+    finally:
+        session.close()
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.main import app
+from app.database import SessionLocal
+from app.sql_profile import sql_profile
+from tests.conftest import registrar, criar_fila, entrar, orcamento_sql
+
+client = TestClient(app)
+
+def test_perfil_aponta_comando_repetido():
+    session = SessionLocal()
+    try:
+        with sql_profile() as perfil:
+            for _ in range(4):
+                session.execute(text("SELECT 1"))
+    finally:
+        session.close()
+
+    assert perfil.count == 4
+    assert perfil.duration > 0
+    assert perfil.repeated() == [("SELECT 1", 4)]
+
+def test_rotas_do_cliente_cabem_no_orcamento():
+    # Filas de estabelecimentos diferentes: sem eager loading seria uma consulta por fila
+    filas = []
+    for _ in range(3):
+        token_dono, dono = registrar("dono")
+        fila_id = criar_fila(dono, token_dono)
+        filas.append((fila_id, dono))
+    _, cliente = registrar("usuario")
+    for fila_id, _ in filas:
+        entrar(cliente, fila_id)
+    for fila_id, dono in filas[:2]:
+        client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+    for fila_id, _ in filas[:2]:
+        entrar(cliente, fila_id)
+
+    # Aquece o cache de usuários autenticados
+    client.get("/filas/minha-posicao", headers=cliente)
+
+    resposta = client.get("/filas/minha-posicao", headers=cliente)
+    assert len(resposta.json()) == 3
+    orcamento_sql(resposta, 1)
+
+    resposta = client.get("/filas/historico", headers=cliente)
+    assert len(resposta.json()) == 2
+    orcamento_sql(resposta, 1)
+
+    resposta = client.get("/filas/dashboard-cliente", headers=cliente)
+    assert len(resposta.json()["historico_recente"]) == 2
+    orcamento_sql(resposta, 2)
+
+    orcamento_sql(client.get("/filas/disponiveis", headers=cliente), 2)
+
+def test_listagens_do_dono_cabem_no_orcamento():
+    token_dono, dono = registrar("dono")
+    for _ in range(3):
+        criar_fila(dono, token_dono)
+    client.get("/filas/", headers=dono)
+
+    orcamento_sql(client.get("/filas/", headers=dono), 2)
+    resposta = client.get("/estabelecimentos/dashboard", headers=dono)
+    orcamento_sql(resposta, 2)
+    # O response_model não muda o formato: continua 0, não 0.0
+    assert isinstance(resposta.json()["metricas_gerais"]["tempo_medio_atendimento"], int)
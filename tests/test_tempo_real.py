@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.services import NotificationService
+from app.services.queue_engine import queue_engines
+from tests.conftest import registrar, criar_fila, entrar
+
+client = TestClient(app)
+
+def test_token_invalido_fecha_conexao():
+    try:
+        with client.websocket_connect("/tempo-real/ws?token=invalido") as ws:
+            ws.receive_json()
+        assert False, "conexão deveria ter sido recusada"
+    except Exception as erro:
+        assert getattr(erro, "code", None) == 1008
+
+def test_painel_e_cliente_recebem_deltas():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, primeiro = registrar("usuario")
+    token_cliente, cliente = registrar("usuario")
+
+    with client.websocket_connect(f"/tempo-real/ws?token={token_dono}") as painel, \
+         client.websocket_connect(f"/tempo-real/ws?token={token_cliente}") as ws_cliente:
+        painel.send_json({"acao": "assinar", "fila_id": fila_id})
+        assert painel.receive_json() == {"tipo": "assinado", "fila_id": fila_id}
+
+        assert entrar(primeiro, fila_id).status_code == 200
+        delta = painel.receive_json()
+        assert delta["tipo"] == "entrada"
+        assert delta["aguardando"] == 1
+        # Qualquer usuário pode assinar a fila: nada que identifique a entrada
+        assert not {"entrada_id", "ticket", "codigo_ticket"} & set(delta)
+
+        assert entrar(cliente, fila_id).status_code == 200
+        assert painel.receive_json()["aguardando"] == 2
+        assert ws_cliente.receive_json()["posicao"] == 2
+
+        client.post(f"/filas/{fila_id}/chamar-proximo", headers=dono)
+        assert painel.receive_json()["tipo"] == "chamada"
+        mensagem = ws_cliente.receive_json()
+        assert (mensagem["tipo"], mensagem["fila_id"], mensagem["posicao"]) == ("posicao", fila_id, 1)
+
+def test_comando_invalido_responde_erro_e_delta_vem_dos_contadores():
+    token_dono, dono = registrar("dono")
+    fila_id = criar_fila(dono, token_dono)
+    _, cliente = registrar("usuario")
+    entrar(cliente, fila_id)
+
+    with client.websocket_connect(f"/tempo-real/ws?token={token_dono}") as painel:
+        painel.send_json([fila_id])
+        assert painel.receive_json() == {"tipo": "erro", "detalhe": "comando inválido"}
+        painel.send_text("assinar")
+        assert painel.receive_json()["tipo"] == "erro"
+        painel.send_json({"acao": "assinar", "fila_id": fila_id})
+        assert painel.receive_json() == {"tipo": "assinado", "fila_id": fila_id}
+
+        # Worker que não tem a fila carregada publica o que está gravado na fila
+        queue_engines.clear()
+        session = SessionLocal()
+        try:
+            NotificationService.notify_queues_updated([fila_id], session, "atualizada")
+        finally:
+            session.close()
+        assert painel.receive_json()["aguardando"] == 1